@@ -14,12 +14,49 @@ Usage:
     sfce update --commands-only    # Only update commands
     sfce update --agents-only      # Only update agents
     sfce update --skills-only      # Only update skills
+    sfce bundle sfce.pyz           # Build a single-file zipapp with all content
+    sfce use <version>             # Switch to a version from the global store
+    sfce use                       # Restore the pinned version (CI)
+    sfce store list|add|gc         # Manage the global content store
+    sfce validate                  # Validate agents, skills, commands and indexes
+    sfce index apex                # Build the incremental Apex symbol index
+    sfce find --touches Account    # Query the Apex symbol index
+    sfce estimate-limits [entry]   # Static worst-case governor-limit estimate
+    sfce review merge <files>      # Merge JSONL findings from review agents
+    sfce run-review --command CMD  # Run review agents headless via a local command
+    sfce prompts                   # Build a byte-stable shared prompt prefix
+    sfce inventory [--json]        # Metadata inventory of a Salesforce DX project
+    sfce logs analyze logs/        # Governor-limit profile from Apex debug logs
+    sfce coverage coverage.json    # Per-class coverage vs the constitution threshold
+    sfce scan permissions --who-can edit Account.AnnualRevenue
+    sfce scan datamodel --format dot -o model.dot
+    sfce doctor [--json]           # Cached prerequisite checks
+    sfce metrics                   # Plan/Work/Review/Compound split from git history
+    sfce delta --from main --tests # package.xml + destructiveChanges.xml for a git diff
 """
 
 import argparse
+import asyncio
+import concurrent.futures
+import fnmatch
+import functools
+import hashlib
+import io
+import json
+import mmap
 import os
+import random
+import re
+import shlex
+import signal
+import subprocess
+import time
+import unicodedata
+import urllib.parse
 import sys
 import shutil
+import zipfile
+import zipimport
 from pathlib import Path
 
 # Version
@@ -34,17 +71,17 @@ class Colors:
     RESET = '\033[0m'
     BOLD = '\033[1m'
 
-def print_success(msg):
-    print(f"{Colors.GREEN}✅ {msg}{Colors.RESET}")
+def print_success(msg, file=None):
+    print(f"{Colors.GREEN}✅ {msg}{Colors.RESET}", file=file)
 
-def print_info(msg):
-    print(f"{Colors.BLUE}ℹ️  {msg}{Colors.RESET}")
+def print_info(msg, file=None):
+    print(f"{Colors.BLUE}ℹ️  {msg}{Colors.RESET}", file=file)
 
-def print_warning(msg):
-    print(f"{Colors.YELLOW}⚠️  {msg}{Colors.RESET}")
+def print_warning(msg, file=None):
+    print(f"{Colors.YELLOW}⚠️  {msg}{Colors.RESET}", file=file)
 
-def print_error(msg):
-    print(f"{Colors.RED}❌ {msg}{Colors.RESET}")
+def print_error(msg, file=None):
+    print(f"{Colors.RED}❌ {msg}{Colors.RESET}", file=file)
 
 def print_banner():
     banner = f"""
@@ -303,6 +340,8 @@ TASKS_TEMPLATE = '''# [Feature Name] - Tasks
 | Review | X | 0 | X |
 | Compound | X | 0 | X |
 
+Run `sfce metrics --spec <NNN>-<feature>` for the measured effort per phase, cycle time and completion curve.
+
 ---
 
 *See [constitution.md](../../memory/constitution.md) for project principles.*
@@ -366,6 +405,12 @@ set -e
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/common.sh"
 
+# Prefer the concurrent, cached probes of `sfce doctor` when the CLI is installed.
+# Like the checks below, only a missing git fails the script.
+if command -v sfce &> /dev/null && sfce doctor --help 2> /dev/null | grep -q -- --required-only; then
+    exec sfce doctor --path "$PROJECT_ROOT" --required-only "$@"
+fi
+
 print_info "Checking prerequisites for SF Compound Engineering..."
 echo ""
 
@@ -663,22 +708,76 @@ def create_directory_structure(project_path: Path, force: bool = False):
 
     return True
 
-def install_commands(project_path: Path):
+@functools.lru_cache(maxsize=None)
+def get_package_root():
+    """Return the root that holds the packaged commands/, agents/ and skills/.
+
+    When sfce runs from a zipapp or pex-style archive, ``Path(__file__).parent``
+    points inside the archive and does not exist on disk. In that case the
+    content is read straight from the archive's directory table through
+    ``zipfile.Path``; nothing is unpacked to a temp directory.
+    """
+    loader = globals().get('__loader__')
+    if isinstance(loader, zipimport.zipimporter):
+        archive = zipfile.ZipFile(loader.archive)
+        return zipfile.Path(archive, at=loader.prefix)
+    return Path(__file__).parent
+
+def iter_resources(directory, prefix: str = '', suffix: str = '.md'):
+    """Yield files in a package resource directory, sorted by name.
+
+    Works for both ``pathlib.Path`` and ``zipfile.Path`` (which has no ``glob``
+    before Python 3.12).
+    """
+    if not directory.is_dir():
+        return
+    entries = [entry for entry in directory.iterdir()
+               if entry.is_file() and entry.name.startswith(prefix) and entry.name.endswith(suffix)]
+    yield from sorted(entries, key=lambda entry: entry.name)
+
+def iter_resource_dirs(directory):
+    """Yield subdirectories of a package resource directory, sorted by name."""
+    if not directory.is_dir():
+        return
+    yield from sorted((entry for entry in directory.iterdir() if entry.is_dir()),
+                      key=lambda entry: entry.name)
+
+def copy_resource(source, dest: Path):
+    """Materialize a package resource (on disk or inside an archive) at dest."""
+    dest.write_bytes(source.read_bytes())
+
+# Content directories shipped with the CLI (mirrors [tool.hatch.build] include)
+CONTENT_DIRS = ('commands', 'agents', 'skills')
+
+def iter_content_files(root):
+    """Yield (relative_path, resource) for every packaged content file."""
+    def walk(directory, rel):
+        for entry in sorted(directory.iterdir(), key=lambda e: e.name):
+            child = f"{rel}/{entry.name}"
+            if entry.is_dir():
+                yield from walk(entry, child)
+            elif entry.name.endswith('.md'):
+                yield child, entry
+
+    for name in CONTENT_DIRS:
+        directory = root / name
+        if directory.is_dir():
+            yield from walk(directory, name)
+
+def install_commands(project_path: Path, source=None):
     """Install SF Compound Engineering commands to .claude/commands/"""
     commands_dir = project_path / '.claude' / 'commands'
     commands_dir.mkdir(parents=True, exist_ok=True)
 
-    # Get the directory where this script is located
-    cli_dir = Path(__file__).parent
-    source_commands_dir = cli_dir / 'commands'
+    # Resolve content (package directory, zipapp archive or global store)
+    source_commands_dir = (source or get_package_root()) / 'commands'
 
-    if source_commands_dir.exists():
+    if source_commands_dir.is_dir():
         # Copy commands from package (files are named sf-*.md)
-        for cmd_file in source_commands_dir.glob('sf-*.md'):
-            dest_file = commands_dir / cmd_file.name
-            shutil.copy(cmd_file, dest_file)
+        for cmd_file in iter_resources(source_commands_dir, prefix='sf-'):
+            copy_resource(cmd_file, commands_dir / cmd_file.name)
             # Extract command name from sf-plan.md -> /sf-plan
-            cmd_name = cmd_file.stem  # sf-plan
+            cmd_name = cmd_file.name[:-len('.md')]  # sf-plan
             print_success(f"Installed command: /{cmd_name}")
     else:
         # Fallback: create minimal command stubs
@@ -687,12 +786,11 @@ def install_commands(project_path: Path):
 
     return True
 
-def install_agents(project_path: Path):
+def install_agents(project_path: Path, source=None):
     """Install SF Compound Engineering agents to .claude/agents/"""
-    cli_dir = Path(__file__).parent
-    source_agents_dir = cli_dir / 'agents'
+    source_agents_dir = (source or get_package_root()) / 'agents'
 
-    if not source_agents_dir.exists():
+    if not source_agents_dir.is_dir():
         print_warning("Agents not found in package")
         return False
 
@@ -700,29 +798,27 @@ def install_agents(project_path: Path):
     dest_agents_dir.mkdir(parents=True, exist_ok=True)
 
     # Copy root-level files (like index.md)
-    for root_file in source_agents_dir.glob('*.md'):
-        shutil.copy(root_file, dest_agents_dir / root_file.name)
+    for root_file in iter_resources(source_agents_dir):
+        copy_resource(root_file, dest_agents_dir / root_file.name)
         print_success(f"Installed agents/{root_file.name}")
 
     # Copy all agent categories
     agent_count = 0
-    for category in source_agents_dir.iterdir():
-        if category.is_dir():
-            dest_category = dest_agents_dir / category.name
-            dest_category.mkdir(parents=True, exist_ok=True)
-            for agent_file in category.glob('*.md'):
-                shutil.copy(agent_file, dest_category / agent_file.name)
-                agent_count += 1
+    for category in iter_resource_dirs(source_agents_dir):
+        dest_category = dest_agents_dir / category.name
+        dest_category.mkdir(parents=True, exist_ok=True)
+        for agent_file in iter_resources(category):
+            copy_resource(agent_file, dest_category / agent_file.name)
+            agent_count += 1
 
     print_success(f"Installed {agent_count} agents (apex, lwc, automation, integration, architecture)")
     return True
 
-def install_skills(project_path: Path):
+def install_skills(project_path: Path, source=None):
     """Install SF Compound Engineering skills to .claude/skills/"""
-    cli_dir = Path(__file__).parent
-    source_skills_dir = cli_dir / 'skills'
+    source_skills_dir = (source or get_package_root()) / 'skills'
 
-    if not source_skills_dir.exists():
+    if not source_skills_dir.is_dir():
         print_warning("Skills not found in package")
         return False
 
@@ -730,23 +826,310 @@ def install_skills(project_path: Path):
     dest_skills_dir.mkdir(parents=True, exist_ok=True)
 
     # Copy root-level files (like index.md)
-    for root_file in source_skills_dir.glob('*.md'):
-        shutil.copy(root_file, dest_skills_dir / root_file.name)
+    for root_file in iter_resources(source_skills_dir):
+        copy_resource(root_file, dest_skills_dir / root_file.name)
         print_success(f"Installed skills/{root_file.name}")
 
     # Copy all skills
     skill_count = 0
-    for skill in source_skills_dir.iterdir():
-        if skill.is_dir():
-            dest_skill = dest_skills_dir / skill.name
-            dest_skill.mkdir(parents=True, exist_ok=True)
-            for skill_file in skill.glob('*.md'):
-                shutil.copy(skill_file, dest_skill / skill_file.name)
-            skill_count += 1
+    for skill in iter_resource_dirs(source_skills_dir):
+        dest_skill = dest_skills_dir / skill.name
+        dest_skill.mkdir(parents=True, exist_ok=True)
+        for skill_file in iter_resources(skill):
+            copy_resource(skill_file, dest_skill / skill_file.name)
+        skill_count += 1
 
     print_success(f"Installed {skill_count} skills (governor-limits, apex-patterns, security-guide, lwc-patterns, flow-patterns, integration-patterns, test-factory)")
     return True
 
+# Global content store
+#
+# Layout (shared by every project on the machine):
+#   <cache>/store/objects/ab/abcdef...   content-addressed blobs (sha256)
+#   <cache>/store/versions/<v>.json      manifest: content path -> blob hash
+# A manifest's mtime records when the version was last used (for LRU gc).
+# Projects pin what they installed in .specify/sfce.lock.
+
+LOCK_FILE = Path('.specify') / 'sfce.lock'
+
+# Blobs younger than this are never collected: another process may be
+# adding a version whose manifest is not written yet.
+STORE_GC_GRACE_SECONDS = 3600
+
+def get_cache_dir() -> Path:
+    """Return the user-level cache directory ($SFCE_CACHE_DIR or XDG cache)."""
+    if os.environ.get('SFCE_CACHE_DIR'):
+        return Path(os.environ['SFCE_CACHE_DIR']).expanduser()
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base).expanduser() / 'sfce'
+
+def get_store_dir() -> Path:
+    return get_cache_dir() / 'store'
+
+def write_atomic(path: Path, data: bytes):
+    """Write data via a temp file + rename so concurrent readers never see partial files."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def parse_size(value: str) -> int:
+    """Parse a size such as '500M', '2G' or '1048576' into bytes."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kmgt]?)b?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    units = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+    return int(float(match.group(1)) * units[match.group(2).lower()])
+
+def positive_int(value: str) -> int:
+    """argparse type for options that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return number
+
+def format_size(num: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num < 1024 or unit == 'GB':
+            return f"{num:.0f} {unit}" if unit == 'B' else f"{num:.1f} {unit}"
+        num /= 1024
+
+class StoreTree:
+    """Read-only view of one stored version, shaped like pathlib.Path/zipfile.Path.
+
+    Lets install_commands()/install_agents()/install_skills() install from the
+    store exactly as they do from the package directory or a zipapp.
+    """
+
+    def __init__(self, store_dir: Path, files: dict, rel: str = ''):
+        self.store_dir = store_dir
+        self.files = files
+        self.rel = rel
+
+    @property
+    def name(self):
+        return self.rel.rsplit('/', 1)[-1]
+
+    def __truediv__(self, name):
+        return StoreTree(self.store_dir, self.files, f"{self.rel}/{name}" if self.rel else name)
+
+    def is_file(self):
+        return self.rel in self.files
+
+    def is_dir(self):
+        prefix = f"{self.rel}/" if self.rel else ''
+        return any(path.startswith(prefix) for path in self.files)
+
+    def iterdir(self):
+        prefix = f"{self.rel}/" if self.rel else ''
+        children = {path[len(prefix):].split('/', 1)[0] for path in self.files if path.startswith(prefix)}
+        return (self / child for child in sorted(children))
+
+    def read_bytes(self):
+        return store_object_path(self.store_dir, self.files[self.rel]).read_bytes()
+
+def store_object_path(store_dir: Path, digest: str) -> Path:
+    return store_dir / 'objects' / digest[:2] / digest
+
+def store_manifest_path(store_dir: Path, version: str) -> Path:
+    return store_dir / 'versions' / f"{version}.json"
+
+def store_load(version: str, store_dir: Path = None):
+    """Return the manifest for a stored version, or None if it is not stored."""
+    path = store_manifest_path(store_dir or get_store_dir(), version)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+def store_touch(version: str, store_dir: Path = None):
+    """Mark a version as recently used."""
+    path = store_manifest_path(store_dir or get_store_dir(), version)
+    if path.exists():
+        os.utime(path)
+
+def store_add(root, version: str, store_dir: Path = None) -> dict:
+    """Ingest packaged content into the store (blobs are written only if new)."""
+    store_dir = store_dir or get_store_dir()
+    files = {}
+    size = 0
+    for rel, resource in iter_content_files(root):
+        data = resource.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        blob = store_object_path(store_dir, digest)
+        try:
+            os.utime(blob)  # keep a reused blob clear of a concurrent gc
+        except FileNotFoundError:
+            write_atomic(blob, data)
+        files[rel] = digest
+        size += len(data)
+
+    manifest = {'version': version, 'size': size, 'files': files}
+    write_atomic(store_manifest_path(store_dir, version),
+                 json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+def store_versions(store_dir: Path = None):
+    """List stored versions, least recently used first."""
+    store_dir = store_dir or get_store_dir()
+    versions_dir = store_dir / 'versions'
+    if not versions_dir.is_dir():
+        return []
+    entries = []
+    for path in versions_dir.glob('*.json'):
+        manifest = json.loads(path.read_text())
+        manifest['last_used'] = path.stat().st_mtime
+        entries.append(manifest)
+    return sorted(entries, key=lambda m: m['last_used'])
+
+def store_gc(max_bytes: int, protect=(), store_dir: Path = None):
+    """Evict least-recently-used versions until the store fits in max_bytes.
+
+    Blobs shared between versions are counted once and only deleted when no
+    remaining manifest references them. Temp files and blobs written within
+    STORE_GC_GRACE_SECONDS are left alone so a concurrent store_add() is safe.
+    Returns the evicted versions.
+    """
+    store_dir = store_dir or get_store_dir()
+    versions = store_versions(store_dir)
+
+    # Stat each blob once; evicting a version frees the blobs no other version references
+    refcounts, sizes = {}, {}
+    for manifest in versions:
+        for digest in set(manifest['files'].values()):
+            refcounts[digest] = refcounts.get(digest, 0) + 1
+    for digest in refcounts:
+        try:
+            sizes[digest] = store_object_path(store_dir, digest).stat().st_size
+        except FileNotFoundError:
+            sizes[digest] = 0
+    total = sum(sizes.values())
+
+    evicted = []
+    remaining = list(versions)
+    for manifest in versions:
+        if total <= max_bytes:
+            break
+        if manifest['version'] in protect:
+            continue
+        store_manifest_path(store_dir, manifest['version']).unlink()
+        remaining.remove(manifest)
+        evicted.append(manifest['version'])
+        for digest in set(manifest['files'].values()):
+            refcounts[digest] -= 1
+            if not refcounts[digest]:
+                total -= sizes[digest]
+
+    referenced = {d for m in remaining for d in m['files'].values()}
+    cutoff = time.time() - STORE_GC_GRACE_SECONDS
+    objects_dir = store_dir / 'objects'
+    if objects_dir.is_dir():
+        for blob in objects_dir.glob('*/*'):
+            if blob.name in referenced or blob.name.startswith('.'):
+                continue
+            try:
+                if blob.stat().st_mtime < cutoff:
+                    blob.unlink()
+            except FileNotFoundError:
+                pass  # collected by another gc
+    return evicted
+
+def store_auto_gc(store_dir: Path = None):
+    """Apply the SFCE_STORE_MAX_SIZE cap, if configured."""
+    cap = os.environ.get('SFCE_STORE_MAX_SIZE')
+    if cap:
+        for version in store_gc(parse_size(cap), protect={__version__}, store_dir=store_dir):
+            print_info(f"Evicted sfce {version} from the store")
+
+def ensure_store_version():
+    """Make sure this CLI's content is in the store and return a StoreTree for it.
+
+    Returns None (install falls back to the package directly) when the store
+    cannot be written, e.g. on a read-only home directory.
+    """
+    store_dir = get_store_dir()
+    try:
+        manifest = store_load(__version__, store_dir)
+        if manifest is None:
+            manifest = store_add(get_package_root(), __version__, store_dir)
+            print_info(f"Added sfce {__version__} to the store: {store_dir}")
+            store_auto_gc(store_dir)
+        store_touch(__version__, store_dir)
+    except OSError as e:
+        print_warning(f"Content store unavailable ({e}), installing from package")
+        return None
+    return StoreTree(store_dir, manifest['files'])
+
+def read_lock(project_path: Path):
+    path = project_path / LOCK_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+def installed_content(files: dict) -> dict:
+    """Keep the content paths that install_commands/agents/skills() actually copy."""
+    kept = {}
+    for rel, digest in files.items():
+        parts = rel.split('/')
+        if parts[0] == 'commands' and (len(parts) != 2 or not parts[1].startswith('sf-')):
+            continue
+        if len(parts) <= 3:
+            kept[rel] = digest
+    return kept
+
+def write_lock(project_path: Path, version: str, files: dict):
+    """Record the pinned version and installed content hashes in the project."""
+    lock = {'version': version, 'files': dict(sorted(files.items()))}
+    write_atomic(project_path / LOCK_FILE, (json.dumps(lock, indent=2) + '\n').encode())
+
+def sync_from_store(project_path: Path, files: dict, store_dir: Path, verify: bool = False,
+                    backup_dir: Path = None):
+    """Materialize stored content into .claude/, touching only changed files.
+
+    Files whose hash matches the current lock are skipped without being read,
+    so switching versions or restoring in CI costs O(changed files). Before a
+    file is replaced or removed it is hashed, and local edits (e.g. from
+    /sf-compound) are copied to backup_dir first.
+    Returns (written, removed, backed_up) counts.
+    """
+    claude_dir = project_path / '.claude'
+    previous = (read_lock(project_path) or {}).get('files', {})
+    written = removed = backed_up = 0
+
+    def keep_local_edit(rel, dest, replacement=None):
+        nonlocal backed_up
+        current = hashlib.sha256(dest.read_bytes()).hexdigest()
+        if backup_dir is not None and current not in (previous.get(rel), replacement):
+            target = backup_dir / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(dest, target)
+            backed_up += 1
+        return current
+
+    for rel, digest in files.items():
+        dest = claude_dir / rel
+        if previous.get(rel) == digest and dest.exists() and not verify:
+            continue
+        if dest.exists() and keep_local_edit(rel, dest, digest) == digest:
+            continue
+        blob = store_object_path(store_dir, digest)
+        if not blob.exists():
+            raise FileNotFoundError(f"Blob for {rel} missing from store: {digest}")
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(blob, dest)
+        written += 1
+
+    for rel in previous:
+        dest = claude_dir / rel
+        if rel not in files and dest.exists():
+            keep_local_edit(rel, dest)
+            dest.unlink()
+            removed += 1
+
+    return written, removed, backed_up
+
 def create_command_stubs(commands_dir: Path):
     """Create minimal command stubs if full commands aren't available."""
     commands = {
@@ -788,9 +1171,12 @@ def setup_ai_agent(project_path: Path, agent: str):
 
     # For agents with full support, install commands, agents, and skills
     if config.get('full_support', False):
-        install_commands(project_path)
-        install_agents(project_path)
-        install_skills(project_path)
+        source = ensure_store_version()
+        install_commands(project_path, source)
+        install_agents(project_path, source)
+        install_skills(project_path, source)
+        if source is not None:
+            write_lock(project_path, __version__, installed_content(source.files))
 
     prompt_dir = project_path / config['prompt_dir']
     prompt_dir.mkdir(parents=True, exist_ok=True)
@@ -854,6 +1240,9 @@ def update_command(args):
     # Determine what to update
     update_all = not (args.commands_only or args.agents_only or args.skills_only)
 
+    # Install from the global content store when it is available
+    source = ensure_store_version()
+
     # Update commands
     if update_all or args.commands_only:
         print_info("Updating commands...")
@@ -867,7 +1256,7 @@ def update_command(args):
                 shutil.copy(cmd_file, backup_dir / cmd_file.name)
             print_info(f"Backed up existing commands to {backup_dir}")
 
-        if install_commands(project_path):
+        if install_commands(project_path, source):
             updated = True
         print()
 
@@ -888,7 +1277,7 @@ def update_command(args):
         if agents_dir.exists():
             shutil.rmtree(agents_dir)
 
-        if install_agents(project_path):
+        if install_agents(project_path, source):
             updated = True
         print()
 
@@ -909,10 +1298,23 @@ def update_command(args):
         if skills_dir.exists():
             shutil.rmtree(skills_dir)
 
-        if install_skills(project_path):
+        if install_skills(project_path, source):
             updated = True
         print()
 
+    # Pin the installed content so CI can restore it with 'sfce use'
+    if updated and source is not None and (project_path / '.specify').is_dir():
+        updated_dirs = [name for name, selected in (('commands', args.commands_only),
+                                                    ('agents', args.agents_only),
+                                                    ('skills', args.skills_only))
+                        if update_all or selected]
+        previous = (read_lock(project_path) or {}).get('files', {})
+        files = {rel: digest for rel, digest in previous.items()
+                 if rel.split('/', 1)[0] not in updated_dirs}
+        files.update({rel: digest for rel, digest in installed_content(source.files).items()
+                      if rel.split('/', 1)[0] in updated_dirs})
+        write_lock(project_path, __version__, files)
+
     if updated:
         print_success("Update complete!")
         print()
@@ -932,6 +1334,4199 @@ def update_command(args):
     return 0
 
 
+BUNDLE_MAIN = '''import sys
+
+import sfce
+
+if __name__ == '__main__':
+    sys.exit(sfce.main())
+'''
+
+# Plugin content validation
+
+# Required frontmatter fields per content kind
+CONTENT_SCHEMAS = {
+    'agent': ('name', 'description', 'scope'),
+    'skill': ('name', 'description', 'scope'),
+    'command': ('name', 'description'),
+}
+
+VALID_SCOPES = {
+    'APEX_ONLY', 'AUTOMATION_ONLY', 'LWC_ONLY', 'INTEGRATION_ONLY',
+    'ARCHITECTURE_UNIVERSAL', 'UNIVERSAL',
+}
+
+VALIDATION_RULES = {
+    'frontmatter-missing': 'File must start with a YAML frontmatter block',
+    'frontmatter-field': 'Required frontmatter field is missing or empty',
+    'name-mismatch': 'Frontmatter name must match the file or directory name',
+    'invalid-scope': 'Frontmatter scope must be a known routing scope',
+    'index-missing-entry': 'Content file is not listed in its index',
+    'index-stale-entry': 'Index lists a file that does not exist',
+    'broken-link': 'Referenced agent, skill or command path does not exist',
+    'unknown-command': 'Referenced slash command does not exist',
+}
+
+# Bump when checks change so cached results are discarded
+VALIDATOR_VERSION = 1
+
+def parse_frontmatter(text: str):
+    """Parse top-level ``key: value`` pairs from a markdown frontmatter block.
+
+    Returns (fields, end_line) or (None, 0) when there is no frontmatter.
+    Nested values (e.g. command ``arguments``) are recorded as present but empty.
+    """
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != '---':
+        return None, 0
+    fields = {}
+    for number, line in enumerate(lines[1:], start=2):
+        if line.strip() == '---':
+            return fields, number
+        match = re.match(r'^([A-Za-z_][\w-]*):\s*(.*)$', line)
+        if match:
+            fields[match.group(1)] = match.group(2).strip().strip('"\'')
+    return None, 0
+
+def content_kind(rel: str):
+    """Classify a content path as agent, skill, command, index or None."""
+    parts = rel.split('/')
+    if parts[-1] == 'index.md' and len(parts) == 2:
+        return 'index'
+    if parts[0] == 'agents' and len(parts) == 3:
+        return 'agent'
+    if parts[0] == 'skills' and len(parts) == 3 and parts[2] == 'SKILL.md':
+        return 'skill'
+    if parts[0] == 'commands' and len(parts) == 2:
+        return 'command'
+    return None
+
+def validate_content_file(rel: str, text: str, files: frozenset):
+    """Run schema, index and link checks for one file. Returns a list of findings."""
+    findings = []
+
+    def report(rule, line, message, level='error'):
+        findings.append({'rule': rule, 'level': level, 'file': rel, 'line': line, 'message': message})
+
+    kind = content_kind(rel)
+    lines = text.splitlines()
+
+    if kind in CONTENT_SCHEMAS:
+        fields, _ = parse_frontmatter(text)
+        if fields is None:
+            report('frontmatter-missing', 1, 'Missing frontmatter block')
+        else:
+            for field in CONTENT_SCHEMAS[kind]:
+                if not fields.get(field):
+                    report('frontmatter-field', 1, f"Missing frontmatter field: {field}")
+            parts = rel.split('/')
+            expected = parts[1] if kind == 'skill' else parts[-1][:-len('.md')]
+            if fields.get('name') and fields['name'] != expected:
+                report('name-mismatch', 1, f"name '{fields['name']}' does not match '{expected}'")
+            if fields.get('scope') and fields['scope'] not in VALID_SCOPES:
+                report('invalid-scope', 1, f"Unknown scope: {fields['scope']}")
+
+    if kind == 'index':
+        section = rel.split('/')[0]
+        if section == 'agents':
+            pattern = r'`([a-z0-9-]+/[a-z0-9-]+\.md)`'
+            actual = {f[len('agents/'):] for f in files if content_kind(f) == 'agent'}
+        else:
+            pattern = r'`([a-z0-9-]+/SKILL\.md)`'
+            actual = {f[len('skills/'):] for f in files if content_kind(f) == 'skill'}
+        listed = {}
+        for number, line in enumerate(lines, start=1):
+            for entry in re.findall(pattern, line):
+                listed.setdefault(entry, number)
+        for entry, number in sorted(listed.items()):
+            if entry not in actual:
+                report('index-stale-entry', number, f"Index lists missing file: {section}/{entry}")
+        for entry in sorted(actual - set(listed)):
+            report('index-missing-entry', 1, f"{section}/{entry} is not listed in the index")
+
+    commands = {f.split('/')[-1][:-len('.md')] for f in files if content_kind(f) == 'command'}
+    for number, line in enumerate(lines, start=1):
+        for ref in re.findall(r'`([^`\s]+)`', line):
+            match = re.match(r'^(?:\.claude/)?((?:agents|skills|commands)/\S+)$', ref)
+            if not match:
+                continue
+            target = match.group(1).rstrip('/')
+            if '*' in target:
+                found = any(fnmatch.fnmatch(f, target) for f in files)
+            else:
+                found = target in files or any(f.startswith(target + '/') for f in files)
+            if not found:
+                report('broken-link', number, f"Reference does not resolve: {ref}")
+        for name in re.findall(r'(?<![\w./-])/(sf-[a-z][a-z0-9-]*)', line):
+            if name not in commands:
+                report('unknown-command', number, f"Unknown command: /{name}")
+
+    return findings
+
+def validate_content(root, cache_path: Path = None, workers: int = None):
+    """Validate all content under root concurrently, reusing cached results.
+
+    Results are cached per (path, content hash, file set); after a small edit
+    only the edited file is re-checked. Returns (findings, checked, cached).
+    """
+    entries = [(rel, resource.read_bytes()) for rel, resource in iter_content_files(root)]
+    files = frozenset(rel for rel, _ in entries)
+    tree_digest = hashlib.sha256('\n'.join(sorted(files)).encode()).hexdigest()
+
+    cache = {}
+    if cache_path and cache_path.exists():
+        try:
+            data = json.loads(cache_path.read_text())
+            if data.get('version') == VALIDATOR_VERSION:
+                cache = data.get('entries', {})
+        except (OSError, ValueError):
+            cache = {}
+
+    keys = {rel: hashlib.sha256(f"{rel}\0{tree_digest}\0".encode() + data).hexdigest()
+            for rel, data in entries}
+    pending = [(rel, data) for rel, data in entries if keys[rel] not in cache]
+
+    results = {keys[rel]: cache[keys[rel]] for rel, _ in entries if keys[rel] in cache}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(validate_content_file, rel, data.decode('utf-8', 'replace'), files): rel
+                   for rel, data in pending}
+        for future in concurrent.futures.as_completed(futures):
+            results[keys[futures[future]]] = future.result()
+
+    if cache_path and pending:
+        try:
+            write_atomic(cache_path, json.dumps({'version': VALIDATOR_VERSION, 'entries': results}).encode())
+        except OSError:
+            pass
+
+    findings = [finding for rel, _ in entries for finding in results[keys[rel]]]
+    return findings, len(pending), len(entries) - len(pending)
+
+def findings_to_sarif(findings, base_uri: str = None) -> dict:
+    """Render validation findings as a SARIF 2.1.0 log."""
+    rule_ids = sorted({f['rule'] for f in findings})
+    run = {
+        'tool': {'driver': {
+            'name': 'sfce',
+            'version': __version__,
+            'informationUri': 'https://github.com/gellasangameshgupta/sf-compound-engineering-plugin',
+            'rules': [{'id': rule, 'shortDescription': {'text': VALIDATION_RULES.get(rule, rule)}}
+                      for rule in rule_ids],
+        }},
+        'results': [{
+            'ruleId': f['rule'],
+            'ruleIndex': rule_ids.index(f['rule']),
+            'level': f['level'],
+            'message': {'text': f['message']},
+            'locations': [{'physicalLocation': {
+                'artifactLocation': {'uri': f['file'], **({'uriBaseId': 'SRCROOT'} if base_uri else {})},
+                'region': {'startLine': f['line']},
+            }}],
+        } for f in findings],
+    }
+    if base_uri:
+        run['originalUriBaseIds'] = {'SRCROOT': {'uri': base_uri}}
+    return {
+        '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+        'version': '2.1.0',
+        'runs': [run],
+    }
+
+def validate_command(args):
+    """Validate agents, skills, commands and their indexes."""
+    if args.path:
+        root = Path(args.path).resolve()
+        # Accept a project directory with installed content in .claude/
+        if not any((root / name).is_dir() for name in CONTENT_DIRS) and (root / '.claude').is_dir():
+            root = root / '.claude'
+    else:
+        root = get_package_root()
+
+    cache_path = None if args.no_cache else get_cache_dir() / 'validate.json'
+    started = time.perf_counter()
+    findings, checked, cached = validate_content(root, cache_path, args.jobs)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    errors = sum(1 for f in findings if f['level'] == 'error')
+    if args.format == 'sarif':
+        base_uri = Path(str(root)).as_uri() + '/' if isinstance(root, Path) else None
+        output = json.dumps(findings_to_sarif(findings, base_uri), indent=2)
+    elif args.format == 'json':
+        output = json.dumps(findings, indent=2)
+    else:
+        output = None
+        for f in findings:
+            print_error(f"{f['file']}:{f['line']}: [{f['rule']}] {f['message']}")
+        summary = f"{checked + cached} files validated ({checked} checked, {cached} cached) in {elapsed:.0f} ms"
+        if errors:
+            print_error(f"{errors} problem(s) found; {summary}")
+        else:
+            print_success(f"No problems found; {summary}")
+
+    if output is not None:
+        if args.output:
+            Path(args.output).write_text(output + '\n')
+        else:
+            print(output)
+
+    return 1 if errors else 0
+
+# Salesforce project helpers
+
+def get_project_cache_dir(project_path: Path) -> Path:
+    """Return the project-local cache directory (.sfce/), ignored by git."""
+    cache_dir = project_path / '.sfce'
+    if not cache_dir.is_dir():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        (cache_dir / '.gitignore').write_text('*\n')
+    return cache_dir
+
+def get_package_directories(project_path: Path):
+    """Return the source directories declared in sfdx-project.json.
+
+    Falls back to force-app/ when the project file is missing or unreadable.
+    """
+    project_file = project_path / 'sfdx-project.json'
+    paths = []
+    if project_file.exists():
+        try:
+            config = json.loads(project_file.read_text())
+            paths = [entry['path'] for entry in config.get('packageDirectories', []) if entry.get('path')]
+        except (OSError, ValueError, TypeError):
+            print_warning(f"Could not parse {project_file}, defaulting to force-app/")
+    if not paths:
+        paths = ['force-app']
+    return [project_path / path for path in paths if (project_path / path).is_dir()]
+
+# Ignore rules (.gitignore / .forceignore syntax)
+
+DEFAULT_IGNORES = ('.git/', '.sfce/', '.sfdx/', '.sf/', 'node_modules/')
+
+def gitignore_regex(pattern: str):
+    """Translate one gitignore pattern (without '!' or trailing '/') to a regex."""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    out, i = '', 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            out += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            out += '/.*'
+            i += 3
+        elif pattern.startswith('**', i):
+            out += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            out += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            out += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+            end = pattern.index(']', i + 1)
+            out += '[' + pattern[i + 1:end].replace('!', '^', 1) + ']'
+            i = end + 1
+        else:
+            out += re.escape(pattern[i])
+            i += 1
+    return re.compile(('^' if anchored else '^(?:.*/)?') + out + '$')
+
+class IgnoreRules:
+    """Gitignore-style matcher for project-relative posix paths (last match wins)."""
+
+    def __init__(self, lines=()):
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            self.rules.append((gitignore_regex(line.rstrip('/')), negate, dir_only))
+
+    @classmethod
+    def for_project(cls, project_path: Path):
+        """Load DEFAULT_IGNORES plus the project's root .gitignore and .forceignore."""
+        lines = list(DEFAULT_IGNORES)
+        for name in ('.gitignore', '.forceignore'):
+            path = project_path / name
+            if path.is_file():
+                lines += path.read_text(errors='replace').splitlines()
+        return cls(lines)
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        result = False
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                result = not negate
+        return result
+
+# Cached project walk (.sfce/walk.json)
+#
+# Each directory's listing is cached with its mtime. On a warm run an
+# unchanged directory costs one stat() instead of a scandir(), so large
+# repositories are re-walked in milliseconds. As with any mtime-keyed cache,
+# a file rewritten in place keeps its cached size until its directory changes.
+
+WALK_CACHE_VERSION = 1
+
+def scan_project(project_path: Path):
+    """Walk the package directories with os.scandir, honouring ignore rules.
+
+    Returns (dirs, stats) where dirs maps a project-relative directory to
+    {'files': [[name, size], ...], 'dirs': [name, ...]}.
+    """
+    rules_key = hashlib.sha256()
+    for name in ('.gitignore', '.forceignore', 'sfdx-project.json'):
+        path = project_path / name
+        rules_key.update(path.read_bytes() if path.is_file() else b'\0')
+    rules_key = rules_key.hexdigest()
+
+    cache_path = get_project_cache_dir(project_path) / 'walk.json'
+    cached = {}
+    if cache_path.exists():
+        try:
+            data = json.loads(cache_path.read_text())
+            if data.get('version') == WALK_CACHE_VERSION and data.get('rules') == rules_key:
+                cached = data['dirs']
+        except (OSError, ValueError, KeyError):
+            cached = {}
+
+    rules = IgnoreRules.for_project(project_path)
+    dirs = {}
+    stats = {'dirs': 0, 'files': 0, 'scanned': 0, 'cached': 0}
+    pending = [p.relative_to(project_path).as_posix() for p in get_package_directories(project_path)]
+    while pending:
+        rel_dir = pending.pop()
+        abs_dir = project_path / rel_dir
+        try:
+            mtime_ns = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            continue
+        entry = cached.get(rel_dir)
+        if entry is not None and entry['mtime_ns'] == mtime_ns:
+            stats['cached'] += 1
+        else:
+            entry = {'mtime_ns': mtime_ns, 'files': [], 'dirs': []}
+            with os.scandir(abs_dir) as it:
+                for item in it:
+                    rel = f"{rel_dir}/{item.name}"
+                    is_dir = item.is_dir(follow_symlinks=False)
+                    if rules.ignored(rel, is_dir):
+                        continue
+                    if is_dir:
+                        entry['dirs'].append(item.name)
+                    elif item.is_file():
+                        entry['files'].append([item.name, item.stat().st_size])
+            entry['files'].sort()
+            entry['dirs'].sort()
+            stats['scanned'] += 1
+        dirs[rel_dir] = entry
+        stats['dirs'] += 1
+        stats['files'] += len(entry['files'])
+        pending += [f"{rel_dir}/{name}" for name in entry['dirs']]
+
+    if stats['scanned'] or len(dirs) != len(cached):
+        write_atomic(cache_path, json.dumps({'version': WALK_CACHE_VERSION, 'rules': rules_key,
+                                             'dirs': dirs}, separators=(',', ':')).encode())
+    return dirs, stats
+
+def iter_project_files(project_path: Path, suffixes=None):
+    """Yield (relative posix path, size) for non-ignored files in package directories."""
+    dirs, _ = scan_project(project_path)
+    for rel_dir in sorted(dirs):
+        for name, size in dirs[rel_dir]['files']:
+            if suffixes is None or name.endswith(suffixes):
+                yield f"{rel_dir}/{name}", size
+
+def iter_apex_files(project_path: Path):
+    """Yield Apex class and trigger files under the project's package directories."""
+    for rel, _ in iter_project_files(project_path, ('.cls', '.trigger')):
+        yield project_path / rel
+
+# Salesforce metadata types by source-format file suffix:
+# suffix -> (metadata type, inventory category)
+METADATA_SUFFIXES = {
+    '.cls': ('ApexClass', 'APEX'),
+    '.trigger': ('ApexTrigger', 'APEX'),
+    '.page': ('ApexPage', 'APEX'),
+    '.component': ('ApexComponent', 'APEX'),
+    '.flow-meta.xml': ('Flow', 'AUTOMATION'),
+    '.workflow-meta.xml': ('Workflow', 'AUTOMATION'),
+    '.validationRule-meta.xml': ('ValidationRule', 'AUTOMATION'),
+    '.object-meta.xml': ('CustomObject', 'ARCHITECTURE'),
+    '.field-meta.xml': ('CustomField', 'ARCHITECTURE'),
+    '.recordType-meta.xml': ('RecordType', 'ARCHITECTURE'),
+    '.listView-meta.xml': ('ListView', 'ARCHITECTURE'),
+    '.compactLayout-meta.xml': ('CompactLayout', 'ARCHITECTURE'),
+    '.webLink-meta.xml': ('WebLink', 'ARCHITECTURE'),
+    '.fieldSet-meta.xml': ('FieldSet', 'ARCHITECTURE'),
+    '.businessProcess-meta.xml': ('BusinessProcess', 'ARCHITECTURE'),
+    '.sharingReason-meta.xml': ('SharingReason', 'ARCHITECTURE'),
+    '.index-meta.xml': ('Index', 'ARCHITECTURE'),
+    '.layout-meta.xml': ('Layout', 'ARCHITECTURE'),
+    '.globalValueSet-meta.xml': ('GlobalValueSet', 'ARCHITECTURE'),
+    '.standardValueSet-meta.xml': ('StandardValueSet', 'ARCHITECTURE'),
+    '.md-meta.xml': ('CustomMetadata', 'ARCHITECTURE'),
+    '.permissionset-meta.xml': ('PermissionSet', 'SECURITY'),
+    '.permissionsetgroup-meta.xml': ('PermissionSetGroup', 'SECURITY'),
+    '.profile-meta.xml': ('Profile', 'SECURITY'),
+    '.sharingRules-meta.xml': ('SharingRules', 'SECURITY'),
+    '.customPermission-meta.xml': ('CustomPermission', 'SECURITY'),
+    '.role-meta.xml': ('Role', 'SECURITY'),
+    '.group-meta.xml': ('Group', 'SECURITY'),
+    '.queue-meta.xml': ('Queue', 'SECURITY'),
+    '.namedCredential-meta.xml': ('NamedCredential', 'INTEGRATION'),
+    '.externalCredential-meta.xml': ('ExternalCredential', 'INTEGRATION'),
+    '.remoteSite-meta.xml': ('RemoteSiteSetting', 'INTEGRATION'),
+    '.cspTrustedSite-meta.xml': ('CspTrustedSite', 'INTEGRATION'),
+    '.connectedApp-meta.xml': ('ConnectedApp', 'INTEGRATION'),
+    '.platformEventChannel-meta.xml': ('PlatformEventChannel', 'INTEGRATION'),
+    '.flexipage-meta.xml': ('FlexiPage', 'UI'),
+    '.tab-meta.xml': ('CustomTab', 'UI'),
+    '.app-meta.xml': ('CustomApplication', 'UI'),
+    '.quickAction-meta.xml': ('QuickAction', 'UI'),
+    '.labels-meta.xml': ('CustomLabels', 'UI'),
+    '.email-meta.xml': ('EmailTemplate', 'UI'),
+    '.resource-meta.xml': ('StaticResource', 'UI'),
+}
+
+# Bundle types: every file under <dir>/<bundle>/ belongs to one component
+METADATA_BUNDLES = {
+    'lwc': ('LightningComponentBundle', 'LWC'),
+    'aura': ('AuraDefinitionBundle', 'LWC'),
+    'staticresources': ('StaticResource', 'UI'),
+}
+
+# Types decomposed under objects/<Object>/<folder>/ whose member name is Object.Child
+DECOMPOSED_OBJECT_TYPES = {
+    'CustomField', 'RecordType', 'ListView', 'CompactLayout', 'WebLink', 'FieldSet',
+    'BusinessProcess', 'SharingReason', 'ValidationRule', 'Index',
+}
+
+def classify_metadata(rel: str):
+    """Map a source-format path to (type, member, category, primary).
+
+    primary is False for companion files (.cls-meta.xml, bundle parts other
+    than the bundle's own -meta.xml) so each component is counted once.
+    Returns None for files that are not recognised metadata.
+    """
+    parts = rel.split('/')
+    name = parts[-1]
+    for folder, (mtype, category) in METADATA_BUNDLES.items():
+        if folder in parts[:-1]:
+            position = len(parts) - 1 - parts[::-1].index(folder)
+            if position + 1 < len(parts) - 1:
+                bundle = parts[position + 1]
+                primary = name == f"{bundle}.js-meta.xml" or name.startswith(f"{bundle}.") and name.endswith('-meta.xml')
+                return mtype, bundle, category, primary
+            if folder == 'staticresources':
+                break  # single-file static resource: fall through to suffix table
+    companion = False
+    if name.endswith('-meta.xml') and not name.endswith(tuple(s for s in METADATA_SUFFIXES if s.endswith('-meta.xml'))):
+        name, companion = name[:-len('-meta.xml')], True
+    for suffix, (mtype, category) in METADATA_SUFFIXES.items():
+        if name.endswith(suffix):
+            member = name[:-len(suffix)]
+            if mtype in DECOMPOSED_OBJECT_TYPES and 'objects' in parts[:-2]:
+                member = f"{parts[-3]}.{member}"
+            return mtype, member, category, not companion
+    return None
+
+# Inventory categories -> command task classification
+INVENTORY_CLASSIFICATION = {
+    'APEX': 'APEX', 'LWC': 'LWC', 'AUTOMATION': 'AUTOMATION', 'INTEGRATION': 'INTEGRATION',
+    'ARCHITECTURE': 'ARCHITECTURE', 'SECURITY': 'ARCHITECTURE', 'UI': 'LWC',
+}
+
+def build_inventory(project_path: Path) -> dict:
+    """Count metadata components and bytes by type for a Salesforce DX project."""
+    started = time.perf_counter()
+    dirs, stats = scan_project(project_path)
+    types, other = {}, {'files': 0, 'bytes': 0}
+    for rel_dir, entry in dirs.items():
+        for name, size in entry['files']:
+            info = classify_metadata(f"{rel_dir}/{name}")
+            if info is None:
+                other['files'] += 1
+                other['bytes'] += size
+                continue
+            mtype, _, category, primary = info
+            record = types.setdefault(mtype, {'category': category, 'count': 0, 'files': 0, 'bytes': 0})
+            record['count'] += primary
+            record['files'] += 1
+            record['bytes'] += size
+
+    categories = {}
+    for record in types.values():
+        summary = categories.setdefault(record['category'], {'count': 0, 'bytes': 0})
+        summary['count'] += record['count']
+        summary['bytes'] += record['bytes']
+    classification = {}
+    for category, summary in categories.items():
+        key = INVENTORY_CLASSIFICATION[category]
+        classification[key] = classification.get(key, 0) + summary['count']
+
+    return {
+        'project': str(project_path),
+        'package_directories': [p.relative_to(project_path).as_posix()
+                                for p in get_package_directories(project_path)],
+        'types': dict(sorted(types.items(), key=lambda item: (-item[1]['count'], item[0]))),
+        'categories': dict(sorted(categories.items(), key=lambda item: -item[1]['count'])),
+        'classification': dict(sorted(classification.items(), key=lambda item: -item[1])),
+        'other': other,
+        'walk': dict(stats, elapsed_ms=round((time.perf_counter() - started) * 1000, 1)),
+    }
+
+def inventory_command(args):
+    """Summarize the metadata in a Salesforce DX project."""
+    project_path = Path(args.path).resolve()
+    if not get_package_directories(project_path):
+        print_error(f"No package directories found in {project_path} (sfdx-project.json or force-app/)")
+        return 1
+    inventory = build_inventory(project_path)
+    if args.json:
+        print(json.dumps(inventory, indent=2))
+        return 0
+
+    print_info(f"Package directories: {', '.join(inventory['package_directories'])}")
+    print(f"\n{'TYPE':<28} {'CATEGORY':<13} {'COUNT':>7} {'FILES':>7} {'SIZE':>10}")
+    for mtype, record in inventory['types'].items():
+        print(f"{mtype:<28} {record['category']:<13} {record['count']:>7,} {record['files']:>7,} "
+              f"{format_size(record['bytes']):>10}")
+    if inventory['other']['files']:
+        print(f"{'(other files)':<28} {'':<13} {'':>7} {inventory['other']['files']:>7,} "
+              f"{format_size(inventory['other']['bytes']):>10}")
+    print()
+    mix = ', '.join(f"{key} {count}" for key, count in inventory['classification'].items())
+    print_info(f"Component mix by classification: {mix or 'none'}")
+    walk = inventory['walk']
+    print_success(f"Walked {walk['files']:,} files in {walk['dirs']:,} directories "
+                  f"({walk['cached']:,} cached, {walk['scanned']:,} scanned) in {walk['elapsed_ms']:.0f} ms")
+    return 0
+
+# Apex source analysis (regex based: no compiler or org required)
+
+APEX_NOISE_RE = re.compile(r"//[^\n]*|/\*.*?\*/|'(?:\\.|[^'\\\n])*'", re.DOTALL)
+APEX_KEYWORDS = {
+    'if', 'for', 'while', 'do', 'catch', 'switch', 'when', 'return', 'new', 'else',
+    'try', 'finally', 'throw', 'get', 'set',
+}
+APEX_DML_OPS = ('insert', 'update', 'upsert', 'delete', 'undelete', 'merge')
+
+def strip_apex(text: str) -> str:
+    """Blank out comments and string literals, keeping offsets and line numbers."""
+    def blank(match):
+        token = match.group(0)
+        body = re.sub(r'[^\n]', ' ', token)
+        return f"'{body[1:-1]}'" if token.startswith("'") else body
+    return APEX_NOISE_RE.sub(blank, text)
+
+def line_at(text: str, offset: int) -> int:
+    return text.count('\n', 0, offset) + 1
+
+def match_brace(text: str, start: int) -> int:
+    """Return the offset just past the brace that closes text[start] ('{')."""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == '{':
+            depth += 1
+        elif text[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(text)
+
+def base_type(name: str) -> str:
+    """Reduce 'List<Account>' / 'Account[]' / 'Map<Id, Account>' to the element type."""
+    name = name.strip()
+    generic = re.match(r'^(?:[\w.]+)\s*<(.*)>$', name)
+    if generic:
+        return base_type(generic.group(1).split(',')[-1])
+    return name.replace('[]', '').strip()
+
+def split_type_list(text: str):
+    """Split 'A, Database.Batchable<sObject>' into names without generic arguments."""
+    names, depth, current = [], 0, ''
+    for ch in text:
+        if ch == '<':
+            depth += 1
+        elif ch == '>':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            names.append(current)
+            current = ''
+            continue
+        if depth == 0 and ch != '>':
+            current += ch
+    names.append(current)
+    return [n.strip() for n in names if n.strip()]
+
+def parse_soql(query: str):
+    """Extract the object, selected fields and filtered fields from a SOQL query."""
+    match = re.match(r'\s*select\s+(.*?)\s+from\s+(\w+)(.*)$', query, re.IGNORECASE | re.DOTALL)
+    if not match:
+        return None
+    select, sobject, rest = match.groups()
+    depth, fields, current = 0, [], ''
+    for ch in select:
+        depth += ch == '('
+        depth -= ch == ')'
+        if ch == ',' and depth == 0:
+            fields.append(current.strip())
+            current = ''
+        elif depth == 0 and ch != ')':
+            current += ch
+    fields.append(current.strip())
+    where = re.search(r'\bwhere\b(.*?)(?:\b(?:order\s+by|group\s+by|limit|offset|for\s+update|with)\b|$)',
+                      rest, re.IGNORECASE | re.DOTALL)
+    filters = []
+    if where:
+        filters = re.findall(r'([A-Za-z_][\w.]*)\s*(?:=|!=|<>|<=|>=|<|>|\blike\b|\bnot\s+in\b|\bin\b|\bincludes\b|\bexcludes\b)',
+                             where.group(1), re.IGNORECASE)
+    return {
+        'object': sobject,
+        'fields': sorted({f for f in fields if re.match(r'^[A-Za-z_][\w.]*$', f)}),
+        'filters': sorted({f for f in filters if f.lower() not in ('and', 'or', 'not')}),
+    }
+
+def find_loop_regions(code: str):
+    """Return (start, end) offsets of for/while/do loop bodies.
+
+    The loop header itself is excluded, so a SOQL for-loop's query counts once.
+    """
+    regions = []
+    for match in re.finditer(r'\b(?:for|while)\s*\(|\bdo\s*\{', code):
+        if match.group(0).startswith('do'):
+            regions.append((match.end() - 1, match_brace(code, match.end() - 1)))
+            continue
+        depth, i = 0, match.end() - 1
+        while i < len(code):
+            depth += code[i] == '('
+            depth -= code[i] == ')'
+            if depth == 0:
+                break
+            i += 1
+        j = i + 1
+        while j < len(code) and code[j].isspace():
+            j += 1
+        if j >= len(code) or code[j] == ';':
+            continue  # do { } while (...); tail
+        if code[j] == '{':
+            regions.append((j, match_brace(code, j)))
+        else:
+            regions.append((j, code.find(';', j) + 1 or len(code)))
+    return regions
+
+# Governor-limited operations detected in Apex source, keyed by limit metric
+APEX_LIMIT_OPS = {
+    'soql': r'\[\s*select\b|\bDatabase\s*\.\s*(?:query|queryWithBinds|getQueryLocator)\s*\(',
+    'sosl': r'\[\s*find\b|\bSearch\s*\.\s*query\s*\(',
+    'callouts': r'\.\s*send\s*\(',
+    'queueable': r'\bSystem\s*\.\s*enqueueJob\s*\(',
+    'email': r'\bMessaging\s*\.\s*sendEmail\s*\(',
+    'publish': r'\bEventBus\s*\.\s*publish\s*\(',
+}
+
+def parse_apex(text: str) -> dict:
+    """Extract symbols from one Apex class or trigger file.
+
+    Returns classes (with extends/implements and methods), an optional trigger,
+    SOQL queries, DML targets, callout counts and referenced identifiers. Each
+    method (and the trigger body) also lists its limit-consuming operations and
+    outgoing calls with their loop nesting depth, for call-graph estimates.
+    """
+    code = strip_apex(text)
+    result = {'classes': [], 'trigger': None, 'soql': [], 'dml': [], 'callouts': 0,
+              'is_test': False, 'refs': []}
+    bodies = []  # (start, end, record) for methods and the trigger body
+
+    trigger = re.search(r'\btrigger\s+(\w+)\s+on\s+(\w+)\s*\(([^)]*)\)\s*\{', code, re.IGNORECASE)
+    if trigger:
+        result['trigger'] = {
+            'name': trigger.group(1),
+            'object': trigger.group(2),
+            'events': [e.strip().lower() for e in trigger.group(3).split(',') if e.strip()],
+            'line': line_at(code, trigger.start()),
+            'ops': {},
+            'calls': [],
+        }
+        bodies.append((trigger.end() - 1, match_brace(code, trigger.end() - 1), result['trigger']))
+
+    decl_re = re.compile(r'\b(class|interface|enum)\s+(\w+)((?:\s+(?:extends|implements)\s+[\w.<>,\s]+?)*)\s*\{',
+                         re.IGNORECASE)
+    class_spans = []
+    for match in decl_re.finditer(code):
+        clauses = match.group(3) or ''
+        extends = re.search(r'\bextends\s+([\w.<>,\s]+?)(?=\s+implements\b|$)', clauses, re.IGNORECASE)
+        implements = re.search(r'\bimplements\s+([\w.<>,\s]+?)(?=\s+extends\b|$)', clauses, re.IGNORECASE)
+        prelude = code[max(0, match.start() - 200):match.start()]
+        prelude = prelude[prelude.rfind(';') + 1:].rsplit('}', 1)[-1]
+        body_start = match.end() - 1
+        body_end = match_brace(code, body_start)
+        result['classes'].append({
+            'name': match.group(2),
+            'kind': match.group(1).lower(),
+            'line': line_at(code, match.start()),
+            'extends': split_type_list(extends.group(1))[0] if extends else None,
+            'implements': split_type_list(implements.group(1)) if implements else [],
+            'is_test': bool(re.search(r'@istest\b', prelude, re.IGNORECASE)),
+            'methods': [],
+        })
+        class_spans.append((body_start, body_end, result['classes'][-1]))
+    result['is_test'] = bool(result['classes']) and result['classes'][0]['is_test']
+
+    method_re = re.compile(
+        r'([\w.]+(?:\s*<[\w.<>,\s]*>)?(?:\[\])?)\s+(\w+)\s*\(([^()]*)\)\s*(?:throws\s+[\w.,\s]+)?\{')
+    declared = set()
+    for match in method_re.finditer(code):
+        rtype, name = match.group(1), match.group(2)
+        if name.lower() in APEX_KEYWORDS or rtype.lower() in ('new', 'return', 'else', 'throw', 'class'):
+            continue
+        owner = None
+        for start, end, cls in class_spans:
+            if start < match.start() < end and (owner is None or start > owner[0]):
+                owner = (start, cls)
+        if owner is None:
+            continue
+        cls = owner[1]
+        prefix = code[max(0, match.start() - 300):match.start()]
+        prefix = re.split(r'[;{}]', prefix)[-1]
+        annotations = sorted({a.lower() for a in re.findall(r'@(\w+)', prefix)})
+        modifiers = prefix.lower().split() + [rtype.lower()]
+        access = [m for m in modifiers if m in ('global', 'public', 'protected', 'private', 'webservice')]
+        method = {
+            'name': name,
+            'line': line_at(code, match.start()),
+            'access': access[0] if access else 'private',
+            'constructor': name == cls['name'] and rtype.lower() in ('public', 'private', 'protected', 'global'),
+            'static': 'static' in modifiers,
+            'is_test': 'istest' in annotations or 'testmethod' in modifiers,
+            'annotations': [a for a in annotations if a != 'istest'],
+            'ops': {},
+            'calls': [],
+        }
+        cls['methods'].append(method)
+        declared.add(match.start(2))
+        bodies.append((match.end() - 1, match_brace(code, match.end() - 1), method))
+
+    loops = find_loop_regions(code)
+
+    def place(pos):
+        """Return (innermost method/trigger record, loop depth) for an offset."""
+        owner = None
+        for start, end, record in bodies:
+            if start < pos < end and (owner is None or start > owner[0]):
+                owner = (start, record)
+        depth = sum(1 for start, end in loops if start <= pos < end)
+        return (owner[1] if owner else None), depth
+
+    def add_op(kind, pos, sobject=None):
+        record, depth = place(pos)
+        if record is not None:
+            entry = [line_at(code, pos), depth]
+            if kind == 'dml':
+                entry.append(sobject)
+            record['ops'].setdefault(kind, []).append(entry)
+
+    soql_spans = []
+    for match in re.finditer(r'\[\s*(select\b[^\]]*)\]', code, re.IGNORECASE):
+        query = parse_soql(match.group(1))
+        if query:
+            query['line'] = line_at(code, match.start())
+            result['soql'].append(query)
+        soql_spans.append((match.start(), match.end()))
+    for match in re.finditer(r'\bDatabase\s*\.\s*(?:query|queryWithBinds|getQueryLocator)\s*\(', code, re.IGNORECASE):
+        result['soql'].append({'object': None, 'fields': [], 'filters': [], 'dynamic': True,
+                               'line': line_at(code, match.start())})
+    for kind, pattern in APEX_LIMIT_OPS.items():
+        for match in re.finditer(pattern, code, re.IGNORECASE):
+            add_op(kind, match.start())
+
+    var_types = {}
+    for match in re.finditer(r'\b([\w.]+(?:\s*<[\w.<>,\s]*>)?(?:\[\])?)\s+(\w+)\s*(?=[=;:,)])', code):
+        var_types.setdefault(match.group(2), base_type(match.group(1)))
+
+    def dml_target(expr: str):
+        expr = expr.strip()
+        new = re.match(r'new\s+([\w.]+(?:\s*<[\w.<>,\s]*>)?(?:\[\])?)', expr)
+        if new:
+            return base_type(new.group(1))
+        var = re.match(r'(\w+)', expr)
+        return var_types.get(var.group(1)) if var else None
+
+    in_soql = lambda pos: any(start <= pos < end for start, end in soql_spans)
+    dml_re = re.compile(r'(?<![\w.])(' + '|'.join(APEX_DML_OPS) + r')\s+(?!\()([^;]+);', re.IGNORECASE)
+    db_dml_re = re.compile(r'\bDatabase\s*\.\s*(' + '|'.join(APEX_DML_OPS) + r')(?:Async|Immediate)?\s*\(([^,)]*)',
+                           re.IGNORECASE)
+    for regex in (dml_re, db_dml_re):
+        for match in regex.finditer(code):
+            if in_soql(match.start()):
+                continue
+            sobject = dml_target(match.group(2))
+            result['dml'].append({'op': match.group(1).lower(), 'object': sobject,
+                                  'line': line_at(code, match.start())})
+            add_op('dml', match.start(), sobject)
+    result['dml'].sort(key=lambda d: d['line'])
+
+    # Outgoing calls: [receiver type ('' = same class), method, line, loop depth]
+    for match in re.finditer(r'(\bnew\s+)?(?:\b(\w+)\s*\.\s*)?\b(\w+)\s*\(', code):
+        if match.start(3) in declared or in_soql(match.start()):
+            continue
+        is_new, qualifier, name = match.group(1), match.group(2), match.group(3)
+        if name.lower() in APEX_KEYWORDS:
+            continue
+        record, depth = place(match.start())
+        if record is None:
+            continue
+        if is_new:
+            receiver = name  # constructor call, e.g. new Outer.Inner() -> Inner.Inner
+        elif qualifier is None or qualifier.lower() == 'this':
+            receiver = ''
+        else:
+            receiver = var_types.get(qualifier, qualifier)
+        record['calls'].append([receiver, name, line_at(code, match.start()), depth])
+
+    result['callouts'] = len(re.findall(APEX_LIMIT_OPS['callouts'], code))
+    # Apex identifiers are case-insensitive: refs are lower-case, whatever the spelling
+    own = {cls['name'].lower() for cls in result['classes']}
+    result['refs'] = sorted({name.lower() for name in re.findall(r'\b([A-Za-z_]\w*)\b', code)}
+                            - own - APEX_KEYWORDS)
+    return result
+
+def apex_objects(symbols: dict):
+    """Return the sObjects a file queries, writes or triggers on."""
+    objects = {q['object'] for q in symbols['soql'] if q.get('object')}
+    objects |= {d['object'] for d in symbols['dml'] if d.get('object')}
+    if symbols.get('trigger'):
+        objects.add(symbols['trigger']['object'])
+    return objects
+
+# On-disk Apex symbol index (.sfce/apex-index.json)
+
+APEX_INDEX_VERSION = 4
+
+def parse_apex_file(path: str) -> dict:
+    return parse_apex(Path(path).read_text(encoding='utf-8', errors='replace'))
+
+def load_apex_index(project_path: Path) -> dict:
+    path = get_project_cache_dir(project_path) / 'apex-index.json'
+    if path.exists():
+        try:
+            index = json.loads(path.read_text())
+            if index.get('version') == APEX_INDEX_VERSION:
+                return index
+        except ValueError:
+            pass
+    return {'version': APEX_INDEX_VERSION, 'files': {}, 'tests': {}}
+
+def update_apex_index(project_path: Path, force: bool = False, workers: int = None):
+    """Refresh the Apex index, re-parsing only files whose mtime or size changed.
+
+    Returns (index, parsed_count, removed_count).
+    """
+    index = {'version': APEX_INDEX_VERSION, 'files': {}, 'tests': {}} if force else load_apex_index(project_path)
+    previous = index['files']
+    files, pending = {}, []
+    for path in iter_apex_files(project_path):
+        rel = path.relative_to(project_path).as_posix()
+        st = path.stat()
+        entry = previous.get(rel)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            files[rel] = entry
+        else:
+            files[rel] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+            pending.append(rel)
+    removed = len(set(previous) - set(files))
+
+    if pending:
+        paths = [str(project_path / rel) for rel in pending]
+        if len(pending) < 32:
+            parsed = map(parse_apex_file, paths)
+            for rel, symbols in zip(pending, parsed):
+                files[rel]['symbols'] = symbols
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                for rel, symbols in zip(pending, pool.map(parse_apex_file, paths, chunksize=16)):
+                    files[rel]['symbols'] = symbols
+
+    if pending or removed or force:
+        index = {'version': APEX_INDEX_VERSION, 'files': files, 'tests': apex_test_map(files)}
+        write_atomic(get_project_cache_dir(project_path) / 'apex-index.json',
+                     json.dumps(index, separators=(',', ':')).encode())
+    return index, len(pending), removed
+
+def apex_test_map(files: dict) -> dict:
+    """Class -> test classes, keyed by lower-case class name (Apex names are case-insensitive)."""
+    class_names = {cls['name'].lower(): cls['name']
+                   for entry in files.values() for cls in entry['symbols']['classes']}
+    tests = {}
+    for entry in files.values():
+        symbols = entry['symbols']
+        if not symbols['is_test']:
+            continue
+        test_name = symbols['classes'][0]['name']
+        for ref in symbols['refs']:
+            target = class_names.get(ref.lower())
+            if target and target != test_name:
+                tests.setdefault(target.lower(), []).append(test_name)
+    return {name: sorted(set(names)) for name, names in sorted(tests.items())}
+
+def apex_index_at(project_path: Path, rev: str, workers: int = None) -> dict:
+    """Build (and cache by commit sha) the Apex index for a git revision."""
+    sha = git_rev_parse(project_path, rev)
+    if sha is None:
+        raise ValueError(f"not a git revision: {rev}")
+    cache_path = get_project_cache_dir(project_path) / 'apex-index' / f"{sha}.json"
+    if cache_path.exists():
+        try:
+            index = json.loads(cache_path.read_text())
+            if index.get('version') == APEX_INDEX_VERSION:
+                return index
+        except ValueError:
+            pass
+    paths = [rel for rel in git_source_files(project_path, sha) if rel.endswith(('.cls', '.trigger'))]
+    blobs = [(rel, data.decode('utf-8', 'replace'))
+             for rel, data in iter_git_blobs(project_path, sha, paths) if data is not None]
+    if len(blobs) < 32:
+        parsed = map(parse_apex, (text for _, text in blobs))
+        files = {rel: {'symbols': symbols} for (rel, _), symbols in zip(blobs, parsed)}
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = pool.map(parse_apex, (text for _, text in blobs), chunksize=16)
+            files = {rel: {'symbols': symbols} for (rel, _), symbols in zip(blobs, parsed)}
+    index = {'version': APEX_INDEX_VERSION, 'commit': sha, 'files': files, 'tests': apex_test_map(files)}
+    write_atomic(cache_path, json.dumps(index, separators=(',', ':')).encode())
+    return index
+
+def iter_apex_symbols(index: dict):
+    """Yield one record per top-level class or trigger in the index."""
+    for rel, entry in sorted(index['files'].items()):
+        symbols = entry['symbols']
+        objects = sorted(apex_objects(symbols))
+        if symbols['trigger']:
+            trig = symbols['trigger']
+            yield {'name': trig['name'], 'kind': 'trigger', 'file': rel, 'line': trig['line'],
+                   'object': trig['object'], 'events': trig['events'], 'objects': objects,
+                   'symbols': symbols}
+        for cls in symbols['classes'][:1]:
+            yield {'name': cls['name'], 'kind': cls['kind'], 'file': rel, 'line': cls['line'],
+                   'extends': cls['extends'], 'implements': cls['implements'],
+                   'is_test': symbols['is_test'], 'objects': objects, 'symbols': symbols}
+
+def type_matches(candidate: str, wanted: str) -> bool:
+    """Match 'Queueable' against 'Queueable' or 'Database.Batchable' against 'Batchable'."""
+    candidate, wanted = candidate.lower(), wanted.lower()
+    return candidate == wanted or candidate.rsplit('.', 1)[-1] == wanted.rsplit('.', 1)[-1]
+
+def index_command(args):
+    """Build or refresh an on-disk index (currently: Apex symbols)."""
+    project_path = Path(args.path).resolve()
+    started = time.perf_counter()
+    index, parsed, removed = update_apex_index(project_path, force=args.force, workers=args.jobs)
+    elapsed = (time.perf_counter() - started) * 1000
+    classes = sum(len(e['symbols']['classes'][:1]) for e in index['files'].values())
+    triggers = sum(1 for e in index['files'].values() if e['symbols']['trigger'])
+    tests = sum(1 for e in index['files'].values() if e['symbols']['is_test'])
+    print_success(f"Indexed {len(index['files'])} Apex files ({classes} classes, {triggers} triggers, "
+                  f"{tests} test classes): {parsed} parsed, {removed} removed in {elapsed:.0f} ms")
+    return 0
+
+def find_command(args):
+    """Query the Apex symbol index."""
+    project_path = Path(args.path).resolve()
+    if args.no_refresh:
+        index = load_apex_index(project_path)
+    else:
+        index, _, _ = update_apex_index(project_path)
+
+    results = []
+    for record in iter_apex_symbols(index):
+        symbols = record['symbols']
+        if args.name and not fnmatch.fnmatch(record['name'].lower(), args.name.lower()):
+            continue
+        if args.implements and not any(type_matches(i, args.implements) for i in record.get('implements', [])):
+            continue
+        if args.extends and not (record.get('extends') and type_matches(record['extends'], args.extends)):
+            continue
+        if args.touches and args.touches.lower() not in {o.lower() for o in record['objects']}:
+            continue
+        if args.queries and args.queries.lower() not in {(q['object'] or '').lower() for q in symbols['soql']}:
+            continue
+        if args.writes and args.writes.lower() not in {(d['object'] or '').lower() for d in symbols['dml']}:
+            continue
+        if args.trigger_on and not (record['kind'] == 'trigger' and record['object'].lower() == args.trigger_on.lower()):
+            continue
+        if args.tests_for and record['name'] not in index['tests'].get(args.tests_for.lower(), []):
+            continue
+        if args.tests is not None and bool(record.get('is_test')) != args.tests:
+            continue
+        results.append({key: value for key, value in record.items() if key != 'symbols'})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    for record in results:
+        detail = f"on {record['object']}" if record['kind'] == 'trigger' else ', '.join(record.get('implements', []))
+        print(f"{record['name']:<40} {record['kind']:<9} {record['file']}:{record['line']}  {detail}".rstrip())
+    if not results:
+        print_warning("No matching Apex symbols")
+    return 0
+
+# Static governor-limit estimation over the Apex call graph
+
+# Limit metric -> row label in skills/governor-limits/SKILL.md
+LIMIT_METRICS = {
+    'soql': 'Total SOQL queries',
+    'sosl': 'Total SOSL queries',
+    'dml': 'Total DML statements',
+    'callouts': 'Total callouts',
+    'future': 'Total future calls',
+    'queueable': 'Total queueable jobs',
+    'email': 'Total sendEmail methods',
+    'publish': 'Total event publishes',
+}
+
+SYNC_LIMITS = {'soql': 100, 'sosl': 20, 'dml': 150, 'callouts': 100, 'future': 50,
+               'queueable': 50, 'email': 10, 'publish': 150}
+ASYNC_LIMIT_OVERRIDES = {'soql': 200}
+
+# Async interfaces and the methods the platform runs in their own async transaction
+ASYNC_INTERFACES = {
+    'Queueable': ('execute',),
+    'Batchable': ('start', 'execute', 'finish'),
+    'Schedulable': ('execute',),
+}
+
+def load_limit_tables(project_path: Path = None):
+    """Return {'sync': {...}, 'async': {...}} limits.
+
+    Values come from the Synchronous/Asynchronous tables in the project's
+    governor-limits skill (.claude/skills/), so edits made by /sf-compound are
+    picked up; the packaged skill is used when the project has none.
+    Asynchronous limits that the skill does not list equal the synchronous ones.
+    """
+    parsed = {'sync': {}, 'async': {}}
+    labels = {label.lower(): metric for metric, label in LIMIT_METRICS.items()}
+    text = ''
+    roots = ([project_path / '.claude'] if project_path else []) + [get_package_root()]
+    for root in roots:
+        try:
+            text = (root / 'skills' / 'governor-limits' / 'SKILL.md').read_text(encoding='utf-8')
+            break
+        except (OSError, KeyError):
+            continue
+    section = None
+    for line in text.splitlines():
+        if line.startswith('#'):
+            heading = line.lower()
+            section = ('async' if 'asynchronous limits' in heading
+                       else 'sync' if 'synchronous limits' in heading else None)
+        elif section and line.startswith('|'):
+            cells = [cell.strip() for cell in line.strip().strip('|').split('|')]
+            metric = labels.get(cells[0].lower())
+            if metric and len(cells) > 1 and re.fullmatch(r'[\d,]+', cells[1]):
+                parsed[section][metric] = int(cells[1].replace(',', ''))
+    sync = dict(SYNC_LIMITS)
+    sync.update(parsed['sync'])
+    asynchronous = dict(sync)
+    asynchronous.update(ASYNC_LIMIT_OVERRIDES)
+    asynchronous.update(parsed['async'])
+    return {'sync': sync, 'async': asynchronous}
+
+class LimitEstimator:
+    """Propagate per-method operation counts along the Apex call graph.
+
+    Each operation or call inside N nested loops is multiplied by
+    loop_iterations ** N. DML on an sObject also runs that object's triggers
+    in the same transaction. @future methods and enqueued jobs run in their
+    own transactions and only count toward the future/queueable limits.
+    Recursive cycles are counted once.
+    """
+
+    def __init__(self, index: dict, loop_iterations: int = 200):
+        self.loop_iterations = loop_iterations
+        self.classes = {}
+        self.methods = {}
+        self.triggers = {}
+        self.triggers_by_object = {}
+        for rel, entry in index['files'].items():
+            symbols = entry['symbols']
+            trigger = symbols.get('trigger')
+            if trigger:
+                self.triggers[trigger['name'].lower()] = (trigger, rel)
+                self.triggers_by_object.setdefault(trigger['object'].lower(), []).append(trigger['name'].lower())
+            for cls in symbols['classes']:
+                self.classes[cls['name'].lower()] = (cls, rel)
+                for method in cls['methods']:
+                    key = f"{cls['name']}.{method['name']}".lower()
+                    self.methods.setdefault(key, []).append((cls, method, rel))
+        self.memo = {}
+
+    def is_async_class(self, cls: dict) -> bool:
+        return any(type_matches(i, name) for i in cls['implements'] for name in ASYNC_INTERFACES)
+
+    def is_async_entry(self, cls: dict, method: dict) -> bool:
+        """True for @future methods and the interface methods of Queueable/Batchable/Schedulable.
+
+        Other methods of an async class (static helpers called from a trigger,
+        for example) run in their caller's synchronous transaction.
+        """
+        if 'future' in method['annotations']:
+            return True
+        return any(type_matches(i, name) and method['name'].lower() in entry_methods
+                   for i in cls['implements'] for name, entry_methods in ASYNC_INTERFACES.items())
+
+    def resolve(self, class_name: str, receiver: str, name: str):
+        """Return the method key a call resolves to, walking superclasses."""
+        current = (receiver or class_name).lower()
+        seen = set()
+        while current and current not in seen:
+            seen.add(current)
+            key = f"{current}.{name}".lower()
+            if key in self.methods:
+                return key
+            parent = self.classes.get(current)
+            current = parent[0]['extends'].lower() if parent and parent[0]['extends'] else None
+        return None
+
+    def node(self, kind: str, key: str):
+        """Return (label, class name, ops, calls, rel) for a method or trigger node."""
+        if kind == 'trigger':
+            trigger, rel = self.triggers[key]
+            return trigger['name'], None, trigger['ops'], trigger['calls'], rel
+        entries = self.methods[key]
+        cls = entries[0][0]
+        ops, calls = {}, []
+        for _, method, rel in entries:  # overloads are merged (worst case)
+            for metric, items in method['ops'].items():
+                ops.setdefault(metric, []).extend(items)
+            calls.extend(method['calls'])
+        return f"{cls['name']}.{entries[0][1]['name']}", cls['name'], ops, calls, entries[0][2]
+
+    def estimate(self, kind: str, key: str, stack=()):
+        """Return (totals, contributions) for a node.
+
+        contributions maps metric -> [(amount, line, multiplier, child node or None)].
+        """
+        node_id = (kind, key)
+        if node_id in self.memo:
+            return self.memo[node_id]
+        if node_id in stack:
+            return {}, {}
+        stack = stack + (node_id,)
+        label, class_name, ops, calls, rel = self.node(kind, key)
+        totals, contributions = {}, {}
+
+        def add(metric, amount, line, multiplier, child=None):
+            if amount:
+                totals[metric] = totals.get(metric, 0) + amount
+                contributions.setdefault(metric, []).append((amount, line, multiplier, child))
+
+        for metric, items in ops.items():
+            for item in items:
+                line, depth = item[0], item[1]
+                multiplier = self.loop_iterations ** depth
+                if metric in LIMIT_METRICS:
+                    add(metric, multiplier, line, multiplier)
+                if metric == 'dml' and item[2]:
+                    for trigger_key in self.triggers_by_object.get(item[2].lower(), []):
+                        sub_totals, _ = self.estimate('trigger', trigger_key, stack)
+                        for sub_metric, amount in sub_totals.items():
+                            add(sub_metric, amount * multiplier, line, multiplier, ('trigger', trigger_key))
+
+        for receiver, name, line, depth in calls:
+            target = self.resolve(class_name or '', receiver, name)
+            if target is None or ('method', target) == node_id:
+                continue
+            multiplier = self.loop_iterations ** depth
+            callee = self.methods[target][0][1]
+            if 'future' in callee['annotations']:
+                add('future', multiplier, line, multiplier)
+                continue
+            sub_totals, _ = self.estimate('method', target, stack)
+            for metric, amount in sub_totals.items():
+                add(metric, amount * multiplier, line, multiplier, ('method', target))
+
+        self.memo[node_id] = (totals, contributions)
+        return totals, contributions
+
+    def worst_path(self, kind: str, key: str, metric: str):
+        """Follow the largest contribution to a metric down to the operation."""
+        steps, seen = [], set()
+        node_id = (kind, key)
+        while node_id and node_id not in seen:
+            seen.add(node_id)
+            label, _, _, _, rel = self.node(*node_id)
+            _, contributions = self.estimate(*node_id)
+            items = contributions.get(metric)
+            if not items:
+                break
+            amount, line, multiplier, child = max(items, key=lambda item: item[0])
+            loop = f" ×{multiplier}" if multiplier > 1 else ''
+            steps.append(f"{label} ({rel}:{line}{loop})")
+            node_id = child
+        return steps
+
+    def entry_points(self, target: str):
+        """Resolve a trigger, Class or Class.method name to (kind, key, context) entries."""
+        lowered = target.lower()
+        if lowered in self.triggers:
+            return [('trigger', lowered, 'sync')]
+        if lowered in self.methods:
+            cls = self.methods[lowered][0][0]
+            method = self.methods[lowered][0][1]
+            return [('method', lowered, 'async' if self.is_async_entry(cls, method) else 'sync')]
+        if lowered in self.classes:
+            cls = self.classes[lowered][0]
+            if self.is_async_class(cls):
+                names = [m['name'] for m in cls['methods'] if self.is_async_entry(cls, m)]
+                return [('method', f"{cls['name']}.{n}".lower(), 'async') for n in names]
+            entries = []
+            for method in cls['methods']:
+                exposed = method['access'] in ('public', 'global', 'webservice') or \
+                    {'auraenabled', 'invocablemethod', 'remoteaction'} & set(method['annotations'])
+                if exposed and not method['constructor'] and not method['is_test']:
+                    context = 'async' if 'future' in method['annotations'] else 'sync'
+                    entries.append(('method', f"{cls['name']}.{method['name']}".lower(), context))
+            return list(dict.fromkeys(entries))
+        return []
+
+def estimate_limits_command(args):
+    """Estimate worst-case governor-limit usage per transaction entry point."""
+    project_path = Path(args.path).resolve()
+    index, _, _ = update_apex_index(project_path)
+    estimator = LimitEstimator(index, args.loop_iterations)
+    limits = load_limit_tables(project_path)
+
+    targets = args.targets or sorted(trigger['name'] for trigger, _ in estimator.triggers.values())
+    if not targets:
+        print_warning("No Apex triggers found; pass a trigger or entry class name")
+        return 0
+
+    reports = []
+    for target in targets:
+        entries = estimator.entry_points(target)
+        if not entries:
+            print_error(f"Unknown trigger, class or method: {target}")
+            return 1
+        for kind, key, context in entries:
+            if args.context != 'auto':
+                context = args.context
+            totals, _ = estimator.estimate(kind, key)
+            label = estimator.node(kind, key)[0]
+            usage = []
+            for metric, label_text in LIMIT_METRICS.items():
+                worst = totals.get(metric, 0)
+                limit = limits[context][metric]
+                if worst:
+                    usage.append({
+                        'metric': metric,
+                        'label': label_text,
+                        'worst_case': worst,
+                        'limit': limit,
+                        'percent': round(100.0 * worst / limit, 1),
+                        'path': estimator.worst_path(kind, key, metric),
+                    })
+            reports.append({'entry': label, 'kind': kind, 'context': context, 'usage': usage})
+
+    exceeded = any(u['worst_case'] > u['limit'] for r in reports for u in r['usage'])
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return 1 if exceeded else 0
+
+    for report in reports:
+        context = 'synchronous' if report['context'] == 'sync' else 'asynchronous'
+        print(f"{Colors.BOLD}{report['entry']}{Colors.RESET} ({report['kind']}, {context} limits, "
+              f"loops ×{args.loop_iterations})")
+        if not report['usage']:
+            print_success("No governor-limited operations reachable")
+            print()
+            continue
+        print(f"  {'Limit':<26} {'Worst case':>12} {'Limit':>8} {'Usage':>8}")
+        for u in report['usage']:
+            status = '❌' if u['worst_case'] > u['limit'] else '⚠️ ' if u['percent'] >= args.warn_at else '  '
+            print(f"  {u['label']:<26} {u['worst_case']:>12,} {u['limit']:>8,} {u['percent']:>7.0f}% {status}")
+        for u in report['usage']:
+            if u['percent'] >= args.warn_at:
+                print(f"  {u['label']} path: " + ' → '.join(u['path']))
+        print()
+
+    if exceeded:
+        print_error("Worst-case usage exceeds governor limits")
+    else:
+        print_success("All entry points within governor limits")
+    return 1 if exceeded else 0
+
+# Structured review findings (JSON Lines)
+#
+# One finding per line, as emitted by review agents:
+#   {"agent": "apex-security-sentinel", "rule": "soql-injection", "severity": "CRITICAL",
+#    "file": "force-app/main/default/classes/Foo.cls", "line": 12, "end_line": 14,
+#    "title": "Dynamic SOQL built from user input", "fix": "Use bind variables"}
+# Required: rule, severity, file, title. Lines that are not JSON objects are ignored,
+# so raw agent output that mixes markdown and JSONL can be merged directly.
+
+SEVERITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'INFO')
+SEVERITY_ALIASES = {'BLOCKER': 'CRITICAL', 'ERROR': 'HIGH', 'MAJOR': 'HIGH', 'WARNING': 'MEDIUM',
+                    'WARN': 'MEDIUM', 'MINOR': 'LOW', 'NOTE': 'INFO', 'INFORMATION': 'INFO'}
+
+def normalize_finding(raw: dict):
+    """Validate and normalize one finding; returns None if it is unusable."""
+    if not isinstance(raw, dict) or not raw.get('file') or not (raw.get('rule') or raw.get('title')):
+        return None
+    severity = str(raw.get('severity', 'MEDIUM')).upper()
+    severity = SEVERITY_ALIASES.get(severity, severity)
+    if severity not in SEVERITIES:
+        severity = 'MEDIUM'
+    try:
+        line = int(raw.get('line') or 0)
+        end_line = max(int(raw.get('end_line') or line), line)
+    except (TypeError, ValueError):
+        line = end_line = 0
+    title = str(raw.get('title') or raw.get('message') or raw['rule'])
+    rule = str(raw.get('rule') or re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-'))
+    agent = raw.get('agent')
+    return {
+        'rule': rule,
+        'severity': severity,
+        'file': Path(str(raw['file'])).as_posix(),  # also drops a leading ./
+        'line': line,
+        'end_line': end_line,
+        'title': title,
+        'message': raw.get('message') or '',
+        'fix': raw.get('fix') or '',
+        'agents': sorted(set(raw.get('agents') or ([agent] if agent else []))),
+    }
+
+def iter_finding_lines(paths):
+    """Stream raw finding dicts from JSONL files ('-' reads stdin).
+
+    Yields (finding, None) for parsed objects and (None, location) for lines
+    that look like JSON but fail to parse.
+    """
+    for path in paths:
+        fh = sys.stdin if path == '-' else open(path, encoding='utf-8', errors='replace')
+        try:
+            for number, line in enumerate(fh, start=1):
+                line = line.strip()
+                if not line.startswith('{'):
+                    continue
+                try:
+                    yield json.loads(line), None
+                except ValueError:
+                    yield None, f"{path}:{number}"
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+class FindingsMerger:
+    """Deduplicate findings by (file, rule, overlapping line range).
+
+    Memory grows with the number of unique findings, not the input size. A
+    duplicate widens the line range, keeps the highest severity and records
+    every agent that reported it. Each (file, rule) group is kept as disjoint
+    ranges: a finding that bridges several ranges coalesces them, so the
+    result does not depend on input order.
+    """
+
+    def __init__(self):
+        self.groups = {}  # (file, rule) -> [finding, ...]
+        self.total = 0
+        self.invalid = 0
+
+    def add(self, raw: dict):
+        finding = normalize_finding(raw)
+        if finding is None:
+            self.invalid += 1
+            return
+        self.total += 1
+        group = self.groups.setdefault((finding['file'], finding['rule'].lower()), [])
+        kept = []
+        for existing in group:
+            overlaps = (finding['line'] <= existing['end_line'] and existing['line'] <= finding['end_line'])
+            if not (overlaps or (finding['line'] == 0 and existing['line'] == 0)):
+                kept.append(existing)
+                continue
+            if SEVERITIES.index(existing['severity']) < SEVERITIES.index(finding['severity']):
+                finding['severity'] = existing['severity']
+            finding['line'] = min(existing['line'], finding['line'])
+            finding['end_line'] = max(existing['end_line'], finding['end_line'])
+            finding['agents'] = sorted(set(existing['agents']) | set(finding['agents']))
+            finding['title'] = existing['title']
+            finding['fix'] = existing['fix'] or finding['fix']
+            finding['message'] = existing['message'] or finding['message']
+        kept.append(finding)
+        self.groups[(finding['file'], finding['rule'].lower())] = kept
+
+    def ranked(self, min_severity: str = 'INFO'):
+        cutoff = SEVERITIES.index(min_severity)
+        findings = [f for group in self.groups.values() for f in group
+                    if SEVERITIES.index(f['severity']) <= cutoff]
+        return sorted(findings, key=lambda f: (SEVERITIES.index(f['severity']), -len(f['agents']),
+                                               f['file'], f['line'], f['rule']))
+
+def render_findings_markdown(findings, target: str = 'merged agent findings') -> str:
+    """Render findings in the /sf-review output format."""
+    lines = [f"Review: {target}", '', 'Files reviewed:']
+    files = sorted({f['file'] for f in findings})
+    lines += [f"- {name}" for name in files] or ['- (no findings)']
+    lines += ['', 'Findings:', '']
+    for severity in SEVERITIES:
+        group = [f for f in findings if f['severity'] == severity]
+        if not group:
+            continue
+        lines.append(f"{severity} ({len(group)})")
+        for number, f in enumerate(group, start=1):
+            location = f['file']
+            if f['line']:
+                location += f":{f['line']}" + (f"-{f['end_line']}" if f['end_line'] > f['line'] else '')
+            agents = f" _(reported by {', '.join(f['agents'])})_" if f['agents'] else ''
+            lines.append(f"{number}. [{location}] - {f['title']} `{f['rule']}`{agents}")
+            if f['message'] and f['message'] != f['title']:
+                lines.append(f"   {f['message']}")
+            if f['fix']:
+                lines.append(f"   Fix: {f['fix']}")
+        lines.append('')
+    lines.append('Summary:')
+    counts = {severity: sum(1 for f in findings if f['severity'] == severity) for severity in SEVERITIES}
+    lines.append(f"- Critical: {counts['CRITICAL']} (must fix)")
+    lines.append(f"- High: {counts['HIGH']} (should fix)")
+    lines.append(f"- Medium: {counts['MEDIUM']}")
+    lines.append(f"- Low: {counts['LOW']}")
+    if counts['INFO']:
+        lines.append(f"- Info: {counts['INFO']}")
+    return '\n'.join(lines) + '\n'
+
+def merge_findings(paths, min_severity: str = 'INFO'):
+    """Stream-merge findings files. Returns (merger, ranked findings, bad lines)."""
+    merger = FindingsMerger()
+    bad_lines = []
+    for raw, bad in iter_finding_lines(paths):
+        if bad:
+            bad_lines.append(bad)
+        else:
+            merger.add(raw)
+    return merger, merger.ranked(min_severity), bad_lines
+
+def review_command(args):
+    """Post-process review agent output."""
+    if args.review_command != 'merge':
+        print_error("Usage: sfce review merge <findings.jsonl>...")
+        return 1
+
+    merger, findings, bad_lines = merge_findings(args.files, args.min_severity.upper())
+    for location in bad_lines:
+        print_warning(f"Skipped malformed JSON line at {location}", file=sys.stderr)
+    if merger.invalid:
+        print_warning(f"Skipped {merger.invalid} finding(s) without file and rule/title", file=sys.stderr)
+
+    if args.format == 'jsonl':
+        output = ''.join(json.dumps(f, sort_keys=True) + '\n' for f in findings)
+    elif args.format == 'json':
+        output = json.dumps(findings, indent=2) + '\n'
+    else:
+        output = render_findings_markdown(findings, args.target)
+
+    if args.output:
+        Path(args.output).write_text(output)
+        print_success(f"Merged {merger.total} findings into {len(findings)} unique: {args.output}")
+    else:
+        sys.stdout.write(output)
+
+    if args.fail_on:
+        threshold = SEVERITIES.index(args.fail_on.upper())
+        if any(SEVERITIES.index(f['severity']) <= threshold for f in findings):
+            return 1
+    return 0
+
+# Headless review orchestration
+
+# Target files each agent scope applies to (mirrors the routing rules in agents/index.md)
+SCOPE_FILE_PATTERNS = {
+    'APEX_ONLY': ('*.cls', '*.trigger'),
+    'LWC_ONLY': ('*/lwc/*', '*/aura/*'),
+    'AUTOMATION_ONLY': ('*.flow-meta.xml', '*.validationRule-meta.xml', '*.workflow-meta.xml'),
+    'INTEGRATION_ONLY': ('*.cls', '*.namedCredential-meta.xml', '*.remoteSite-meta.xml',
+                         '*__e.object-meta.xml', '*/objects/*__e/*'),
+}
+
+def get_changed_files(project_path: Path):
+    """Return tracked changes since HEAD plus untracked files (paths relative to the project)."""
+    files = []
+    for cmd in (['git', 'diff', '--name-only', '--relative', 'HEAD'],
+                ['git', 'ls-files', '--others', '--exclude-standard']):
+        try:
+            out = subprocess.run(cmd, cwd=project_path, capture_output=True, text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            continue
+        files += [line for line in out.splitlines() if line and (project_path / line).is_file()]
+    return sorted(set(files))
+
+def resolve_review_agents(project_path: Path, selectors):
+    """Resolve agent names, categories or paths to agent files (default: all installed agents)."""
+    agents_dir = project_path / '.claude' / 'agents'
+    if not agents_dir.is_dir():
+        agents_dir = get_package_root() / 'agents'
+    available = {}
+    for category in iter_resource_dirs(agents_dir):
+        for agent_file in iter_resources(category):
+            available[agent_file.name[:-len('.md')]] = (category.name, agent_file)
+    if not selectors:
+        return [entry[1] for _, entry in sorted(available.items())]
+    agents = []
+    for selector in selectors:
+        path = Path(selector)
+        if path.is_file():
+            agents.append(path)
+        elif selector in available:
+            agents.append(available[selector][1])
+        elif any(category == selector for category, _ in available.values()):
+            agents += [agent for _, (category, agent) in sorted(available.items()) if category == selector]
+        else:
+            raise ValueError(f"Unknown agent: {selector}")
+    return agents
+
+def scoped_targets(agent_text: str, targets):
+    """Filter targets to the files an agent's scope covers."""
+    fields, _ = parse_frontmatter(agent_text)
+    patterns = SCOPE_FILE_PATTERNS.get((fields or {}).get('scope', ''))
+    if not patterns:
+        return list(targets)
+    return [t for t in targets if any(fnmatch.fnmatch(t, p) for p in patterns)]
+
+class ReviewTask:
+    """One (agent, shard) invocation of the review command."""
+
+    def __init__(self, agent_name: str, agent_path, prompt: bytes, shard: int, files):
+        self.agent_name = agent_name
+        self.agent_path = agent_path
+        self.prompt = prompt
+        self.shard = shard
+        self.files = files
+        self.status = 'pending'
+        self.attempts = 0
+        self.returncode = None
+        self.duration = 0.0
+
+    @property
+    def label(self):
+        return f"{self.agent_name} shard {self.shard}"
+
+    def summary(self, out_dir: Path):
+        return {
+            'agent': self.agent_name, 'shard': self.shard, 'files': self.files,
+            'status': self.status, 'attempts': self.attempts, 'returncode': self.returncode,
+            'duration': round(self.duration, 3),
+            'output': (Path(self.agent_name) / f"shard-{self.shard}.out").as_posix(),
+        }
+
+REVIEW_PLACEHOLDER_RE = re.compile(r'\{(agent|agent_name|shard|files|shard_file|out)\}')
+
+def kill_process_tree(proc):
+    """Kill a subprocess started in its own session, including its children."""
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+
+async def run_review_task(task: ReviewTask, args, out_dir: Path, project_path: Path,
+                          semaphore: asyncio.Semaphore, progress):
+    """Run one task with timeout and retries (exponential backoff with jitter)."""
+    task_dir = out_dir / task.agent_name
+    task_dir.mkdir(parents=True, exist_ok=True)
+    shard_file = task_dir / f"shard-{task.shard}.files"
+    shard_file.write_text(''.join(f + '\n' for f in task.files))
+    # Only the known placeholders are substituted, so jq filters or inline JSON keep their braces
+    values = {'agent': shlex.quote(str(task.agent_path)), 'agent_name': task.agent_name, 'shard': str(task.shard),
+              'files': ' '.join(shlex.quote(f) for f in task.files), 'shard_file': shlex.quote(str(shard_file)),
+              'out': shlex.quote(str(task_dir / f"shard-{task.shard}.out"))}
+    command = REVIEW_PLACEHOLDER_RE.sub(lambda match: values[match.group(1)], args.agent_command)
+    env = dict(os.environ, SFCE_AGENT=str(task.agent_path), SFCE_AGENT_NAME=task.agent_name,
+               SFCE_SHARD=str(task.shard), SFCE_SHARD_FILE=str(shard_file))
+
+    for attempt in range(1, args.retries + 2):
+        task.attempts = attempt
+        async with semaphore:
+            started = time.perf_counter()
+            proc = await asyncio.create_subprocess_shell(
+                command, cwd=str(project_path), env=env, stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                start_new_session=os.name == 'posix')
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(task.prompt), args.timeout)
+                task.returncode = proc.returncode
+                task.status = 'ok' if proc.returncode == 0 else 'failed'
+            except asyncio.TimeoutError:
+                stdout, stderr = b'', f"Timed out after {args.timeout}s\n".encode()
+                task.status = 'timeout'
+            finally:
+                # Also runs on cancellation (Ctrl-C), so no orphaned agents are left behind
+                if proc.returncode is None:
+                    kill_process_tree(proc)
+                    await proc.wait()
+            task.duration += time.perf_counter() - started
+        (task_dir / f"shard-{task.shard}.out").write_bytes(stdout)
+        (task_dir / f"shard-{task.shard}.err").write_bytes(stderr)
+        if task.status == 'ok' or attempt > args.retries:
+            break
+        # Back off without holding a slot, so other shards keep running
+        delay = args.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+        progress(task, f"retrying in {delay:.1f}s ({task.status})")
+        await asyncio.sleep(delay)
+    progress(task, None)
+
+async def run_review_tasks(tasks, args, out_dir: Path, project_path: Path):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    done = [0]
+
+    def progress(task, note):
+        if note:
+            print_warning(f"{task.label}: {note}")
+            return
+        done[0] += 1
+        prefix = f"[{done[0]}/{len(tasks)}]"
+        message = f"{prefix} {task.label} ({len(task.files)} files, {task.duration:.1f}s)"
+        if task.status == 'ok':
+            print_success(message)
+        else:
+            print_error(f"{message}: {task.status}")
+
+    await asyncio.gather(*(run_review_task(task, args, out_dir, project_path, semaphore, progress)
+                           for task in tasks))
+
+def collect_review_findings(tasks, out_dir: Path):
+    """Extract JSONL findings from task output, tagging each with its agent."""
+    findings_path = out_dir / 'findings.jsonl'
+    with open(findings_path, 'w') as fh:
+        for task in tasks:
+            output = out_dir / task.agent_name / f"shard-{task.shard}.out"
+            if not output.exists():
+                continue
+            for raw, bad in iter_finding_lines([str(output)]):
+                if raw is not None and isinstance(raw, dict):
+                    raw.setdefault('agent', task.agent_name)
+                    fh.write(json.dumps(raw) + '\n')
+    return findings_path
+
+def run_review_command(args):
+    """Run review agents headlessly through a local command, sharded and in parallel."""
+    project_path = Path(args.path).resolve()
+
+    try:
+        agents = resolve_review_agents(project_path, args.agents)
+    except ValueError as e:
+        print_error(str(e))
+        return 1
+
+    targets = []
+    for target in args.targets or get_changed_files(project_path):
+        path = project_path / target
+        if path.is_dir():
+            targets += sorted(p.relative_to(project_path).as_posix() for p in path.rglob('*') if p.is_file())
+        elif path.is_file():
+            targets.append(Path(target).as_posix())
+        else:
+            print_warning(f"Skipping missing target: {target}")
+    if not targets:
+        print_error("No target files. Pass --targets or make changes to review.")
+        return 1
+
+    prefix = build_prompt_prefix(project_path) if args.shared_prefix else None
+    tasks = []
+    for agent in agents:
+        prompt = agent.read_bytes()
+        files = targets if args.no_routing else scoped_targets(prompt.decode('utf-8', 'replace'), targets)
+        name = agent.name[:-len('.md')]
+        if prefix is not None:
+            prompt = build_agent_prompt(prefix, prompt.decode('utf-8-sig', 'replace'), name).encode('utf-8')
+        for shard, start in enumerate(range(0, len(files), args.shard_size), start=1):
+            tasks.append(ReviewTask(name, agent, prompt, shard, files[start:start + args.shard_size]))
+    if not tasks:
+        print_warning("No agent applies to the target files")
+        return 0
+
+    out_dir = Path(args.out) if args.out else project_path / '.specify' / 'reviews' / time.strftime('%Y%m%d-%H%M%S')
+    out_dir = out_dir.resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    print_info(f"Running {len(tasks)} review task(s) from {len(agents)} agent(s) over {len(targets)} file(s), "
+               f"concurrency {args.concurrency}")
+
+    interrupted = False
+    try:
+        asyncio.run(run_review_tasks(tasks, args, out_dir, project_path))
+    except KeyboardInterrupt:
+        interrupted = True
+        print_warning("Interrupted; running tasks were cancelled")
+        for task in tasks:
+            if task.status == 'pending':
+                task.status = 'cancelled'
+
+    summary = [task.summary(out_dir) for task in tasks]
+    (out_dir / 'summary.json').write_text(json.dumps(summary, indent=2) + '\n')
+    findings_path = collect_review_findings(tasks, out_dir)
+    merger, findings, _ = merge_findings([str(findings_path)])
+    target = ' '.join(args.targets) if args.targets else 'uncommitted changes'
+    (out_dir / 'report.md').write_text(render_findings_markdown(findings, target))
+
+    failed = [task for task in tasks if task.status != 'ok']
+    print()
+    print_info(f"Results: {out_dir}")
+    print_info(f"{merger.total} findings from agents, {len(findings)} unique (report.md, findings.jsonl)")
+    if failed:
+        print_error(f"{len(failed)} task(s) did not succeed: " + ', '.join(t.label for t in failed[:5]))
+    else:
+        print_success("All review tasks completed")
+    if interrupted:
+        return 130
+    return 1 if failed else 0
+
+# Shared prompt prefix (provider-side prompt caching)
+
+PROMPT_SEPARATOR = '\n\n<!-- sfce:end-shared-prefix -->\n\n'
+
+def normalize_prompt_text(text: str) -> str:
+    """Normalize text so equal content always yields identical bytes.
+
+    Strips a BOM, converts CRLF/CR to LF, applies Unicode NFC, removes trailing
+    whitespace and ends with exactly one newline.
+    """
+    text = text.lstrip('\ufeff').replace('\r\n', '\n').replace('\r', '\n')
+    text = unicodedata.normalize('NFC', text)
+    return '\n'.join(line.rstrip() for line in text.strip('\n').split('\n')) + '\n'
+
+def strip_frontmatter(text: str) -> str:
+    _, end = parse_frontmatter(text)
+    return '\n'.join(text.splitlines()[end:]) if end else text
+
+def markdown_section(text: str, heading: str) -> str:
+    """Return one '## heading' section of a markdown document (without trailing rules)."""
+    lines, capture = [], False
+    for line in text.splitlines():
+        if line.startswith('## '):
+            if capture:
+                break
+            capture = line[3:].strip() == heading
+        if capture:
+            lines.append(line)
+    while lines and lines[-1].strip() in ('', '---'):
+        lines.pop()
+    return '\n'.join(lines)
+
+def content_root_for(project_path: Path):
+    """Prefer content installed in the project's .claude/, else the packaged content."""
+    claude_dir = project_path / '.claude'
+    return claude_dir if (claude_dir / 'agents').is_dir() else get_package_root()
+
+def build_prompt_prefix(project_path: Path) -> str:
+    """Assemble the shared prefix: constitution, governor-limits skill, routing rules.
+
+    Sections appear in a fixed order with fixed headings and no timestamps,
+    so the prefix is byte-identical across runs and machines for the same content.
+    Files are read as UTF-8 regardless of the locale (a leading BOM is dropped).
+    The prefix ends with PROMPT_SEPARATOR; agent content is appended directly.
+    """
+    root = content_root_for(project_path)
+    constitution = project_path / '.specify' / 'memory' / 'constitution.md'
+    constitution_text = (constitution.read_text(encoding='utf-8-sig') if constitution.exists()
+                         else CONSTITUTION_TEMPLATE)
+    skill = root / 'skills' / 'governor-limits' / 'SKILL.md'
+    skill_text = strip_frontmatter(skill.read_text(encoding='utf-8-sig')) if skill.is_file() else ''
+    routing = []
+    for index_name in ('agents', 'skills'):
+        index = root / index_name / 'index.md'
+        if index.is_file():
+            section = markdown_section(index.read_text(encoding='utf-8-sig'), 'CRITICAL: Routing Validation')
+            routing.append(f"### {index_name.capitalize()} routing\n\n" + section.split('\n', 1)[-1].strip())
+
+    sections = [
+        '# Shared Context (SF Compound Engineering)',
+        '## Project Constitution\n\n' + constitution_text,
+        '## Governor Limits (universal skill)\n\n' + skill_text,
+        '## Routing Rules\n\n' + '\n\n'.join(routing),
+    ]
+    shared = normalize_prompt_text('\n\n'.join(section.strip() for section in sections))
+    return shared.rstrip('\n') + PROMPT_SEPARATOR
+
+def build_agent_unique(agent_text: str, agent_name: str) -> str:
+    """Return the per-agent content that follows the shared prefix."""
+    return normalize_prompt_text(f"# Agent: {agent_name}\n\n" + strip_frontmatter(agent_text).strip())
+
+def build_agent_prompt(prefix: str, agent_text: str, agent_name: str) -> str:
+    """Return the full prompt for one agent: shared prefix, then the agent's unique content."""
+    return prefix + build_agent_unique(agent_text, agent_name)
+
+def prompts_command(args):
+    """Generate a byte-stable shared prompt prefix plus per-agent unique content."""
+    project_path = Path(args.path).resolve()
+    out_dir = Path(args.out).resolve() if args.out else project_path / '.claude' / 'prompts'
+    prefix = build_prompt_prefix(project_path)
+    prefix_bytes = prefix.encode('utf-8')
+
+    root = content_root_for(project_path)
+    agents = {}
+    for category in iter_resource_dirs(root / 'agents'):
+        for agent_file in iter_resources(category):
+            name = agent_file.name[:-len('.md')]
+            agents[name] = build_agent_unique(agent_file.read_text(encoding='utf-8-sig'), name).encode('utf-8')
+
+    (out_dir / 'agents').mkdir(parents=True, exist_ok=True)
+    write_atomic(out_dir / 'prefix.md', prefix_bytes)
+    for name, unique in sorted(agents.items()):
+        write_atomic(out_dir / 'agents' / f"{name}.md", unique)
+        if args.full:
+            write_atomic(out_dir / 'full' / f"{name}.md", prefix_bytes + unique)
+
+    unique_total = sum(len(unique) for unique in agents.values())
+    fanout_total = len(prefix_bytes) * len(agents) + unique_total
+    manifest = {
+        'prefix': {'sha256': hashlib.sha256(prefix_bytes).hexdigest(), 'bytes': len(prefix_bytes)},
+        'separator': PROMPT_SEPARATOR.strip(),
+        'agents': {name: {'sha256': hashlib.sha256(unique).hexdigest(), 'bytes': len(unique)}
+                   for name, unique in sorted(agents.items())},
+        'shared_unique_ratio': round(len(prefix_bytes) / (unique_total / len(agents)), 2) if agents else None,
+        'cached_fraction': round(len(prefix_bytes) * len(agents) / fanout_total, 4) if agents else None,
+    }
+    write_atomic(out_dir / 'manifest.json', (json.dumps(manifest, indent=2) + '\n').encode())
+
+    if args.json:
+        print(json.dumps(manifest, indent=2))
+        return 0
+    print_success(f"Shared prefix: {len(prefix_bytes):,} bytes (sha256 {manifest['prefix']['sha256'][:12]})")
+    if agents:
+        print_info(f"{len(agents)} agents, unique content {unique_total // len(agents):,} bytes on average")
+        print_info(f"Shared/unique ratio {manifest['shared_unique_ratio']}:1; "
+                   f"{manifest['cached_fraction']:.0%} of fan-out bytes reuse one cached prefix")
+    print_success(f"Prompts written to {out_dir}")
+    return 0
+
+# Apex debug log analysis
+#
+# Debug logs are memory-mapped and split at EXECUTION_STARTED boundaries, so
+# each chunk holds whole transactions and can be parsed in its own process.
+# Only the events below are decoded; every other line is skipped after one
+# bytes.find(), which keeps multi-hundred-MB logs cheap to scan.
+
+LOG_CHUNK_SIZE = 16 * 1024 * 1024
+
+# LIMIT_USAGE_FOR_NS row label -> metric key
+LOG_LIMIT_LABELS = {
+    'number of soql queries': 'soql',
+    'number of query rows': 'soql_rows',
+    'number of sosl queries': 'sosl',
+    'number of dml statements': 'dml',
+    'number of publish immediate dml': 'publish_immediate',
+    'number of dml rows': 'dml_rows',
+    'maximum cpu time': 'cpu_ms',
+    'maximum heap size': 'heap_bytes',
+    'number of callouts': 'callouts',
+    'number of email invocations': 'email',
+    'number of future calls': 'future',
+    'number of queueable jobs added to the queue': 'queueable',
+    'number of mobile apex push calls': 'push',
+}
+
+LOG_EVENTS = frozenset((
+    b'EXECUTION_STARTED', b'EXECUTION_FINISHED', b'CODE_UNIT_STARTED', b'CODE_UNIT_FINISHED',
+    b'SOQL_EXECUTE_BEGIN', b'SOQL_EXECUTE_END', b'DML_BEGIN', b'DML_END',
+    b'LIMIT_USAGE_FOR_NS', b'EXCEPTION_THROWN', b'FATAL_ERROR',
+))
+
+LOG_LIMIT_ROW_RE = re.compile(r'^\s*(.+?):\s*(\d+) out of (\d+)')
+
+def split_debug_log(path: str, chunk_size: int = LOG_CHUNK_SIZE):
+    """Return [(path, start, end), ...] byte ranges that each begin at a transaction."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    ranges, start = [], 0
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        while start + chunk_size < size:
+            marker = mm.find(b'|EXECUTION_STARTED', start + chunk_size)
+            if marker < 0:
+                break
+            cut = mm.rfind(b'\n', 0, marker) + 1
+            if cut <= start:
+                break
+            ranges.append((path, start, cut))
+            start = cut
+    ranges.append((path, start, size))
+    return ranges
+
+def new_log_transaction(path: str, offset: int) -> dict:
+    return {'file': path, 'offset': offset, 'entry': None, 'started': None, 'first_ns': None,
+            'last_ns': None, 'duration_ms': 0.0, 'limits': {},
+            'soql': {'count': 0, 'ms': 0.0, 'rows': 0}, 'dml': {'count': 0, 'ms': 0.0, 'rows': 0},
+            'exceptions': 0, 'fatal': [], '_queries': {}, '_dml': {}}
+
+def parse_debug_log_range(task):
+    """Parse one byte range of a debug log into transactions and aggregates.
+
+    Runs in a worker process; returns plain dicts so results pickle cheaply.
+    Query, DML and code-unit aggregates are keyed so chunks merge by addition.
+    """
+    path, start, end = task
+    transactions, queries, dml, units = [], {}, {}, {}
+    txn = None
+    unit_stack, soql_open, dml_open = [], None, None
+    limit_ns = None
+
+    def close(txn):
+        if txn['first_ns'] is not None and txn['duration_ms'] == 0.0:
+            txn['duration_ms'] = (txn['last_ns'] - txn['first_ns']) / 1e6
+        for key, count in txn.pop('_queries').items():
+            queries[key][3] = max(queries[key][3], count)
+        for key, count in txn.pop('_dml').items():
+            dml[key][3] = max(dml[key][3], count)
+        txn['duration_ms'] = round(txn['duration_ms'], 3)
+        txn['soql']['ms'] = round(txn['soql']['ms'], 3)
+        txn['dml']['ms'] = round(txn['dml']['ms'], 3)
+        del txn['first_ns'], txn['last_ns']
+        transactions.append(txn)
+
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mm.seek(start)
+        while mm.tell() < end:
+            offset = mm.tell()
+            line = mm.readline()
+            bar = line.find(b'|')
+            if bar < 0 or not line[:1].isdigit():
+                # Continuation line: the rows of a LIMIT_USAGE_FOR_NS block
+                if limit_ns is not None and txn is not None:
+                    match = LOG_LIMIT_ROW_RE.match(line.decode('utf-8', 'replace'))
+                    if match:
+                        label = match.group(1).strip()
+                        metric = LOG_LIMIT_LABELS.get(label.lower(), re.sub(r'\W+', '_', label.lower()))
+                        used, limit = int(match.group(2)), int(match.group(3))
+                        usage = txn['limits'].setdefault(limit_ns, {})
+                        if used >= usage.get(metric, (0, 0))[0]:
+                            usage[metric] = [used, limit]
+                        continue
+                limit_ns = None
+                continue
+            limit_ns = None
+            second = line.find(b'|', bar + 1)
+            event = line[bar + 1:second if second > 0 else len(line)].rstrip(b'\r\n')
+            if event not in LOG_EVENTS:
+                continue
+            head = line[:bar]
+            try:
+                nanos = int(head[head.rindex(b'(') + 1:head.rindex(b')')])
+            except ValueError:
+                continue
+            fields = line[second + 1:].rstrip(b'\r\n').decode('utf-8', 'replace').split('|') if second > 0 else []
+
+            if event == b'EXECUTION_STARTED' or txn is None:
+                if txn is not None:
+                    close(txn)
+                txn = new_log_transaction(path, offset)
+                txn['started'] = head[:head.index(b' ')].decode() if b' ' in head else None
+                txn['first_ns'] = nanos
+                unit_stack, soql_open, dml_open = [], None, None
+            txn['last_ns'] = nanos
+
+            if event == b'EXECUTION_FINISHED':
+                txn['duration_ms'] = (nanos - txn['first_ns']) / 1e6
+                close(txn)
+                txn = None
+            elif event == b'CODE_UNIT_STARTED':
+                name = fields[2] if len(fields) > 2 else fields[-1] if fields else '?'
+                if txn['entry'] is None:
+                    txn['entry'] = name
+                unit_stack.append((name, nanos))
+            elif event == b'CODE_UNIT_FINISHED' and unit_stack:
+                name, began = unit_stack.pop()
+                elapsed = (nanos - began) / 1e6
+                record = units.setdefault(name, [0, 0.0, 0.0])
+                record[0] += 1
+                record[1] += elapsed
+                record[2] = max(record[2], elapsed)
+            elif event == b'SOQL_EXECUTE_BEGIN':
+                text = ' '.join(fields[-1].split())[:500] if fields else '?'
+                line_no = fields[0].strip('[]') if fields else ''
+                soql_open = (text, line_no, nanos)
+            elif event == b'SOQL_EXECUTE_END' and soql_open:
+                text, line_no, began = soql_open
+                soql_open = None
+                rows = int(fields[-1].split(':')[-1]) if fields and fields[-1].startswith('Rows:') else 0
+                elapsed = (nanos - began) / 1e6
+                txn['soql']['count'] += 1
+                txn['soql']['ms'] += elapsed
+                txn['soql']['rows'] += rows
+                record = queries.setdefault(text, [0, 0.0, 0, 0, set()])
+                record[0] += 1
+                record[1] += elapsed
+                record[2] += rows
+                record[4].add(line_no)
+                txn['_queries'][text] = txn['_queries'].get(text, 0) + 1
+            elif event == b'DML_BEGIN':
+                info = dict(field.split(':', 1) for field in fields[1:] if ':' in field)
+                rows = int(info['Rows']) if info.get('Rows', '').isdigit() else 0
+                dml_open = ((info.get('Op', '?'), info.get('Type', '?')), rows, nanos)
+            elif event == b'DML_END' and dml_open:
+                key, rows, began = dml_open
+                dml_open = None
+                elapsed = (nanos - began) / 1e6
+                txn['dml']['count'] += 1
+                txn['dml']['ms'] += elapsed
+                txn['dml']['rows'] += rows
+                record = dml.setdefault(key, [0, 0.0, 0, 0])
+                record[0] += 1
+                record[1] += elapsed
+                record[2] += rows
+                txn['_dml'][key] = txn['_dml'].get(key, 0) + 1
+            elif event == b'LIMIT_USAGE_FOR_NS':
+                limit_ns = fields[0] if fields else '(default)'
+            elif event == b'EXCEPTION_THROWN':
+                txn['exceptions'] += 1
+            elif event == b'FATAL_ERROR' and len(txn['fatal']) < 3:
+                txn['fatal'].append('|'.join(fields)[:300])
+
+    if txn is not None:
+        close(txn)
+    for record in queries.values():
+        record[4] = sorted(record[4])
+    return {'transactions': transactions, 'queries': queries,
+            'dml': [[op, obj] + record for (op, obj), record in dml.items()], 'units': units}
+
+def iter_log_paths(paths):
+    """Expand directories to the *.log files inside them."""
+    for name in paths:
+        path = Path(name)
+        if path.is_dir():
+            yield from sorted(str(p) for p in path.rglob('*.log') if p.is_file())
+        else:
+            yield str(path)
+
+def transaction_peak(txn: dict):
+    """Return (percent, namespace, metric) of the transaction's highest limit usage."""
+    peak = (0.0, None, None)
+    for namespace, usage in txn['limits'].items():
+        for metric, (used, limit) in usage.items():
+            if limit and 100.0 * used / limit > peak[0]:
+                peak = (100.0 * used / limit, namespace, metric)
+    return peak
+
+def analyze_debug_logs(paths, workers: int = None, top: int = 10) -> dict:
+    """Aggregate governor-limit usage, SOQL, DML and code-unit timings across debug logs."""
+    started = time.perf_counter()
+    tasks = [task for path in paths for task in split_debug_log(path)]
+    if len(tasks) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_debug_log_range, tasks))
+    else:
+        results = [parse_debug_log_range(task) for task in tasks]
+
+    transactions, queries, dml, units = [], {}, {}, {}
+    ordinal = {}
+    for result in results:
+        for txn in result['transactions']:
+            ordinal[txn['file']] = ordinal.get(txn['file'], 0) + 1
+            txn['id'] = f"{Path(txn['file']).name}#{ordinal[txn['file']]}"
+            transactions.append(txn)
+        for text, (count, ms, rows, max_txn, lines) in result['queries'].items():
+            record = queries.setdefault(text, {'query': text, 'count': 0, 'total_ms': 0.0, 'rows': 0,
+                                               'max_per_transaction': 0, 'lines': set()})
+            record['count'] += count
+            record['total_ms'] += ms
+            record['rows'] += rows
+            record['max_per_transaction'] = max(record['max_per_transaction'], max_txn)
+            record['lines'].update(lines)
+        for op, obj, count, ms, rows, max_txn in result['dml']:
+            record = dml.setdefault((op, obj), {'operation': op, 'object': obj, 'count': 0, 'total_ms': 0.0,
+                                                'rows': 0, 'max_per_transaction': 0})
+            record['count'] += count
+            record['total_ms'] += ms
+            record['rows'] += rows
+            record['max_per_transaction'] = max(record['max_per_transaction'], max_txn)
+        for name, (count, total, longest) in result['units'].items():
+            record = units.setdefault(name, {'name': name, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            record['count'] += count
+            record['total_ms'] += total
+            record['max_ms'] = max(record['max_ms'], longest)
+
+    peaks = {}
+    for txn in transactions:
+        for namespace, usage in txn['limits'].items():
+            for metric, (used, limit) in usage.items():
+                key = metric if namespace == '(default)' else f"{namespace}:{metric}"
+                if used and used > peaks.get(key, {}).get('used', 0):
+                    peaks[key] = {'metric': metric, 'namespace': namespace, 'used': used, 'limit': limit,
+                                  'percent': round(100.0 * used / limit, 1) if limit else 0.0,
+                                  'transaction': txn['id'], 'entry': txn['entry']}
+        txn['peak_percent'] = round(transaction_peak(txn)[0], 1)
+
+    def ranked(records, key):
+        for record in records:
+            for field in ('total_ms', 'max_ms'):
+                if field in record:
+                    record[field] = round(record[field], 3)
+            if 'lines' in record:
+                record['lines'] = sorted(record['lines'], key=lambda n: (len(n), n))
+        return sorted(records, key=key, reverse=True)[:top]
+
+    return {
+        'summary': {
+            'files': len(paths),
+            'bytes': sum(os.path.getsize(p) for p in paths),
+            'chunks': len(tasks),
+            'transactions': len(transactions),
+            'soql': sum(t['soql']['count'] for t in transactions),
+            'dml': sum(t['dml']['count'] for t in transactions),
+            'fatal_errors': sum(1 for t in transactions if t['fatal']),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        },
+        'peaks': sorted(peaks.values(), key=lambda p: -p['percent']),
+        'transactions': sorted(transactions, key=lambda t: (-t['peak_percent'], -t['duration_ms']))[:top],
+        'queries': ranked(list(queries.values()), lambda q: (q['total_ms'], q['count'])),
+        'dml': ranked(list(dml.values()), lambda d: (d['total_ms'], d['count'])),
+        'code_units': ranked(list(units.values()), lambda u: (u['max_ms'], u['total_ms'])),
+    }
+
+def render_log_report_markdown(report: dict, warn_at: float = 80) -> str:
+    """Render analyze_debug_logs() output as a compact markdown evidence report."""
+    summary = report['summary']
+
+    def cell(text, width=120):
+        text = str(text).replace('|', '\\|')
+        return text if len(text) <= width else text[:width - 1] + '…'
+
+    def status(percent):
+        return ' ❌' if percent >= 100 else ' ⚠️' if percent >= warn_at else ''
+
+    lines = ['# Apex Debug Log Analysis', '',
+             f"{summary['files']} log(s), {format_size(summary['bytes'])}, "
+             f"{summary['transactions']:,} transaction(s), {summary['soql']:,} SOQL, "
+             f"{summary['dml']:,} DML, {summary['fatal_errors']} with fatal errors "
+             f"(parsed in {summary['elapsed_ms']:.0f} ms, {summary['chunks']} chunk(s))", '']
+
+    if report['peaks']:
+        lines += ['## Peak Governor Limit Usage', '',
+                  '| Limit | Peak | Limit | Usage | Transaction |',
+                  '|-------|-----:|------:|------:|-------------|']
+        for peak in report['peaks']:
+            name = peak['metric'] if peak['namespace'] == '(default)' else f"{peak['namespace']}: {peak['metric']}"
+            lines.append(f"| {name} | {peak['used']:,} | {peak['limit']:,} | {peak['percent']:.0f}%"
+                         f"{status(peak['percent'])} | {peak['transaction']} {cell(peak['entry'] or '', 60)} |")
+        lines.append('')
+    else:
+        lines += ['No LIMIT_USAGE_FOR_NS blocks found. Set the APEX_PROFILING log level to INFO or finer.', '']
+
+    if report['transactions']:
+        lines += ['## Transactions (highest limit usage first)', '',
+                  '| Transaction | Entry | Duration ms | CPU ms | SOQL | DML | Heap | Peak | Errors |',
+                  '|-------------|-------|------------:|-------:|-----:|----:|-----:|-----:|--------|']
+        for txn in report['transactions']:
+            usage = txn['limits'].get('(default)', {})
+            cpu = usage.get('cpu_ms', ['', ''])[0]
+            heap = usage.get('heap_bytes', [0, 0])[0]
+            errors = cell('; '.join(txn['fatal']), 80) if txn['fatal'] else (
+                f"{txn['exceptions']} thrown" if txn['exceptions'] else '')
+            lines.append(f"| {txn['id']} | {cell(txn['entry'] or '', 60)} | {txn['duration_ms']:,.1f} | {cpu} | "
+                         f"{txn['soql']['count']} | {txn['dml']['count']} | {format_size(heap) if heap else ''} | "
+                         f"{txn['peak_percent']:.0f}%{status(txn['peak_percent'])} | {errors} |")
+        lines.append('')
+
+    if report['queries']:
+        lines += ['## SOQL by Total Time', '',
+                  '| Query | Runs | Max/txn | Rows | Total ms | Lines |',
+                  '|-------|-----:|--------:|-----:|---------:|-------|']
+        for q in report['queries']:
+            lines.append(f"| `{cell(q['query'], 100)}` | {q['count']:,} | {q['max_per_transaction']:,} | "
+                         f"{q['rows']:,} | {q['total_ms']:,.1f} | {', '.join(q['lines'][:5])} |")
+        lines.append('')
+
+    if report['dml']:
+        lines += ['## DML by Total Time', '',
+                  '| Operation | Object | Statements | Max/txn | Rows | Total ms |',
+                  '|-----------|--------|-----------:|--------:|-----:|---------:|']
+        for d in report['dml']:
+            lines.append(f"| {d['operation']} | {d['object']} | {d['count']:,} | {d['max_per_transaction']:,} | "
+                         f"{d['rows']:,} | {d['total_ms']:,.1f} |")
+        lines.append('')
+
+    if report['code_units']:
+        lines += ['## Slowest Code Units', '',
+                  '| Code unit | Runs | Max ms | Total ms |',
+                  '|-----------|-----:|-------:|---------:|']
+        for u in report['code_units']:
+            lines.append(f"| {cell(u['name'], 100)} | {u['count']:,} | {u['max_ms']:,.1f} | {u['total_ms']:,.1f} |")
+        lines.append('')
+
+    lines.append('Max/txn above 1 means the statement ran repeatedly in one transaction (likely inside a loop). '
+                 'DML and code-unit times include the triggers and automation they fired.')
+    return '\n'.join(lines) + '\n'
+
+def logs_command(args):
+    """Analyze Apex debug logs."""
+    if args.logs_command != 'analyze':
+        print_error("Usage: sfce logs analyze <file.log|directory>...")
+        return 1
+
+    paths = list(iter_log_paths(args.files))
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing:
+        print_error(f"Log file not found: {missing[0]}")
+        return 1
+    if not paths:
+        print_error("No .log files found")
+        return 1
+
+    report = analyze_debug_logs(paths, workers=args.jobs, top=args.top)
+    if args.format == 'json':
+        output = json.dumps(report, indent=2) + '\n'
+    else:
+        output = render_log_report_markdown(report, args.warn_at)
+
+    if args.output:
+        Path(args.output).write_text(output)
+        summary = report['summary']
+        print_success(f"Analyzed {summary['transactions']:,} transactions in {summary['files']} log(s) "
+                      f"({format_size(summary['bytes'])}) in {summary['elapsed_ms']:.0f} ms: {args.output}")
+    else:
+        sys.stdout.write(output)
+    return 0
+
+# Apex test coverage aggregation
+#
+# Accepted report formats (detected from content, one file at a time, each
+# streamed so memory does not grow with the report size):
+#   - sf apex run/get test JSON (--json output or test-result-codecoverage.json)
+#   - Tooling API ApexCodeCoverageAggregate query results
+#   - istanbul coverage-final.json, lcov (lcovonly), Cobertura and Clover XML
+# A line counts as covered when any report covers it.
+
+CONSTITUTION_COVERAGE_RE = re.compile(r'minimum\s+(\d+(?:\.\d+)?)\s*%\s+code\s+coverage', re.IGNORECASE)
+# Fallback when the project has no constitution: the baseline the constitution template sets
+DEFAULT_COVERAGE_THRESHOLD = float(CONSTITUTION_COVERAGE_RE.search(CONSTITUTION_TEMPLATE).group(1))
+
+def coverage_threshold(project_path: Path):
+    """Return (threshold percent, source) from the project's constitution."""
+    constitution = project_path / '.specify' / 'memory' / 'constitution.md'
+    if constitution.is_file():
+        match = CONSTITUTION_COVERAGE_RE.search(constitution.read_text(errors='replace'))
+        if match:
+            return float(match.group(1)), constitution.relative_to(project_path).as_posix()
+    return DEFAULT_COVERAGE_THRESHOLD, 'constitution template default'
+
+def coverage_unit_name(name: str):
+    """Return (name, kind) for a class/trigger name or source path."""
+    base = name.replace('\\', '/').rsplit('/', 1)[-1]
+    for suffix, kind in (('.trigger', 'trigger'), ('.cls', 'class')):
+        if base.endswith(suffix):
+            return base[:-len(suffix)], kind
+    return base, None
+
+class JsonStream:
+    """Buffered reader that decodes one JSON value at a time from a file.
+
+    Containers are walked token by token and only the values asked for are
+    decoded (with json's C scanner), so memory is bounded by the largest
+    single record instead of the file.
+    """
+
+    def __init__(self, fh, chunk_size: int = 1 << 20):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        data = self.fh.read(size)
+        if not data:
+            self.eof = True
+            return False
+        if self.pos > len(self.buf) // 2:
+            self.buf, self.pos = self.buf[self.pos:], 0
+        self.buf += data
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n\ufeff':
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill(self.chunk_size):
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} in JSON, got {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        size = self.chunk_size
+        while True:
+            self.peek()
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.fill(size)
+            size *= 2
+
+def iter_json_values(stream: JsonStream, path=(), containers=('result', 'coverage', 'records')):
+    """Yield (path, value) for the objects in arrays and the members of the top-level object.
+
+    Members of the top-level object named in containers, and all deeper objects,
+    are walked rather than decoded. Scalars nested deeper than the top level are skipped.
+    """
+    char = stream.peek()
+    if char == '{':
+        stream.expect('{')
+        while stream.peek() != '}':
+            key = stream.value()
+            stream.expect(':')
+            child = path + (key,)
+            nested = stream.peek() in '{['
+            if nested and (path or stream.peek() == '[' or key in containers):
+                yield from iter_json_values(stream, child, containers)
+            elif path:
+                stream.value()
+            else:
+                yield child, stream.value()
+            if stream.peek() == ',':
+                stream.expect(',')
+        stream.expect('}')
+    elif char == '[':
+        stream.expect('[')
+        index = 0
+        while stream.peek() != ']':
+            child = path + (index,)
+            if stream.peek() == '{':
+                yield child, stream.value()
+            elif stream.peek() == '[':
+                yield from iter_json_values(stream, child, containers)
+            else:
+                stream.value()
+            index += 1
+            if stream.peek() == ',':
+                stream.expect(',')
+        stream.expect(']')
+    else:
+        yield path, stream.value()
+
+def coverage_json_record(key, record: dict):
+    """Return (name, kind, covered lines, uncovered lines) for one JSON coverage record, or None."""
+    if isinstance(key, str):
+        # istanbul coverage-final.json: {path: {statementMap, s}}
+        if 'statementMap' not in record:
+            return None
+        name, kind = coverage_unit_name(record.get('path', key))
+        hits = {}
+        for statement_key, statement in record['statementMap'].items():
+            line = statement['start']['line']
+            hits[line] = hits.get(line, 0) + record['s'].get(statement_key, 0)
+        return name, kind, [l for l, n in hits.items() if n], [l for l, n in hits.items() if not n]
+    if 'ApexClassOrTrigger' in record:
+        owner = record['ApexClassOrTrigger'] or {}
+        lines = record.get('Coverage') or {}
+        kind = 'trigger' if str(record.get('ApexClassOrTriggerId', '')).startswith('01q') else 'class'
+        return owner.get('Name', '?'), kind, lines.get('coveredLines', []), lines.get('uncoveredLines', [])
+    if 'name' in record and isinstance(record.get('lines'), dict):
+        kind = 'trigger' if str(record.get('id', '')).startswith('01q') else 'class'
+        lines = record['lines']
+        return (record['name'], kind, [int(l) for l, n in lines.items() if n],
+                [int(l) for l, n in lines.items() if not n])
+    return None
+
+def iter_coverage_json(path: str):
+    """Stream JSON coverage (sf test results, Tooling API records, istanbul, sfce summaries)."""
+    meta = {}
+    with open(path, encoding='utf-8', errors='replace') as fh:
+        for value_path, value in iter_json_values(JsonStream(fh)):
+            if not isinstance(value, dict):
+                if len(value_path) == 1:
+                    meta[value_path[0]] = value
+                continue
+            if meta.get('format') == 'sfce-coverage':
+                # A saved `sfce coverage --format json` summary (used as a baseline)
+                if value_path[0] == 'units':
+                    yield value['name'], value['kind'], None, value
+                continue
+            record = coverage_json_record(value_path[-1], value)
+            if record:
+                yield record
+
+def iter_coverage_xml(path: str):
+    """Stream Cobertura (<class filename><line number hits>) or Clover (<file><line num count>) XML."""
+    import xml.etree.ElementTree as ElementTree
+    hits, unit = {}, None
+    for event, elem in ElementTree.iterparse(path, events=('start', 'end')):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            if tag in ('class', 'file') and (elem.get('filename') or elem.get('path') or elem.get('name')):
+                unit = coverage_unit_name(elem.get('filename') or elem.get('path') or elem.get('name'))
+                hits = {}
+            continue
+        if tag == 'line' and unit is not None:
+            number = elem.get('number') or elem.get('num')
+            count = elem.get('hits') or elem.get('count') or '0'
+            if number and count.isdigit():
+                hits[int(number)] = hits.get(int(number), 0) + int(count)
+        elif tag in ('class', 'file') and unit is not None:
+            yield unit[0], unit[1], [l for l, n in hits.items() if n], [l for l, n in hits.items() if not n]
+            unit = None
+            elem.clear()
+
+def iter_coverage_lcov(path: str):
+    """Stream lcov tracefiles (SF:/DA:/end_of_record)."""
+    unit, hits = None, {}
+    with open(path, errors='replace') as fh:
+        for line in fh:
+            if line.startswith('SF:'):
+                unit, hits = coverage_unit_name(line[3:].strip()), {}
+            elif line.startswith('DA:') and unit is not None:
+                number, count = line[3:].split(',')[:2]
+                hits[int(number)] = hits.get(int(number), 0) + int(float(count))
+            elif line.startswith('end_of_record') and unit is not None:
+                yield unit[0], unit[1], [l for l, n in hits.items() if n], [l for l, n in hits.items() if not n]
+                unit = None
+
+def iter_coverage_file(path: str):
+    """Detect a coverage report's format and yield its per-unit line coverage."""
+    with open(path, 'rb') as fh:
+        head = fh.read(512).lstrip(b'\xef\xbb\xbf \t\r\n')
+    if head.startswith((b'{', b'[')):
+        yield from iter_coverage_json(path)
+    elif head.startswith(b'<'):
+        yield from iter_coverage_xml(path)
+    elif head.startswith((b'TN:', b'SF:')):
+        yield from iter_coverage_lcov(path)
+    else:
+        raise ValueError('unrecognised coverage format')
+
+def line_ranges(lines, executable):
+    """Collapse uncovered lines into 'a-b' ranges; non-executable gaps do not split a range."""
+    ranges, run = [], None
+    for line in sorted(executable):
+        if line in lines:
+            run = [run[0], line] if run else [line, line]
+        elif run:
+            ranges.append(run)
+            run = None
+    if run:
+        ranges.append(run)
+    return [f"{a}-{b}" if a != b else str(a) for a, b in ranges]
+
+def merge_coverage(paths):
+    """Merge coverage reports per class/trigger.
+
+    Returns ({key: unit}, {key: saved summary unit}) where saved summaries come
+    from sfce-coverage JSON files, which only carry totals.
+    """
+    units, summaries = {}, {}
+    for path in paths:
+        try:
+            for name, kind, covered, uncovered in iter_coverage_file(path):
+                key = name.lower()
+                if covered is None:
+                    summaries[key] = uncovered
+                    continue
+                unit = units.setdefault(key, {'name': name, 'kind': kind, 'covered': set(), 'lines': set()})
+                unit['kind'] = unit['kind'] or kind
+                unit['covered'].update(covered)
+                unit['lines'].update(covered)
+                unit['lines'].update(uncovered)
+        except (ValueError, SyntaxError, KeyError, TypeError) as e:
+            # SyntaxError covers xml.etree.ElementTree.ParseError
+            raise ValueError(f"{path}: {e}") from e
+    return units, summaries
+
+def summarize_coverage(units, summaries=None):
+    """Return per-unit coverage records (name, kind, lines, covered, percent, uncovered ranges)."""
+    records = {}
+    for key, unit in units.items():
+        lines, covered = len(unit['lines']), len(unit['covered'])
+        records[key] = {
+            'name': unit['name'], 'kind': unit['kind'] or 'class', 'lines': lines, 'covered': covered,
+            'percent': round(100.0 * covered / lines, 2) if lines else 100.0,
+            'uncovered': line_ranges(unit['lines'] - unit['covered'], unit['lines']),
+        }
+    for key, summary in (summaries or {}).items():
+        records.setdefault(key, dict(summary))
+    return records
+
+def coverage_command(args):
+    """Aggregate Apex code coverage reports and gate on the project threshold."""
+    project_path = Path(args.path).resolve()
+    if args.threshold is not None:
+        threshold, source = args.threshold, '--threshold'
+    else:
+        threshold, source = coverage_threshold(project_path)
+
+    try:
+        units, summaries = merge_coverage(args.files)
+        current = summarize_coverage(units, summaries)
+        baseline = summarize_coverage(*merge_coverage([args.baseline])) if args.baseline else {}
+    except (OSError, ValueError) as e:
+        print_error(f"Could not read coverage report: {e}")
+        return 1
+    if not current:
+        print_error("No class or trigger coverage found in the given reports")
+        return 1
+
+    tests = load_apex_index(project_path).get('tests', {}) if (project_path / '.sfce').is_dir() else {}
+    total_lines = sum(r['lines'] for r in current.values())
+    total_covered = sum(r['covered'] for r in current.values())
+    total = round(100.0 * total_covered / total_lines, 2) if total_lines else 100.0
+    baseline_lines = sum(r['lines'] for r in baseline.values())
+    baseline_total = (round(100.0 * sum(r['covered'] for r in baseline.values()) / baseline_lines, 2)
+                      if baseline_lines else None)
+
+    for key, record in current.items():
+        previous = baseline.get(key)
+        record['delta'] = round(record['percent'] - previous['percent'], 2) if previous else None
+        record['below_threshold'] = record['lines'] > 0 and record['percent'] < threshold
+        record['tests'] = tests.get(key, [])
+    ordered = sorted(current.values(), key=lambda r: (-(r['lines'] - r['covered']), r['name'].lower()))
+    below = [r for r in ordered if r['below_threshold']]
+    regressions = sorted((r for r in ordered if r['delta'] is not None and r['delta'] < 0),
+                         key=lambda r: r['delta'])
+
+    failures = []
+    for gate in args.fail_on or ():
+        if gate == 'total' and total < threshold:
+            failures.append(f"total coverage {total:.2f}% is below {threshold:g}%")
+        elif gate == 'class' and below:
+            failures.append(f"{len(below)} class(es)/trigger(s) below {threshold:g}%")
+        elif gate == 'regression' and (regressions or (baseline_total is not None and total < baseline_total)):
+            failures.append(f"coverage decreased for {len(regressions)} class(es)/trigger(s)")
+
+    report = {
+        'format': 'sfce-coverage',
+        'threshold': threshold,
+        'threshold_source': source,
+        'total': {'percent': total, 'lines': total_lines, 'covered': total_covered,
+                  'classes': sum(1 for r in ordered if r['kind'] == 'class'),
+                  'triggers': sum(1 for r in ordered if r['kind'] == 'trigger'),
+                  'baseline_percent': baseline_total,
+                  'delta': round(total - baseline_total, 2) if baseline_total is not None else None},
+        'below_threshold': len(below),
+        'regressions': len(regressions),
+        'failures': failures,
+        'units': ordered,
+    }
+
+    if args.format == 'json':
+        output = json.dumps(report, indent=2) + '\n'
+    else:
+        delta = f", {report['total']['delta']:+.2f} vs baseline" if baseline_total is not None else ''
+        lines = ['# Apex Code Coverage', '',
+                 f"Total: **{total:.2f}%** ({total_covered:,}/{total_lines:,} lines) across "
+                 f"{report['total']['classes']:,} classes and {report['total']['triggers']:,} triggers{delta}",
+                 f"Threshold: {threshold:g}% ({source}); {len(below):,} below, "
+                 f"{len(regressions):,} regressed", '']
+        sections = [('Below Threshold (most uncovered lines first)', below)]
+        if baseline:
+            sections.append(('Regressions vs Baseline', regressions))
+        for title, rows in sections:
+            if not rows:
+                continue
+            lines += [f"## {title}", '',
+                      '| Class/Trigger | Coverage | Covered | Δ | Uncovered lines | Tests |',
+                      '|---------------|---------:|--------:|--:|-----------------|-------|']
+            for r in rows[:args.top]:
+                uncovered = ', '.join(r['uncovered'][:8]) + (' …' if len(r['uncovered']) > 8 else '')
+                change = f"{r['delta']:+.1f}" if r['delta'] is not None else ('new' if baseline else '')
+                name = r['name'] + (' (trigger)' if r['kind'] == 'trigger' else '')
+                lines.append(f"| {name} | {r['percent']:.1f}% | {r['covered']}/{r['lines']} | {change} | "
+                             f"{uncovered} | {', '.join(r['tests'][:3])} |")
+            if len(rows) > args.top:
+                lines.append(f"\n…and {len(rows) - args.top:,} more (use --top or --format json)")
+            lines.append('')
+        for failure in failures:
+            lines.append(f"❌ Gate failed: {failure}")
+        output = '\n'.join(lines).rstrip('\n') + '\n'
+
+    if args.output:
+        Path(args.output).write_text(output)
+        print_success(f"Coverage {total:.2f}% across {len(ordered):,} classes/triggers: {args.output}")
+    else:
+        sys.stdout.write(output)
+    return 1 if failures else 0
+
+# Git object access (read files at a commit without checking it out)
+
+def git_rev_parse(project_path: Path, rev: str):
+    """Return the full commit sha for rev, or None if it does not resolve."""
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--verify', '--quiet', f"{rev}^{{commit}}"], cwd=project_path,
+                             capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.strip() or None
+
+def git_ls_tree(project_path: Path, rev: str):
+    """Return paths (relative to project_path) of the files in rev under project_path."""
+    out = subprocess.run(['git', 'ls-tree', '-r', '-z', '--name-only', rev], cwd=project_path,
+                         capture_output=True, check=True).stdout
+    return [name for name in out.decode('utf-8', 'surrogateescape').split('\0') if name]
+
+def git_source_filter(project_path: Path, rev: str):
+    """Return a predicate telling whether iter_project_files() would yield a path at rev.
+
+    Package directories, .gitignore and .forceignore are read from rev itself.
+    """
+    config = dict(iter_git_blobs(project_path, rev, ['sfdx-project.json', '.gitignore', '.forceignore']))
+    roots = []
+    if config['sfdx-project.json']:
+        try:
+            roots = [entry['path'] for entry in json.loads(config['sfdx-project.json']).get('packageDirectories', [])
+                     if entry.get('path')]
+        except (ValueError, TypeError, AttributeError):
+            pass
+    roots = [Path(root).as_posix() for root in roots or ['force-app']]
+    lines = list(DEFAULT_IGNORES)
+    for name in ('.gitignore', '.forceignore'):
+        if config[name]:
+            lines += config[name].decode('utf-8', 'replace').splitlines()
+    rules = IgnoreRules(lines)
+
+    ignored_dirs = {}
+    def dir_ignored(rel_dir):
+        if rel_dir not in ignored_dirs:
+            ignored_dirs[rel_dir] = rules.ignored(rel_dir, True)
+        return ignored_dirs[rel_dir]
+
+    def keep(rel: str) -> bool:
+        root = next((root for root in roots if root == '.' or rel.startswith(root + '/')), None)
+        if root is None:
+            return False
+        # Like the walk: directories below the package root, then the file itself
+        parts = rel.split('/')
+        start = 1 if root == '.' else root.count('/') + 2
+        return not (rules.ignored(rel, False)
+                    or any(dir_ignored('/'.join(parts[:i])) for i in range(start, len(parts))))
+    return keep
+
+def git_source_files(project_path: Path, rev: str):
+    """Return the files in rev that iter_project_files() would yield for that commit."""
+    keep = git_source_filter(project_path, rev)
+    return [rel for rel in git_ls_tree(project_path, rev) if keep(rel)]
+
+def iter_git_blobs(project_path: Path, rev: str, paths):
+    """Yield (item, bytes or None) for paths at rev through one `git cat-file --batch` process.
+
+    An item may also be a (rev, path) tuple to read files from several commits.
+    """
+    proc = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=project_path,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        for item in paths:
+            item_rev, path = item if isinstance(item, tuple) else (rev, item)
+            proc.stdin.write(f"{item_rev}:./{path}\n".encode('utf-8', 'surrogateescape'))
+            proc.stdin.flush()
+            header = proc.stdout.readline().split()
+            if len(header) != 3 or header[1] != b'blob':
+                yield item, None
+                continue
+            data = proc.stdout.read(int(header[2]))
+            proc.stdout.read(1)  # trailing newline
+            yield item, data
+    finally:
+        proc.stdin.close()
+        proc.stdout.close()
+        proc.wait()
+
+# Permission matrix (profiles, permission sets, permission set groups)
+#
+# Each (section, target, permission) column is a bitset over principals held
+# in a Python int, so "who can edit X" is a single lookup and diffing two
+# matrices is an XOR per column. Stored in .sfce/permissions.v2.json with the
+# bitsets as hex strings.
+
+PERMISSION_MATRIX_VERSION = 1
+
+PERMISSION_SUFFIXES = {
+    '.profile-meta.xml': 'profile',
+    '.permissionset-meta.xml': 'permissionset',
+    '.permissionsetgroup-meta.xml': 'group',
+    '.mutingpermissionset-meta.xml': 'mutingpermissionset',
+}
+
+# Kinds whose own parsed grants are matrix bits. Groups are derived from their
+# members; a muting permission set only removes grants from the groups using it.
+PERMISSION_ROW_KINDS = ('profile', 'permissionset')
+
+# XML element -> (matrix section, target child element, {child element: permission})
+PERMISSION_ELEMENTS = {
+    'objectPermissions': ('objects', 'object', {
+        'allowCreate': 'create', 'allowRead': 'read', 'allowEdit': 'edit', 'allowDelete': 'delete',
+        'viewAllRecords': 'viewAll', 'modifyAllRecords': 'modifyAll'}),
+    'fieldPermissions': ('fields', 'field', {'readable': 'read', 'editable': 'edit'}),
+    'userPermissions': ('user', 'name', {'enabled': 'access'}),
+    'classAccesses': ('classes', 'apexClass', {'enabled': 'access'}),
+}
+
+PERMISSION_NAMES = ('create', 'read', 'edit', 'delete', 'viewAll', 'modifyAll', 'access')
+
+def permission_principal(rel: str):
+    """Return (name, kind) for a profile/permission set/group file, else None."""
+    base = rel.rsplit('/', 1)[-1]
+    for suffix, kind in PERMISSION_SUFFIXES.items():
+        if base.endswith(suffix):
+            return urllib.parse.unquote(base[:-len(suffix)]), kind
+    return None
+
+def parse_permission_xml(source):
+    """Stream-parse one profile/permission set/group (path or bytes).
+
+    Returns {'grants': {section: {target: [permission, ...]}}, 'members': [...],
+    'muting': [...]}; the last two are a group's permission sets and muting set.
+    Elements are cleared as soon as they are read, so memory stays flat for
+    profiles that run to tens of MB.
+    """
+    import xml.etree.ElementTree as ElementTree
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    grants, members, muting = {}, [], []
+    depth, root = 0, None
+    for event, elem in ElementTree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        tag = elem.tag.rsplit('}', 1)[-1]
+        spec = PERMISSION_ELEMENTS.get(tag)
+        if spec:
+            section, target_tag, flags = spec
+            values = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in elem}
+            target = values.get(target_tag)
+            granted = [perm for flag, perm in flags.items() if values.get(flag) == 'true']
+            if target and granted:
+                grants.setdefault(section, {})[target] = granted
+        elif tag == 'permissionSets' and elem.text:
+            members.append(elem.text.strip())
+        elif tag == 'mutingPermissionSets' and elem.text:
+            muting.append(elem.text.strip())
+        root.clear()
+    return {'grants': grants, 'members': members, 'muting': muting}
+
+def _parse_permission_task(task):
+    rel, source = task
+    return rel, parse_permission_xml(source)
+
+def parse_permission_files(tasks, workers: int = None):
+    """Parse [(rel, path or bytes)] in a process pool when there is enough work."""
+    large = sum(len(s) if isinstance(s, bytes) else os.path.getsize(s) for _, s in tasks) >= 8 * 1024 * 1024
+    if len(tasks) > 1 and (large or len(tasks) >= 32):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            return dict(pool.map(_parse_permission_task, tasks, chunksize=4))
+    return dict(map(_parse_permission_task, tasks))
+
+def matrix_rows(matrix: dict):
+    """Expand a matrix's columns back into one grants dict per principal."""
+    rows = [{} for _ in matrix['principals']]
+    for section, targets in matrix['grants'].items():
+        for target, perms in targets.items():
+            for perm, bits in perms.items():
+                bits = int(bits, 16)
+                while bits:
+                    low = bits & -bits
+                    row = rows[low.bit_length() - 1].setdefault(section, {}).setdefault(target, [])
+                    row.append(perm)
+                    bits ^= low
+    return rows
+
+def decode_permission_columns(matrix: dict):
+    """Return {(section, target, permission): principal bitset} for a stored matrix."""
+    return {(section, target, perm): int(bits, 16)
+            for section, targets in matrix['grants'].items()
+            for target, perms in targets.items()
+            for perm, bits in perms.items()}
+
+def update_permission_columns(columns: dict, principals, rows: dict):
+    """Replace the bits of the principals in rows ({index: grants}) and recompute groups.
+
+    A permission set group's bit is set wherever any of its member permission
+    sets has one, except for the permissions its muting permission set lists,
+    so groups never need their own parsed grants.
+    """
+    for i, row in rows.items():
+        bit = 1 << i
+        for key in columns:
+            columns[key] &= ~bit
+        for section, targets in row.items():
+            for target, perms in targets.items():
+                for perm in perms:
+                    key = (section, target, perm)
+                    columns[key] = columns.get(key, 0) | bit
+    by_name = {(p['kind'], p['name'].lower()): i for i, p in enumerate(principals)}
+    for g, principal in enumerate(principals):
+        if principal['kind'] != 'group':
+            continue
+        mask = 0
+        for member in principal.get('members', []):
+            j = by_name.get(('permissionset', member.lower()))
+            if j is not None:
+                mask |= 1 << j
+        muted = set()
+        for name in principal.get('muting', []):
+            j = by_name.get(('mutingpermissionset', name.lower()))
+            if j is not None:
+                muted.update((section, target, perm) for section, targets in principals[j]['grants'].items()
+                             for target, perms in targets.items() for perm in perms)
+        bit = 1 << g
+        for key, bits in columns.items():
+            columns[key] = bits | bit if bits & mask and key not in muted else bits & ~bit
+    return columns
+
+def encode_permission_matrix(principals, columns: dict) -> dict:
+    grants = {}
+    for (section, target, perm), bits in sorted(columns.items()):
+        if bits:
+            grants.setdefault(section, {}).setdefault(target, {})[perm] = format(bits, 'x')
+    return {'version': PERMISSION_MATRIX_VERSION, 'principals': principals, 'grants': grants}
+
+def build_permission_matrix(principals, rows):
+    """Build the matrix from principal records and their parsed grants (groups are derived)."""
+    rows = {i: row for i, row in enumerate(rows) if principals[i]['kind'] in PERMISSION_ROW_KINDS}
+    return encode_permission_matrix(principals, update_permission_columns({}, principals, rows))
+
+def load_permission_matrix(path: Path):
+    try:
+        matrix = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    return matrix if matrix.get('version') == PERMISSION_MATRIX_VERSION else None
+
+def scan_permissions(project_path: Path, force: bool = False, workers: int = None):
+    """Refresh .sfce/permissions.v2.json from the working tree, re-parsing only changed files.
+
+    When the set of files is unchanged, only the changed principals' bits are
+    rewritten in the stored columns. Returns (matrix, parsed_count).
+    """
+    # v2: groups subtract their muting permission set (earlier caches did not record it)
+    cache_path = get_project_cache_dir(project_path) / 'permissions.v2.json'
+    previous = None if force else load_permission_matrix(cache_path)
+    old_principals = previous['principals'] if previous else []
+    old_by_file = {p['file']: p for p in old_principals}
+
+    principals, pending = [], []
+    for rel, size in iter_project_files(project_path, tuple(PERMISSION_SUFFIXES)):
+        name, kind = permission_principal(rel)
+        mtime_ns = os.stat(project_path / rel).st_mtime_ns
+        old = old_by_file.get(rel)
+        if old and old['mtime_ns'] == mtime_ns and old['size'] == size:
+            principals.append(old)
+        else:
+            principals.append({'name': name, 'kind': kind, 'file': rel, 'mtime_ns': mtime_ns, 'size': size})
+            pending.append(len(principals) - 1)
+    same_layout = previous is not None and [p['file'] for p in old_principals] == [p['file'] for p in principals]
+    if same_layout and not pending:
+        return previous, 0
+
+    parsed = parse_permission_files([(principals[i]['file'], str(project_path / principals[i]['file']))
+                                     for i in pending], workers)
+    rows = {}
+    for i in pending:
+        result = parsed[principals[i]['file']]
+        if principals[i]['kind'] == 'group':
+            principals[i]['members'] = result['members']
+            principals[i]['muting'] = result['muting']
+        elif principals[i]['kind'] == 'mutingpermissionset':
+            principals[i]['grants'] = result['grants']
+        else:
+            rows[i] = result['grants']
+    if same_layout:
+        columns = decode_permission_columns(previous)
+    else:
+        columns = {}
+        if previous:
+            old_rows = dict(zip((p['file'] for p in old_principals), matrix_rows(previous)))
+            for i, principal in enumerate(principals):
+                if i not in rows and principal['kind'] in PERMISSION_ROW_KINDS:
+                    rows[i] = old_rows[principal['file']]
+    matrix = encode_permission_matrix(principals, update_permission_columns(columns, principals, rows))
+    write_atomic(cache_path, json.dumps(matrix, separators=(',', ':')).encode())
+    return matrix, len(pending)
+
+def scan_permissions_at(project_path: Path, rev: str, workers: int = None):
+    """Build (and cache by commit sha) the permission matrix for a git revision."""
+    sha = git_rev_parse(project_path, rev)
+    if sha is None:
+        raise ValueError(f"not a file or git revision: {rev}")
+    # v2: only package directories minus ignored paths (earlier caches read the whole tree)
+    # v3: groups subtract their muting permission set
+    cache_path = get_project_cache_dir(project_path) / 'permissions' / f"{sha}.v3.json"
+    cached = load_permission_matrix(cache_path)
+    if cached:
+        return cached
+    files = [rel for rel in git_source_files(project_path, sha) if permission_principal(rel)]
+    blobs = [(rel, data) for rel, data in iter_git_blobs(project_path, sha, files) if data is not None]
+    parsed = parse_permission_files(blobs, workers)
+    principals, rows = [], []
+    for rel, data in blobs:
+        name, kind = permission_principal(rel)
+        principal = {'name': name, 'kind': kind, 'file': rel, 'size': len(data)}
+        if kind == 'group':
+            principal['members'] = parsed[rel]['members']
+            principal['muting'] = parsed[rel]['muting']
+        elif kind == 'mutingpermissionset':
+            principal['grants'] = parsed[rel]['grants']
+        principals.append(principal)
+        rows.append(parsed[rel]['grants'])
+    matrix = build_permission_matrix(principals, rows)
+    matrix['commit'] = sha
+    write_atomic(cache_path, json.dumps(matrix, separators=(',', ':')).encode())
+    return matrix
+
+def resolve_permission_matrix(project_path: Path, spec: str, workers: int = None):
+    """Load a matrix from a saved JSON file, a git revision, or the working tree ('.')."""
+    if spec in ('.', 'WORKTREE'):
+        return scan_permissions(project_path, workers=workers)[0]
+    if Path(spec).is_file():
+        matrix = load_permission_matrix(Path(spec))
+        if matrix is None:
+            raise ValueError(f"not a permission matrix: {spec}")
+        return matrix
+    return scan_permissions_at(project_path, spec, workers)
+
+def bit_indexes(bits: int):
+    """Yield the positions of the set bits in bits."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+def resolve_permission_target(matrix: dict, target: str):
+    """Return (section, canonical target) for an object, Object.Field, user permission or class."""
+    grants = matrix['grants']
+    sections = ('fields',) if '.' in target else ('objects', 'user', 'classes')
+    for section in sections:
+        for name in grants.get(section, {}):
+            if name.lower() == target.lower():
+                return section, name
+    return sections[0], target
+
+def who_can(matrix: dict, perm: str, target: str):
+    """Return principals holding perm on target, split into direct and implied grants.
+
+    Implied grants (objects only): modifyAll/viewAll on the object, and the
+    ModifyAllData/ViewAllData user permissions. These do not override
+    field-level security, so field queries need the field's own bit.
+    """
+    section, target = resolve_permission_target(matrix, target)
+    grants = matrix['grants']
+    column = lambda sec, name, p: int(grants.get(sec, {}).get(name, {}).get(p, '0'), 16)
+    direct = column(section, target, perm)
+    implied = 0
+    if section == 'objects':
+        if perm in ('read', 'edit', 'delete', 'create'):
+            implied |= column('objects', target, 'modifyAll') | column('user', 'ModifyAllData', 'access')
+        if perm == 'read':
+            implied |= column('objects', target, 'viewAll') | column('user', 'ViewAllData', 'access')
+    object_perm = column('objects', target.split('.', 1)[0], perm) if section == 'fields' else None
+    principals = matrix['principals']
+    results = []
+    for i in bit_indexes(direct | implied):
+        record = {'name': principals[i]['name'], 'kind': principals[i]['kind'],
+                  'via': 'direct' if direct >> i & 1 else 'implied'}
+        if object_perm is not None:
+            record['object_access'] = bool(object_perm >> i & 1)
+        results.append(record)
+    kinds = list(PERMISSION_SUFFIXES.values())
+    results.sort(key=lambda r: (r['via'] != 'direct', kinds.index(r['kind']), r['name'].lower()))
+    return section, target, results
+
+def diff_permission_matrices(old: dict, new: dict):
+    """Return granted/revoked (principal, kind, section, target, permission) changes."""
+    old_names = [(p['kind'], p['name']) for p in old['principals']]
+    new_names = [(p['kind'], p['name']) for p in new['principals']]
+    same_order = old_names == new_names
+    old_index = {name: i for i, name in enumerate(old_names)}
+    changes = []
+    for section in sorted(set(old['grants']) | set(new['grants'])):
+        old_targets, new_targets = old['grants'].get(section, {}), new['grants'].get(section, {})
+        for target in sorted(set(old_targets) | set(new_targets)):
+            old_perms, new_perms = old_targets.get(target, {}), new_targets.get(target, {})
+            for perm in sorted(set(old_perms) | set(new_perms)):
+                before, after = int(old_perms.get(perm, '0'), 16), int(new_perms.get(perm, '0'), 16)
+                if same_order:
+                    if before == after:
+                        continue
+                    granted = [new_names[i] for i in bit_indexes(after & ~before)]
+                    revoked = [old_names[i] for i in bit_indexes(before & ~after)]
+                else:
+                    before_set = {old_names[i] for i in bit_indexes(before)}
+                    after_set = {new_names[i] for i in bit_indexes(after)}
+                    granted = sorted(after_set - before_set)
+                    revoked = sorted(before_set - after_set)
+                for change, names in (('granted', granted), ('revoked', revoked)):
+                    for kind, name in names:
+                        changes.append({'change': change, 'principal': name, 'kind': kind,
+                                        'section': section, 'target': target, 'permission': perm})
+    added = sorted(set(new_names) - set(old_index))
+    removed = sorted(set(old_index) - set(new_names))
+    return changes, added, removed
+
+def scan_permissions_command(args):
+    """Build, query or diff the permission matrix."""
+    project_path = Path(args.path).resolve()
+    if args.diff and len(args.diff) > 2:
+        print_error("--diff takes one or two revisions or matrix files")
+        return 1
+    started = time.perf_counter()
+    try:
+        if args.diff:
+            old = resolve_permission_matrix(project_path, args.diff[0], args.jobs)
+            new = resolve_permission_matrix(project_path, args.diff[1] if len(args.diff) > 1 else '.', args.jobs)
+        else:
+            matrix, parsed = scan_permissions(project_path, args.force, args.jobs)
+    except (ValueError, OSError, SyntaxError, subprocess.CalledProcessError) as e:
+        print_error(f"Permission scan failed: {e}")
+        return 1
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if args.diff:
+        changes, added, removed = diff_permission_matrices(old, new)
+        if args.json:
+            print(json.dumps({'changes': changes, 'added_principals': [n for _, n in added],
+                              'removed_principals': [n for _, n in removed]}, indent=2))
+            return 0
+        label = f"{args.diff[0]} → {args.diff[1] if len(args.diff) > 1 else 'working tree'}"
+        for kind, name in added:
+            print(f"{Colors.GREEN}+ {name} ({kind}) added{Colors.RESET}")
+        for kind, name in removed:
+            print(f"{Colors.RED}- {name} ({kind}) removed{Colors.RESET}")
+        for c in changes:
+            sign, color = ('+', Colors.GREEN) if c['change'] == 'granted' else ('-', Colors.RED)
+            print(f"{color}{sign} {c['principal']} ({c['kind']}): {c['permission']} {c['target']}{Colors.RESET}")
+        granted = sum(1 for c in changes if c['change'] == 'granted')
+        print_info(f"{label}: {granted} granted, {len(changes) - granted} revoked in {elapsed:.0f} ms")
+        return 0
+
+    if args.who_can:
+        perm = {p.lower(): p for p in PERMISSION_NAMES}.get(args.who_can[0].lower())
+        if perm is None:
+            print_error(f"Unknown permission '{args.who_can[0]}' (choose from {', '.join(PERMISSION_NAMES)})")
+            return 1
+        section, target, results = who_can(matrix, perm, args.who_can[1])
+        if args.json:
+            print(json.dumps({'permission': perm, 'target': target, 'section': section,
+                              'principals': results}, indent=2))
+            return 0
+        if not results:
+            print_warning(f"No profile or permission set grants {perm} on {target}")
+            return 0
+        print(f"{Colors.BOLD}{perm} {target}{Colors.RESET} ({len(results)} principal(s))")
+        for r in results:
+            note = '' if r['via'] == 'direct' else '  (implied by View/Modify All)'
+            if r.get('object_access') is False and r['via'] == 'direct':
+                note = f"  (no object {perm} in this {r['kind']})"
+            print(f"  {r['kind']:<14} {r['name']}{note}")
+        return 0
+
+    grants = matrix['grants']
+    kinds = {}
+    for principal in matrix['principals']:
+        kinds[principal['kind']] = kinds.get(principal['kind'], 0) + 1
+    summary = {
+        'principals': kinds,
+        'objects': len(grants.get('objects', {})),
+        'fields': len(grants.get('fields', {})),
+        'user_permissions': len(grants.get('user', {})),
+        'apex_classes': len(grants.get('classes', {})),
+        'parsed': parsed,
+        'elapsed_ms': round(elapsed, 1),
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    principal_text = ', '.join(f"{count} {kind}(s)" for kind, count in sorted(kinds.items())) or 'no principals'
+    print_success(f"Permission matrix: {principal_text} × {summary['objects']} objects, "
+                  f"{summary['fields']} fields, {summary['user_permissions']} user permissions, "
+                  f"{summary['apex_classes']} Apex classes ({parsed} parsed in {elapsed:.0f} ms)")
+    return 0
+
+# Data model graph (objects, relationships, roll-ups, indexes)
+
+DATAMODEL_VERSION = 1
+
+DATAMODEL_SUFFIXES = ('.object-meta.xml', '.field-meta.xml', '.index-meta.xml')
+
+# Per-object platform limits checked by `sfce scan datamodel`
+DATAMODEL_LIMITS = {
+    'relationships': 40,        # lookup + master-detail fields per object
+    'master_detail': 2,         # master-detail fields per object
+    'rollups': 25,              # roll-up summary fields per object
+    'custom_fields': 500,       # Enterprise Edition default
+    'master_detail_depth': 3,   # levels of multilevel master-detail
+}
+
+# Standard fields the platform indexes on every object
+STANDARD_INDEXED_FIELDS = {'id', 'name', 'ownerid', 'createddate', 'systemmodstamp', 'recordtypeid',
+                           'lastmodifieddate', 'email', 'division'}
+
+def parse_datamodel_file(path: str) -> dict:
+    """Read one object, field or index file into a flat record."""
+    import xml.etree.ElementTree as ElementTree
+    root = ElementTree.parse(path).getroot()
+    values = {}
+    for child in root:
+        tag = child.tag.rsplit('}', 1)[-1]
+        if len(child):
+            if tag == 'fields':
+                values.setdefault('index_fields', []).append(
+                    ''.join((c.text or '').strip() for c in child if c.tag.endswith('name')))
+            continue
+        values.setdefault(tag, (child.text or '').strip())
+    return values
+
+def datamodel_record(rel: str, values: dict):
+    """Normalize parsed XML values into an object, field or index record."""
+    parts = rel.split('/')
+    name = parts[-1]
+    if name.endswith('.object-meta.xml'):
+        return {'kind': 'object', 'object': name[:-len('.object-meta.xml')], 'label': values.get('label'),
+                'sharing_model': values.get('sharingModel')}
+    if name.endswith('.index-meta.xml'):
+        return {'kind': 'index', 'object': parts[-3], 'fields': values.get('index_fields', [])}
+    field = name[:-len('.field-meta.xml')]
+    ftype = values.get('type')
+    reference = values.get('referenceTo')
+    if ftype in ('Lookup', 'MasterDetail', 'Hierarchy') and not reference:
+        # Standard relationship fields omit referenceTo: AccountId -> Account, OwnerId -> User
+        reference = {'Owner': 'User', 'Parent': parts[-3], 'CreatedBy': 'User',
+                     'LastModifiedBy': 'User'}.get(field[:-2], field[:-2]) if field.endswith('Id') else None
+        if ftype == 'Hierarchy':
+            reference = 'User'
+    return {
+        'kind': 'field', 'object': parts[-3], 'field': field, 'type': ftype,
+        'reference_to': reference, 'relationship_name': values.get('relationshipName'),
+        'external_id': values.get('externalId') == 'true', 'unique': values.get('unique') == 'true',
+        'required': values.get('required') == 'true', 'delete_constraint': values.get('deleteConstraint'),
+        'summary_foreign_key': values.get('summaryForeignKey'),
+        'summary_operation': values.get('summaryOperation'),
+        'summarized_field': values.get('summarizedField'),
+        'formula': bool(values.get('formula')),
+    }
+
+def _parse_datamodel_task(task):
+    rel, path = task
+    try:
+        return rel, datamodel_record(rel, parse_datamodel_file(path))
+    except SyntaxError as e:  # xml.etree.ElementTree.ParseError
+        return rel, {'kind': 'error', 'error': str(e)}
+
+def update_datamodel_cache(project_path: Path, force: bool = False, workers: int = None):
+    """Refresh .sfce/datamodel.json, re-parsing only files whose mtime or size changed.
+
+    Returns (records by file, parsed_count).
+    """
+    cache_path = get_project_cache_dir(project_path) / 'datamodel.json'
+    previous = {}
+    if not force and cache_path.exists():
+        try:
+            data = json.loads(cache_path.read_text())
+            if data.get('version') == DATAMODEL_VERSION:
+                previous = data['files']
+        except (OSError, ValueError, KeyError):
+            previous = {}
+
+    files, pending = {}, []
+    for rel, size in iter_project_files(project_path, DATAMODEL_SUFFIXES):
+        parts = rel.split('/')
+        if 'objects' not in parts[:-1]:
+            continue
+        mtime_ns = os.stat(project_path / rel).st_mtime_ns
+        entry = previous.get(rel)
+        if entry and entry['mtime_ns'] == mtime_ns and entry['size'] == size:
+            files[rel] = entry
+        else:
+            files[rel] = {'mtime_ns': mtime_ns, 'size': size}
+            pending.append(rel)
+
+    if pending:
+        tasks = [(rel, str(project_path / rel)) for rel in pending]
+        if len(tasks) >= 64:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_parse_datamodel_task, tasks, chunksize=32))
+        else:
+            results = [_parse_datamodel_task(task) for task in tasks]
+        for rel, record in results:
+            files[rel]['record'] = record
+    if pending or set(previous) != set(files):
+        write_atomic(cache_path, json.dumps({'version': DATAMODEL_VERSION, 'files': files},
+                                            separators=(',', ':')).encode())
+    return files, len(pending)
+
+def build_datamodel(files: dict) -> dict:
+    """Assemble objects, relationship edges and roll-ups from cached file records."""
+    objects, relationships, rollups, errors = {}, [], [], []
+
+    def node(name):
+        return objects.setdefault(name, {'name': name, 'label': None, 'sharing_model': None, 'in_source': False,
+                                         'fields': 0, 'custom_fields': 0, 'indexed': set(),
+                                         'external_ids': [], 'unique': []})
+
+    for rel, entry in sorted(files.items()):
+        record = entry['record']
+        if record['kind'] == 'error':
+            errors.append({'file': rel, 'error': record['error']})
+        elif record['kind'] == 'object':
+            obj = node(record['object'])
+            obj.update(label=record['label'], sharing_model=record['sharing_model'], in_source=True)
+        elif record['kind'] == 'index':
+            node(record['object'])['indexed'].update(f for f in record['fields'] if f)
+        else:
+            obj = node(record['object'])
+            field = record['field']
+            obj['fields'] += 1
+            obj['custom_fields'] += field.endswith('__c')
+            if record['external_id']:
+                obj['external_ids'].append(field)
+                obj['indexed'].add(field)
+            if record['unique']:
+                obj['unique'].append(field)
+                obj['indexed'].add(field)
+            if record['type'] in ('Lookup', 'MasterDetail', 'Hierarchy') and record['reference_to']:
+                obj['indexed'].add(field)
+                node(record['reference_to'])
+                relationships.append({
+                    'from': record['object'], 'field': field, 'to': record['reference_to'],
+                    'type': 'master_detail' if record['type'] == 'MasterDetail' else 'lookup',
+                    'relationship_name': record['relationship_name'], 'required': record['required'],
+                    'delete_constraint': record['delete_constraint'],
+                })
+            elif record['type'] == 'Summary':
+                rollups.append({'object': record['object'], 'field': field,
+                                'operation': record['summary_operation'],
+                                'source': record['summary_foreign_key'],
+                                'summarized_field': record['summarized_field']})
+    for obj in objects.values():
+        obj['indexed'] = sorted(obj['indexed'])
+    return {'objects': dict(sorted(objects.items())), 'relationships': relationships,
+            'rollups': rollups, 'errors': errors}
+
+def relationship_chains(model: dict, types=('lookup', 'master_detail'), top: int = 10):
+    """Return the longest child -> parent chains (memoized DFS; edges closing a cycle are skipped)."""
+    parents = {}
+    for edge in model['relationships']:
+        if edge['type'] in types and edge['from'] != edge['to']:
+            parents.setdefault(edge['from'], []).append(edge)
+    memo, on_path = {}, set()
+
+    def longest(name):
+        if name in memo:
+            return memo[name]
+        on_path.add(name)
+        best = []
+        for edge in parents.get(name, ()):
+            if edge['to'] in on_path:
+                continue
+            chain = [edge] + longest(edge['to'])
+            if len(chain) > len(best):
+                best = chain
+        on_path.discard(name)
+        memo[name] = best
+        return best
+
+    chains = [(name, longest(name)) for name in sorted(parents)]
+    chains.sort(key=lambda item: -len(item[1]))
+    return [{'depth': len(chain),
+             'path': [start] + [f"{edge['field']} → {edge['to']}" for edge in chain]}
+            for start, chain in chains[:top] if chain]
+
+def objects_near_limits(model: dict, warn_at: float = 80):
+    """Return per-object limit usage at or above warn_at percent."""
+    counts = {name: {'relationships': 0, 'master_detail': 0, 'rollups': 0,
+                     'custom_fields': obj['custom_fields']} for name, obj in model['objects'].items()}
+    for edge in model['relationships']:
+        counts[edge['from']]['relationships'] += 1
+        counts[edge['from']]['master_detail'] += edge['type'] == 'master_detail'
+    for rollup in model['rollups']:
+        counts[rollup['object']]['rollups'] += 1
+    for chain in relationship_chains(model, ('master_detail',), top=len(model['objects'])):
+        counts[chain['path'][0]]['master_detail_depth'] = chain['depth']
+
+    results = []
+    for name, usage in counts.items():
+        for metric, used in usage.items():
+            limit = DATAMODEL_LIMITS[metric]
+            percent = 100.0 * used / limit
+            if percent >= warn_at:
+                results.append({'object': name, 'metric': metric, 'used': used, 'limit': limit,
+                                'percent': round(percent, 1)})
+    results.sort(key=lambda r: (-r['percent'], r['object']))
+    return results
+
+def unindexed_filters(model: dict, index: dict):
+    """Return fields used in static SOQL WHERE clauses that are not indexed.
+
+    Relationship paths (Account.Region__c, Parent__r.Code__c) are resolved one
+    hop at a time through the model's relationship names.
+    """
+    objects = {name.lower(): obj for name, obj in model['objects'].items()}
+    by_relationship = {}
+    for edge in model['relationships']:
+        name = edge['relationship_name'] or (edge['field'][:-2] if edge['field'].endswith('Id') else None)
+        if name:
+            by_relationship[(edge['from'].lower(), name.lower())] = edge['to']
+            by_relationship[(edge['from'].lower(), f"{name.lower()}__r")] = edge['to']
+    field_names = {}
+    for rel, entry in index['files'].items():
+        for query in entry['symbols']['soql']:
+            if not query.get('object'):
+                continue
+            for path in query['filters']:
+                sobject, parts = query['object'], path.split('.')
+                if parts[0].lower() == sobject.lower() and len(parts) > 1:
+                    parts = parts[1:]
+                for hop in parts[:-1]:
+                    sobject = by_relationship.get((sobject.lower(), hop.lower()))
+                    if sobject is None:
+                        break
+                if sobject is None or sobject.lower() not in objects:
+                    continue
+                field = parts[-1]
+                obj = objects[sobject.lower()]
+                indexed = {f.lower() for f in obj['indexed']} | STANDARD_INDEXED_FIELDS
+                if field.lower() in indexed:
+                    continue
+                key = (obj['name'], field.lower())
+                record = field_names.setdefault(key, {'object': obj['name'], 'field': field,
+                                                      'custom': field.lower().endswith('__c'), 'queries': []})
+                record['queries'].append(f"{rel}:{query['line']}")
+    return sorted(field_names.values(), key=lambda r: (-len(r['queries']), r['object'], r['field']))
+
+def datamodel_to_dot(model: dict) -> str:
+    """Render the relationship graph in Graphviz DOT (edges point child -> parent)."""
+    lines = ['digraph datamodel {', '  rankdir=LR;', '  node [shape=box, fontname="Helvetica"];']
+    for name, obj in model['objects'].items():
+        style = '' if obj['in_source'] else ', style=dashed'
+        lines.append(f'  "{name}" [label="{name}\\n{obj["fields"]} fields"{style}];')
+    for edge in model['relationships']:
+        style = 'style=bold' if edge['type'] == 'master_detail' else 'style=dashed'
+        lines.append(f'  "{edge["from"]}" -> "{edge["to"]}" [label="{edge["field"]}", {style}];')
+    for rollup in model['rollups']:
+        child = (rollup['source'] or '').split('.', 1)[0]
+        if child:
+            lines.append(f'  "{child}" -> "{rollup["object"]}" '
+                         f'[label="{rollup["field"]} ({rollup["operation"]})", style=dotted, color=gray];')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+def scan_datamodel_command(args):
+    """Build the data model graph and report chains, limit pressure and unindexed filters."""
+    project_path = Path(args.path).resolve()
+    if not get_package_directories(project_path):
+        print_error(f"No package directories found in {project_path} (sfdx-project.json or force-app/)")
+        return 1
+    started = time.perf_counter()
+    files, parsed = update_datamodel_cache(project_path, args.force, args.jobs)
+    model = build_datamodel(files)
+    apex_index, _, _ = update_apex_index(project_path, workers=args.jobs)
+    analysis = {
+        'deepest_chains': relationship_chains(model, top=args.top),
+        'near_limits': objects_near_limits(model, args.warn_at),
+        'unindexed_filters': unindexed_filters(model, apex_index)[:args.top],
+    }
+    elapsed = (time.perf_counter() - started) * 1000
+    for error in model['errors']:
+        print_warning(f"Could not parse {error['file']}: {error['error']}", file=sys.stderr)
+
+    if args.format == 'dot':
+        output = datamodel_to_dot(model)
+    elif args.format == 'json':
+        output = json.dumps(dict(model, analysis=analysis, limits=DATAMODEL_LIMITS), indent=2) + '\n'
+    else:
+        out = [f"{Colors.BOLD}Data model{Colors.RESET}: {len(model['objects'])} objects, "
+               f"{len(model['relationships'])} relationships "
+               f"({sum(1 for e in model['relationships'] if e['type'] == 'master_detail')} master-detail), "
+               f"{len(model['rollups'])} roll-ups ({parsed} files parsed in {elapsed:.0f} ms)", '']
+        out.append(f"{Colors.BOLD}Deepest relationship chains{Colors.RESET}")
+        for chain in analysis['deepest_chains'] or [{'depth': 0, 'path': ['(none)']}]:
+            out.append(f"  {chain['depth']}  " + ' → '.join([chain['path'][0]] + [
+                step.split(' → ')[1] + f" ({step.split(' → ')[0]})" for step in chain['path'][1:]]))
+        out += ['', f"{Colors.BOLD}Objects near platform limits (≥{args.warn_at:g}%){Colors.RESET}"]
+        for item in analysis['near_limits'] or [None]:
+            out.append('  none' if item is None else
+                       f"  {item['object']:<30} {item['metric']:<20} {item['used']}/{item['limit']} "
+                       f"({item['percent']:.0f}%)")
+        out += ['', f"{Colors.BOLD}Non-indexed fields in SOQL filters{Colors.RESET}"]
+        for item in analysis['unindexed_filters'] or [None]:
+            out.append('  none' if item is None else
+                       f"  {item['object']}.{item['field']:<30} {len(item['queries'])} "
+                       f"{'query' if len(item['queries']) == 1 else 'queries'}: "
+                       + ', '.join(item['queries'][:3]))
+        output = '\n'.join(out) + '\n'
+
+    if args.output:
+        Path(args.output).write_text(output)
+        print_success(f"Data model written to {args.output} ({len(model['objects'])} objects)")
+    else:
+        sys.stdout.write(output)
+    return 0
+
+def scan_command(args):
+    """Dispatch `sfce scan <kind>`."""
+    if args.scan_command == 'permissions':
+        return scan_permissions_command(args)
+    if args.scan_command == 'datamodel':
+        return scan_datamodel_command(args)
+    print_error("Usage: sfce scan permissions|datamodel [options]")
+    return 1
+
+# Prerequisite probes (sfce doctor)
+#
+# Tool versions are cached in the user cache keyed on every PATH directory's
+# mtime (adding or removing a binary changes it) and on each resolved binary's
+# mtime and size, so a warm run spawns no subprocesses at all.
+
+DOCTOR_CACHE_VERSION = 1
+
+# tool -> (version command, required)
+DOCTOR_TOOLS = {
+    'git': (['git', '--version'], True),
+    'sf': (['sf', '--version'], False),
+    'node': (['node', '--version'], False),
+}
+
+SPECIFY_LAYOUT = ('.specify', '.specify/memory', '.specify/scripts', '.specify/specs', '.specify/templates')
+
+def doctor_check(name: str, status: str, detail: str, **extra) -> dict:
+    check = {'name': name, 'status': status, 'detail': detail}
+    check.update(extra)
+    return check
+
+def path_fingerprint():
+    """Return [[directory, mtime_ns], ...] for the PATH entries (missing ones as -1)."""
+    entries = []
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        try:
+            entries.append([directory, os.stat(directory).st_mtime_ns])
+        except OSError:
+            entries.append([directory, -1])
+    return entries
+
+def probe_tool(tool: str, cached: dict):
+    """Return the check for one tool, reusing cached when its binary is unchanged."""
+    command, required = DOCTOR_TOOLS[tool]
+    path = shutil.which(command[0])
+    if path is None:
+        status = 'error' if required else 'warning'
+        return doctor_check(tool, status, 'not found on PATH', required=required), None
+    real = os.path.realpath(path)
+    st = os.stat(real)
+    key = {'path': path, 'realpath': real, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+    if cached and all(cached.get(k) == v for k, v in key.items()):
+        entry = cached
+    else:
+        try:
+            out = subprocess.run(command, capture_output=True, text=True, timeout=30)
+            text = (out.stdout or out.stderr).strip().splitlines()
+            version = text[0] if text else ''
+            ok = out.returncode == 0
+        except (OSError, subprocess.TimeoutExpired) as e:
+            version, ok = str(e), False
+        entry = dict(key, version=version, ok=ok)
+    status = 'ok' if entry['ok'] else ('error' if required else 'warning')
+    return doctor_check(tool, status, entry['version'] or 'version unknown', path=path, required=required), entry
+
+def probe_git_repo(project_path: Path):
+    for directory in [project_path] + list(project_path.parents):
+        if (directory / '.git').exists():
+            return [doctor_check('git repository', 'ok', str(directory))]
+    return [doctor_check('git repository', 'warning', 'not inside a Git repository')]
+
+def probe_project_layout(project_path: Path):
+    checks = []
+    missing = [rel for rel in SPECIFY_LAYOUT if not (project_path / rel).is_dir()]
+    if missing:
+        checks.append(doctor_check('.specify layout', 'error', 'missing ' + ', '.join(missing),
+                                   fix='sfce init . --ai claude'))
+    else:
+        specs = sum(1 for entry in os.scandir(project_path / '.specify' / 'specs') if entry.is_dir())
+        checks.append(doctor_check('.specify layout', 'ok', f"{specs} specification(s)"))
+    constitution = project_path / '.specify' / 'memory' / 'constitution.md'
+    checks.append(doctor_check('constitution', 'ok' if constitution.is_file() else 'warning',
+                               'present' if constitution.is_file() else '.specify/memory/constitution.md missing'))
+
+    sfdx = project_path / 'sfdx-project.json'
+    if sfdx.is_file():
+        try:
+            config = json.loads(sfdx.read_text())
+        except ValueError as e:
+            checks.append(doctor_check('sfdx-project.json', 'error', f"invalid JSON: {e}"))
+        else:
+            declared = [entry.get('path', '') for entry in config.get('packageDirectories', [])]
+            absent = [p for p in declared if not (project_path / p).is_dir()]
+            api = config.get('sourceApiVersion', 'unset')
+            checks.append(doctor_check('sfdx-project.json', 'warning' if absent or not declared else 'ok',
+                                       f"API {api}; package directories: " + (', '.join(declared) or 'none') +
+                                       (f" (missing: {', '.join(absent)})" if absent else '')))
+    else:
+        checks.append(doctor_check('sfdx-project.json', 'warning', 'not a Salesforce DX project'))
+    return checks
+
+def probe_claude_install(project_path: Path):
+    """Compare .claude/ content with the lock file (or the packaged content if unlocked)."""
+    claude_dir = project_path / '.claude'
+    if not claude_dir.is_dir():
+        return [doctor_check('.claude content', 'warning', '.claude/ not installed',
+                             fix='sfce init . --ai claude')]
+    lock = read_lock(project_path)
+    if lock:
+        expected, version = lock['files'], lock['version']
+    else:
+        expected = installed_content({rel: hashlib.sha256(resource.read_bytes()).hexdigest()
+                                      for rel, resource in iter_content_files(get_package_root())})
+        version = None
+    missing, modified = [], []
+    for rel, digest in expected.items():
+        path = claude_dir / rel
+        if not path.is_file():
+            missing.append(rel)
+        elif hashlib.sha256(path.read_bytes()).hexdigest() != digest:
+            modified.append(rel)
+
+    checks = []
+    if missing:
+        checks.append(doctor_check('.claude content', 'error', f"{len(missing)} file(s) missing: "
+                                   + ', '.join(missing[:5]), fix='sfce use' if lock else 'sfce update'))
+    else:
+        checks.append(doctor_check('.claude content', 'ok', f"{len(expected)} files installed"))
+    if modified:
+        # /sf-compound edits agents and skills on purpose, so this is informational
+        checks.append(doctor_check('.claude changes', 'info', f"{len(modified)} file(s) differ from "
+                                   f"{'sfce.lock' if lock else 'the package'}: " + ', '.join(modified[:5])))
+    if version is None:
+        checks.append(doctor_check('sfce.lock', 'warning', 'no .specify/sfce.lock; content version not pinned',
+                                   fix='sfce update'))
+    elif version != __version__:
+        checks.append(doctor_check('sfce.lock', 'info', f"pinned to {version}; CLI is {__version__}",
+                                   fix='sfce update'))
+    else:
+        checks.append(doctor_check('sfce.lock', 'ok', f"pinned to {version}"))
+    return checks
+
+def run_doctor(project_path: Path, use_cache: bool = True):
+    """Run every probe concurrently. Returns (checks, cached_tool_count)."""
+    cache_path = get_cache_dir() / 'doctor.json'
+    fingerprint = path_fingerprint()
+    cached = {}
+    if use_cache and cache_path.exists():
+        try:
+            data = json.loads(cache_path.read_text())
+            if data.get('version') == DOCTOR_CACHE_VERSION and data.get('path') == fingerprint:
+                cached = data['tools']
+        except (OSError, ValueError, KeyError):
+            cached = {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(DOCTOR_TOOLS) + 3) as pool:
+        tool_futures = {tool: pool.submit(probe_tool, tool, cached.get(tool)) for tool in DOCTOR_TOOLS}
+        other_futures = [pool.submit(probe, project_path)
+                         for probe in (probe_git_repo, probe_project_layout, probe_claude_install)]
+        checks, entries = [], {}
+        for tool, future in tool_futures.items():
+            check, entry = future.result()
+            checks.append(check)
+            if entry:
+                entries[tool] = entry
+        for future in other_futures:
+            checks.extend(future.result())
+
+    hits = sum(1 for tool, entry in entries.items() if cached.get(tool) == entry)
+    if hits != len(entries) or len(entries) != len(cached):
+        try:
+            write_atomic(cache_path, json.dumps({'version': DOCTOR_CACHE_VERSION, 'path': fingerprint,
+                                                 'tools': entries}).encode())
+        except OSError:
+            pass  # a read-only cache must not break the check
+    return checks, hits
+
+def doctor_command(args):
+    """Check tools, project layout and installed content."""
+    project_path = Path(args.path).resolve()
+    started = time.perf_counter()
+    checks, hits = run_doctor(project_path, use_cache=not args.no_cache)
+    elapsed = (time.perf_counter() - started) * 1000
+    ok = not any(check['status'] == 'error' and (check.get('required') or not args.required_only)
+                 for check in checks)
+    if args.json:
+        print(json.dumps({'ok': ok, 'checks': checks, 'cached_tools': hits,
+                          'elapsed_ms': round(elapsed, 1)}, indent=2))
+        return 0 if ok else 1
+
+    printers = {'ok': print_success, 'info': print_info, 'warning': print_warning, 'error': print_error}
+    for check in checks:
+        fix = f" (fix: {check['fix']})" if check.get('fix') and check['status'] != 'ok' else ''
+        printers[check['status']](f"{check['name']}: {check['detail']}{fix}")
+    print()
+    summary = f"{len(checks)} checks in {elapsed:.0f} ms ({hits} tool version(s) from cache)"
+    if ok:
+        print_success(f"Prerequisites OK: {summary}")
+    else:
+        print_error(f"Prerequisites missing: {summary}")
+    return 0 if ok else 1
+
+# Compound loop metrics from git history
+#
+# One `git log --numstat` stream is read per run; each commit is reduced to
+# its churn per phase and the specs it belongs to, and the reduced commits
+# are cached in .sfce/metrics.json together with the last processed commit.
+
+METRICS_VERSION = 1
+
+LOOP_PHASES = ('plan', 'work', 'review', 'compound')
+PHASE_TARGETS = {'plan': 40, 'work': 20, 'review': 20, 'compound': 20}
+
+TASK_CHECKBOX_RE = re.compile(r'^\s*[-*]\s+\[([ xX])\]', re.MULTILINE)
+
+def classify_loop_path(path: str):
+    """Return (phase or None, spec or None) for a path changed in a commit.
+
+    tasks.md only tracks progress, and installed commands, scripts, templates
+    and the lock file are tooling, so they count toward no phase.
+    """
+    parts = path.split('/')
+    if parts[:2] == ['.specify', 'specs'] and len(parts) > 3:
+        return (None if parts[-1] == 'tasks.md' else 'plan'), parts[2]
+    if parts[:2] == ['.specify', 'reviews']:
+        return 'review', None
+    if parts[:2] in (['.specify', 'compounds'], ['.specify', 'memory']) or path == 'CLAUDE.md':
+        return 'compound', None
+    if parts[0] == '.claude':
+        return ('compound' if len(parts) > 2 and parts[1] in ('agents', 'skills') else None), None
+    if parts[0] in ('.specify', '.sfce'):
+        return None, None
+    return 'work', None
+
+def spec_mentioned(text: str, specs):
+    """Return the spec whose directory name or slug (without the NNN- prefix) appears in text."""
+    text = text.lower()
+    for spec in sorted(specs, key=len, reverse=True):
+        slug = spec.split('-', 1)[1] if re.match(r'\d+-.', spec) else spec
+        if spec.lower() in text or (len(slug) > 3 and slug.lower() in text):
+            return spec
+    return None
+
+def iter_git_numstat(project_path: Path, revision_range: str):
+    """Stream (sha, timestamp, author, subject, [(added, deleted, path)]) oldest first."""
+    command = ['git', '-c', 'core.quotepath=off', 'log', '--reverse', '--no-merges', '--no-renames',
+               '--relative', '--numstat', '--format=%x00%H%x09%ct%x09%an%x09%s', revision_range, '--']
+    proc = subprocess.Popen(command, cwd=project_path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    commit = None
+    try:
+        for raw in proc.stdout:
+            line = raw.decode('utf-8', 'replace').rstrip('\n')
+            if line.startswith('\0'):
+                if commit:
+                    yield commit
+                sha, timestamp, author, subject = (line[1:].split('\t', 3) + ['', '', ''])[:4]
+                commit = (sha, int(timestamp), author, subject, [])
+            elif line and commit:
+                added, deleted, path = line.split('\t', 2)
+                commit[4].append((int(added) if added.isdigit() else 0,
+                                  int(deleted) if deleted.isdigit() else 0, path))
+        if commit:
+            yield commit
+    finally:
+        proc.stdout.close()
+        if proc.wait() not in (0, -13):
+            raise subprocess.CalledProcessError(proc.returncode, command)
+
+def load_metrics_cache(project_path: Path):
+    path = get_project_cache_dir(project_path) / 'metrics.json'
+    if path.exists():
+        try:
+            data = json.loads(path.read_text())
+            if data.get('version') == METRICS_VERSION:
+                return data
+        except ValueError:
+            pass
+    return {'version': METRICS_VERSION, 'head': None, 'active': None, 'specs': [], 'commits': []}
+
+def update_metrics_cache(project_path: Path, rebuild: bool = False):
+    """Read only the commits after the cached head. Returns (cache, new_commit_count)."""
+    head = git_rev_parse(project_path, 'HEAD')
+    if head is None:
+        raise ValueError('not a git repository with commits')
+    cache = {'version': METRICS_VERSION, 'head': None, 'active': None, 'specs': [], 'commits': []}
+    if not rebuild:
+        cache = load_metrics_cache(project_path)
+    if cache['head'] == head:
+        return cache, 0
+    if cache['head'] and subprocess.run(['git', 'merge-base', '--is-ancestor', cache['head'], head],
+                                        cwd=project_path, capture_output=True).returncode != 0:
+        # History was rewritten: start over
+        cache = {'version': METRICS_VERSION, 'head': None, 'active': None, 'specs': [], 'commits': []}
+
+    specs = set(cache['specs'])
+    active = cache['active']
+    new_commits, task_reads = [], []
+    for sha, timestamp, author, subject, files in iter_git_numstat(
+            project_path, f"{cache['head']}..{head}" if cache['head'] else head):
+        churn, touched, tasks_files = {}, set(), []
+        for added, deleted, path in files:
+            phase, spec = classify_loop_path(path)
+            if phase:
+                churn[phase] = churn.get(phase, 0) + added + deleted
+            if spec:
+                touched.add(spec)
+                specs.add(spec)
+                if path.endswith('/tasks.md'):
+                    tasks_files.append((spec, path))
+        if touched:
+            how = 'path'
+        else:
+            mentioned = spec_mentioned(subject + ' ' + ' '.join(p for _, _, p in files), specs)
+            touched, how = ({mentioned}, 'message') if mentioned else ({active}, 'active') if active else (set(), None)
+        if how == 'path':
+            active = max(touched)
+        record = {'sha': sha, 'time': timestamp, 'author': author, 'churn': churn,
+                  'specs': sorted(touched), 'attributed_by': how, 'tasks': {}}
+        new_commits.append(record)
+        task_reads += [((sha, path), spec, record) for spec, path in tasks_files]
+
+    # Task completion snapshots: every tasks.md revision through one cat-file process
+    by_item = {item: (spec, record) for item, spec, record in task_reads}
+    for item, data in iter_git_blobs(project_path, None, list(by_item)):
+        if data is None:
+            continue
+        spec, record = by_item[item]
+        boxes = TASK_CHECKBOX_RE.findall(data.decode('utf-8', 'replace'))
+        record['tasks'][spec] = [sum(1 for box in boxes if box != ' '), len(boxes)]
+
+    cache = {'version': METRICS_VERSION, 'head': head, 'active': active, 'specs': sorted(specs),
+             'commits': cache['commits'] + new_commits}
+    write_atomic(get_project_cache_dir(project_path) / 'metrics.json',
+                 json.dumps(cache, separators=(',', ':')).encode())
+    return cache, len(new_commits)
+
+def compute_loop_metrics(cache: dict) -> dict:
+    """Phase effort split, and per spec: churn, cycle time and the task-completion curve."""
+    totals = {phase: {'commits': 0, 'churn': 0} for phase in LOOP_PHASES}
+    specs = {}
+    for commit in cache['commits']:
+        for phase, churn in commit['churn'].items():
+            totals[phase]['commits'] += 1
+            totals[phase]['churn'] += churn
+        for spec in commit['specs']:
+            record = specs.setdefault(spec, {'spec': spec, 'commits': 0, 'churn': {p: 0 for p in LOOP_PHASES},
+                                             'started': commit['time'], 'last': commit['time'],
+                                             'completed': None, 'curve': []})
+            record['commits'] += 1
+            record['last'] = commit['time']
+            for phase, churn in commit['churn'].items():
+                record['churn'][phase] += churn
+            if spec in commit['tasks']:
+                done, total = commit['tasks'][spec]
+                record['curve'].append([commit['time'], done, total])
+                if total and done == total and record['completed'] is None:
+                    record['completed'] = commit['time']
+                elif done < total:
+                    record['completed'] = None
+
+    all_churn = sum(t['churn'] for t in totals.values()) or 1
+    for phase, total in totals.items():
+        total['share'] = round(100.0 * total['churn'] / all_churn, 1)
+        total['target'] = PHASE_TARGETS[phase]
+    for record in specs.values():
+        end = record['completed'] or record['last']
+        record['cycle_days'] = round((end - record['started']) / 86400, 2)
+        churn = sum(record['churn'].values()) or 1
+        record['share'] = {phase: round(100.0 * c / churn, 1) for phase, c in record['churn'].items()}
+        record['tasks'] = record['curve'][-1][1:] if record['curve'] else None
+    return {'commits': len(cache['commits']), 'head': cache['head'], 'phases': totals,
+            'specs': sorted(specs.values(), key=lambda r: r['spec']),
+            'attribution': {how or 'none': sum(1 for c in cache['commits'] if c['attributed_by'] == how)
+                            for how in ('path', 'message', 'active', None)}}
+
+def sparkline(values) -> str:
+    bars = '▁▂▃▄▅▆▇█'
+    return ''.join(bars[min(len(bars) - 1, int(v * (len(bars) - 1) + 0.5))] for v in values)
+
+def metrics_command(args):
+    """Report the compound loop's effort split, cycle times and task completion from git history."""
+    project_path = Path(args.path).resolve()
+    started = time.perf_counter()
+    try:
+        cache, new = update_metrics_cache(project_path, args.rebuild)
+    except (ValueError, OSError, subprocess.CalledProcessError) as e:
+        print_error(f"Could not read git history: {e}")
+        return 1
+    metrics = compute_loop_metrics(cache)
+    if args.spec:
+        metrics['specs'] = [s for s in metrics['specs'] if args.spec.lower() in s['spec'].lower()]
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if args.json:
+        print(json.dumps(metrics, indent=2))
+        return 0
+
+    print(f"{Colors.BOLD}Compound loop metrics{Colors.RESET}: {metrics['commits']:,} commits, "
+          f"{len(metrics['specs'])} spec(s) ({new:,} new commit(s) read in {elapsed:.0f} ms)\n")
+    print(f"  {'Phase':<10} {'Commits':>8} {'Churn':>10} {'Share':>7} {'Target':>7}")
+    for phase, total in metrics['phases'].items():
+        print(f"  {phase.capitalize():<10} {total['commits']:>8,} {total['churn']:>10,} "
+              f"{total['share']:>6.0f}% {total['target']:>6}%")
+    if metrics['specs']:
+        print(f"\n  {'Spec':<32} {'Commits':>7} {'Cycle':>9} {'Tasks':>9}  {'P/W/R/C %':<15} Completion")
+        for spec in metrics['specs']:
+            tasks = f"{spec['tasks'][0]}/{spec['tasks'][1]}" if spec['tasks'] else '-'
+            cycle = f"{spec['cycle_days']:.1f}d" + ('' if spec['completed'] else '*')
+            share = '/'.join(f"{spec['share'][p]:.0f}" for p in LOOP_PHASES)
+            curve = sparkline(done / total for _, done, total in spec['curve'] if total)
+            print(f"  {spec['spec']:<32} {spec['commits']:>7,} {cycle:>9} {tasks:>9}  {share:<15} {curve}")
+        print("\n  * still open: cycle time so far")
+    attribution = metrics['attribution']
+    print_info(f"Commits attributed to specs by path {attribution['path']}, message {attribution['message']}, "
+               f"active spec {attribution['active']}; unattributed {attribution['none']}")
+    return 0
+
+# Delta deployments from a git diff
+#
+# Changed files are mapped to (type, member) components; a component whose
+# files are all gone at the target revision is destructive, anything else is
+# deployed. Bundles deploy as a whole, decomposed object children on their own.
+
+DELTA_API_VERSION = '60.0'
+DELTA_MARKER = 'delta.json'
+
+def delta_component(rel: str):
+    """Return (type, member) for a source path, including single-file static resources."""
+    info = classify_metadata(rel)
+    if info:
+        return info[0], info[1]
+    parts = rel.split('/')
+    if len(parts) > 1 and parts[-2] == 'staticresources':
+        return 'StaticResource', parts[-1].split('.')[0]
+    return None
+
+def git_diff_names(project_path: Path, from_rev: str, to_rev: str):
+    """Return [(status, path)] for files changed between two revisions (renames as delete + add)."""
+    out = subprocess.run(['git', 'diff', '--name-status', '-z', '--no-renames', '--relative', from_rev, to_rev, '--'],
+                         cwd=project_path, capture_output=True, check=True).stdout
+    fields = out.decode('utf-8', 'surrogateescape').split('\0')
+    return [(fields[i][:1], fields[i + 1]) for i in range(0, len(fields) - 1, 2)]
+
+def compute_delta(project_path: Path, from_sha: str, to_sha: str):
+    """Split the changed components into deploy and destroy sets.
+
+    Returns (deploy, destroy, sources, skipped) where sources maps each deployed
+    component to its files at to_sha.
+    """
+    # Package directories and ignore rules as of each side of the diff, not the working tree
+    keep_from, keep_to = git_source_filter(project_path, from_sha), git_source_filter(project_path, to_sha)
+    changed, skipped = set(), []
+    for status, rel in git_diff_names(project_path, from_sha, to_sha):
+        keep = keep_from if status == 'D' else keep_to
+        component = delta_component(rel) if keep(rel) else None
+        if component:
+            changed.add(component)
+        else:
+            skipped.append(rel)
+
+    files_at_target = {}
+    for rel in git_ls_tree(project_path, to_sha):
+        if keep_to(rel):
+            component = delta_component(rel)
+            if component in changed:
+                files_at_target.setdefault(component, []).append(rel)
+
+    deploy = {c for c in changed if c in files_at_target}
+    destroy = changed - deploy
+    # Children of a deleted object go with it
+    deleted_objects = {member for mtype, member in destroy if mtype == 'CustomObject'}
+    destroy = {(mtype, member) for mtype, member in destroy
+               if not (mtype in DECOMPOSED_OBJECT_TYPES and member.split('.')[0] in deleted_objects)}
+    return deploy, destroy, {c: sorted(files_at_target[c]) for c in deploy}, skipped
+
+def select_delta_tests(index: dict, deploy, destroy):
+    """Pick test classes for the changed components. Returns {test: [reasons]}.
+
+    Changed classes bring the tests that reference them; changed triggers and
+    changed objects (including their fields and rules) bring the tests for the
+    triggers' handler classes plus the tests that write to those objects.
+    """
+    records = list(iter_apex_symbols(index))
+    classes = {r['name'].lower(): r for r in records if r['kind'] != 'trigger'}
+    deployed = {member.lower() for mtype, member in deploy if mtype in ('ApexClass', 'ApexTrigger')}
+    removed = {member.lower() for mtype, member in destroy if mtype == 'ApexClass'}
+    reasons = {}
+
+    def add(test, reason):
+        if test.lower() not in removed:
+            reasons.setdefault(test, []).append(reason)
+
+    def covers(name, reason):
+        record = classes.get(name.lower())
+        if record and record['is_test']:
+            add(record['name'], reason)
+        elif record:
+            for test in index['tests'].get(record['name'].lower(), []):
+                add(test, reason)
+
+    objects = {member.split('.')[0].lower() for mtype, member in deploy
+               if mtype == 'CustomObject' or mtype in DECOMPOSED_OBJECT_TYPES}
+    for mtype, member in deploy:
+        if mtype == 'ApexClass':
+            covers(member, f"{member} changed")
+    for record in records:
+        if record['kind'] != 'trigger':
+            continue
+        if record['name'].lower() in deployed:
+            reason = f"trigger {record['name']} changed"
+            objects.add(record['object'].lower())
+        elif record['object'].lower() in objects:
+            reason = f"{record['object']} changed (trigger {record['name']})"
+        else:
+            continue
+        for ref in record['symbols']['refs']:
+            covers(ref, reason)
+    for record in records:
+        if record.get('is_test'):
+            written = {dml['object'] for dml in record['symbols']['dml'] if dml.get('object')}
+            for sobject in sorted(o for o in written if o.lower() in objects):
+                add(record['name'], f"writes {sobject}")
+    return {test: sorted(set(why)) for test, why in sorted(reasons.items())}
+
+def render_package_xml(components, api_version: str) -> str:
+    from xml.sax.saxutils import escape as xml_escape
+    types = {}
+    for mtype, member in components:
+        types.setdefault(mtype, set()).add(member)
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<Package xmlns="http://soap.sforce.com/2006/04/metadata">']
+    for mtype in sorted(types):
+        lines.append('    <types>')
+        lines += [f"        <members>{xml_escape(member)}</members>" for member in sorted(types[mtype])]
+        lines += [f"        <name>{mtype}</name>", '    </types>']
+    lines += [f"    <version>{api_version}</version>", '</Package>', '']
+    return '\n'.join(lines)
+
+def delta_command(args):
+    """Build package.xml, destructiveChanges.xml and the changed source between two git revisions."""
+    project_path = Path(args.path).resolve()
+    started = time.perf_counter()
+    from_sha, to_sha = git_rev_parse(project_path, args.from_ref), git_rev_parse(project_path, args.to_ref)
+    for ref, sha in ((args.from_ref, from_sha), (args.to_ref, to_sha)):
+        if sha is None:
+            print_error(f"Not a git revision: {ref}")
+            return 1
+    output = Path(args.output_dir)
+    output = output if output.is_absolute() else project_path / output
+    if output.exists() and any(output.iterdir()) and not (output / DELTA_MARKER).exists():
+        print_error(f"{output} is not empty and was not written by 'sfce delta'; choose another --output-dir")
+        return 1
+
+    try:
+        deploy, destroy, sources, skipped = compute_delta(project_path, from_sha, to_sha)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print_error(f"git diff failed: {e}")
+        return 1
+
+    api_version = args.api_version
+    tree_files = dict(iter_git_blobs(project_path, to_sha, ['sfdx-project.json', '.forceignore']))
+    if not api_version and tree_files.get('sfdx-project.json'):
+        try:
+            api_version = json.loads(tree_files['sfdx-project.json']).get('sourceApiVersion')
+        except ValueError:
+            pass
+    api_version = api_version or DELTA_API_VERSION
+
+    tests = None
+    if args.tests:
+        # The cached working-tree index only describes --to when that is HEAD with no Apex edits
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', '*.cls', '*.trigger'], cwd=project_path,
+                               capture_output=True, text=True).stdout.strip()
+        if to_sha == git_rev_parse(project_path, 'HEAD') and not dirty:
+            index, _, _ = update_apex_index(project_path)
+        else:
+            index = apex_index_at(project_path, to_sha)
+        tests = select_delta_tests(index, deploy, destroy)
+
+    if output.exists():
+        shutil.rmtree(output)
+    (output / 'package').mkdir(parents=True)
+    (output / 'destructiveChanges').mkdir()
+    (output / 'package' / 'package.xml').write_text(render_package_xml(deploy, api_version))
+    (output / 'destructiveChanges' / 'destructiveChanges.xml').write_text(render_package_xml(destroy, api_version))
+    (output / 'destructiveChanges' / 'package.xml').write_text(render_package_xml((), api_version))
+    copied = 0
+    for name, data in tree_files.items():
+        if data is not None:
+            (output / name).write_bytes(data)
+    for rel, data in iter_git_blobs(project_path, to_sha, [rel for files in sources.values() for rel in files]):
+        target = output / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        copied += 1
+
+    result = {'from': from_sha, 'to': to_sha, 'api_version': api_version, 'output': str(output),
+              'deploy': [{'type': t, 'member': m} for t, m in sorted(deploy)],
+              'destroy': [{'type': t, 'member': m} for t, m in sorted(destroy)],
+              'files': copied, 'skipped': sorted(skipped), 'tests': tests}
+    (output / DELTA_MARKER).write_text(json.dumps(result, indent=2) + '\n')
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    print(f"{Colors.BOLD}Delta {from_sha[:7]}..{to_sha[:7]}{Colors.RESET}: {len(deploy)} component(s) to deploy, "
+          f"{len(destroy)} to delete, {copied} source file(s) ({elapsed:.0f} ms)")
+    for label, components in (('Deploy', deploy), ('Delete', destroy)):
+        if not components:
+            continue
+        print(f"\n  {label}:")
+        types = {}
+        for mtype, member in sorted(components):
+            types.setdefault(mtype, []).append(member)
+        for mtype, members in types.items():
+            print(f"    {mtype:<28} {', '.join(members)}")
+    if skipped:
+        print(f"\n  {len(skipped)} changed file(s) outside package directories or not metadata "
+              f"(e.g. {', '.join(sorted(skipped)[:3])})")
+
+    rel_out = os.path.relpath(output, Path.cwd())
+    command = f"sf project deploy start --manifest {rel_out}/package/package.xml"
+    if destroy:
+        command += f" --post-destructive-changes {rel_out}/destructiveChanges/destructiveChanges.xml"
+    if tests is not None:
+        print(f"\n  Tests ({len(tests)}):")
+        for test, why in tests.items():
+            print(f"    {test:<40} {'; '.join(why)}")
+        if tests:
+            command += ' --test-level RunSpecifiedTests ' + ' '.join(f"--tests {test}" for test in tests)
+        elif any(mtype in ('ApexClass', 'ApexTrigger') for mtype, _ in deploy | destroy):
+            print_warning("No tests reference the changed Apex; production deploys need --test-level RunLocalTests")
+    print()
+    if not deploy and not destroy:
+        print_info("No metadata changes; nothing to deploy")
+        return 0
+    print_success(f"Wrote {rel_out}/package/package.xml, destructiveChanges/ and the changed source")
+    print(f"  {command}")
+    source_dirs = sorted({rel.split('/')[0] for files in sources.values() for rel in files})
+    if source_dirs:
+        print(f"  (or the source subset: cd {rel_out} && sf project deploy start "
+              + ' '.join(f"--source-dir {d}" for d in source_dirs) + ')')
+    return 0
+
+def use_command(args):
+    """Switch the project to a stored version, or restore the pinned one."""
+    project_path = Path.cwd()
+    store_dir = get_store_dir()
+
+    if args.version:
+        manifest = store_load(args.version, store_dir)
+        if manifest is None:
+            print_error(f"sfce {args.version} is not in the store ({store_dir})")
+            available = [m['version'] for m in store_versions(store_dir)]
+            if available:
+                print_info(f"Available versions: {', '.join(available)}")
+            return 1
+        version, files = args.version, installed_content(manifest['files'])
+    else:
+        lock = read_lock(project_path)
+        if lock is None:
+            print_error(f"No {LOCK_FILE} found. Run 'sfce init . --ai claude' or 'sfce use <version>' first.")
+            return 1
+        version, files = lock['version'], lock['files']
+
+    backup_dir = None if args.no_backup else project_path / '.claude' / '.use-backup'
+    try:
+        written, removed, backed_up = sync_from_store(project_path, files, store_dir, verify=args.verify,
+                                                      backup_dir=backup_dir)
+    except FileNotFoundError as e:
+        print_error(str(e))
+        print_info(f"Repopulate the store with 'sfce store add' from an sfce {version} install")
+        return 1
+
+    store_touch(version, store_dir)
+    write_lock(project_path, version, files)
+    unchanged = len(files) - written
+    print_success(f"Using sfce {version} content: {written} written, {removed} removed, {unchanged} unchanged")
+    if backed_up:
+        print_warning(f"Backed up {backed_up} locally edited file(s) to {backup_dir.relative_to(project_path)}/")
+    return 0
+
+def store_command(args):
+    """Inspect and maintain the global content store."""
+    store_dir = get_store_dir()
+
+    if args.store_command == 'add':
+        manifest = store_add(get_package_root(), __version__, store_dir)
+        print_success(f"Stored sfce {__version__} ({len(manifest['files'])} files) in {store_dir}")
+        store_auto_gc(store_dir)
+        return 0
+
+    if args.store_command == 'gc':
+        cap = args.max_size or os.environ.get('SFCE_STORE_MAX_SIZE')
+        if not cap:
+            print_error("No size cap given. Use --max-size or set SFCE_STORE_MAX_SIZE.")
+            return 1
+        try:
+            max_bytes = parse_size(cap)
+        except ValueError as e:
+            print_error(str(e))
+            return 1
+        evicted = store_gc(max_bytes, protect={__version__}, store_dir=store_dir)
+        for version in evicted:
+            print_info(f"Evicted sfce {version}")
+        print_success(f"Store garbage-collected ({len(evicted)} version(s) evicted)")
+        return 0
+
+    # list
+    versions = store_versions(store_dir)
+    if not versions:
+        print_warning(f"Store is empty: {store_dir}")
+        return 0
+    pinned = (read_lock(Path.cwd()) or {}).get('version')
+    print(f"{'VERSION':<15} {'FILES':>6} {'SIZE':>10}  LAST USED")
+    for manifest in reversed(versions):
+        marker = ' *' if manifest['version'] == pinned else ''
+        last_used = time.strftime('%Y-%m-%d %H:%M', time.localtime(manifest['last_used']))
+        print(f"{manifest['version']:<15} {len(manifest['files']):>6} "
+              f"{format_size(manifest['size']):>10}  {last_used}{marker}")
+    return 0
+
+def bundle_command(args):
+    """Build a single-file zipapp containing the CLI and all packaged content."""
+    root = get_package_root()
+    output = Path(args.output).resolve()
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    # Stored (uncompressed) members can be read straight from the archive
+    compression = zipfile.ZIP_DEFLATED if args.compress else zipfile.ZIP_STORED
+    count = 0
+    with open(output, 'wb') as fh:
+        fh.write(f"#!{args.python}\n".encode())
+        with zipfile.ZipFile(fh, 'w', compression=compression) as archive:
+            archive.writestr('__main__.py', BUNDLE_MAIN)
+            archive.writestr('sfce.py', (root / 'sfce.py').read_bytes())
+            for rel, resource in iter_content_files(root):
+                archive.writestr(rel, resource.read_bytes())
+                count += 1
+    output.chmod(0o755)
+
+    print_success(f"Bundled sfce {__version__} with {count} content files: {output}")
+    print_info(f"Run it with: {output} init . --ai claude")
+    return 0
+
 def init_command(args):
     """Initialize SF Compound Engineering in a project."""
     print_banner()
@@ -995,6 +5590,29 @@ Examples:
   sfce update --commands-only    Only update commands
   sfce update --agents-only      Only update agents
   sfce update --skills-only      Only update skills
+  sfce bundle sfce.pyz           Build a single-file zipapp
+  sfce use 1.0.0                 Switch project content to a stored version
+  sfce use                       Restore the version pinned in .specify/sfce.lock
+  sfce store list                List versions in the global content store
+  sfce store gc --max-size 500M  Evict least-recently-used versions
+  sfce validate                  Check frontmatter, indexes and references
+  sfce validate --format sarif   Emit SARIF for code review tooling
+  sfce index apex                Build/refresh the Apex symbol index
+  sfce find --implements Queueable --touches Account
+  sfce estimate-limits AccountTrigger
+                                 Worst-case SOQL/DML/callouts per transaction
+  sfce review merge out/*.jsonl  Deduplicate and rank agent findings
+  sfce run-review --command 'my-llm-cli --system {agent} --files {files}'
+                                 Run review agents headless, in parallel
+  sfce prompts                   Build the shared prompt-cache prefix
+  sfce inventory                 Count metadata by type in a Salesforce DX project
+  sfce logs analyze              Profile governor-limit usage in Apex debug logs
+  sfce coverage                  Merge Apex coverage reports and gate on the threshold
+  sfce scan permissions          Profile/permission set matrix: who can, diff
+  sfce scan datamodel            Object/relationship graph with limit and index checks
+  sfce doctor                    Check tools, project layout and installed content
+  sfce metrics                   Phase effort, cycle times and task completion from git
+  sfce delta --from <ref>        Delta package.xml, destructiveChanges.xml and source subset
 
 Workflow:
   /sf-plan (40%) → /sf-work (20%) → /sf-review (20%) → /sf-compound (20%)
@@ -1020,12 +5638,234 @@ Workflow:
     update_parser.add_argument('--skills-only', action='store_true', help='Only update skills')
     update_parser.add_argument('--no-backup', action='store_true', help='Skip creating backups')
 
+    # Bundle command
+    bundle_parser = subparsers.add_parser('bundle', help='Build a single-file zipapp with all content')
+    bundle_parser.add_argument('output', nargs='?', default='sfce.pyz', help='Output archive (default: sfce.pyz)')
+    bundle_parser.add_argument('--python', default='/usr/bin/env python3', help='Interpreter for the shebang line')
+    bundle_parser.add_argument('--compress', action='store_true', help='Deflate members (default: stored for direct reads)')
+
+    # Use command
+    use_parser = subparsers.add_parser('use', help='Switch to a stored content version (or restore the pinned one)')
+    use_parser.add_argument('version', nargs='?', help='Version to switch to (default: version pinned in .specify/sfce.lock)')
+    use_parser.add_argument('--verify', action='store_true', help='Re-hash unchanged files instead of trusting the lock')
+    use_parser.add_argument('--no-backup', action='store_true', help='Do not back up locally edited files')
+
+    # Store command
+    store_parser = subparsers.add_parser('store', help='Manage the global content store')
+    store_subparsers = store_parser.add_subparsers(dest='store_command')
+    store_subparsers.add_parser('list', help='List stored versions')
+    store_subparsers.add_parser('add', help='Add this version\'s content to the store')
+    gc_parser = store_subparsers.add_parser('gc', help='Evict least-recently-used versions')
+    gc_parser.add_argument('--max-size', help='Size cap, e.g. 500M (default: $SFCE_STORE_MAX_SIZE)')
+
+    # Validate command
+    validate_parser = subparsers.add_parser('validate', help='Validate agents, skills, commands and indexes')
+    validate_parser.add_argument('path', nargs='?', help='Content or project directory (default: packaged content)')
+    validate_parser.add_argument('--format', choices=['text', 'json', 'sarif'], default='text', help='Output format')
+    validate_parser.add_argument('--output', '-o', help='Write JSON/SARIF output to a file')
+    validate_parser.add_argument('--jobs', '-j', type=positive_int, help='Worker threads (default: CPU based)')
+    validate_parser.add_argument('--no-cache', action='store_true', help='Ignore cached results')
+
+    # Index command
+    index_parser = subparsers.add_parser('index', help='Build or refresh an on-disk code index')
+    index_parser.add_argument('kind', choices=['apex'], help='What to index')
+    index_parser.add_argument('--path', default='.', help='Salesforce project directory (default: current)')
+    index_parser.add_argument('--force', action='store_true', help='Rebuild from scratch')
+    index_parser.add_argument('--jobs', '-j', type=positive_int, help='Parser processes (default: CPU count)')
+
+    # Find command
+    find_parser = subparsers.add_parser('find', help='Query the Apex symbol index')
+    find_parser.add_argument('--path', default='.', help='Salesforce project directory (default: current)')
+    find_parser.add_argument('--name', help='Class or trigger name (glob, case-insensitive)')
+    find_parser.add_argument('--implements', help='Implemented interface, e.g. Queueable')
+    find_parser.add_argument('--extends', help='Superclass name')
+    find_parser.add_argument('--touches', help='sObject queried, written or triggered on')
+    find_parser.add_argument('--queries', help='sObject used in a SOQL FROM clause')
+    find_parser.add_argument('--writes', help='sObject targeted by DML')
+    find_parser.add_argument('--trigger-on', help='Triggers on this sObject')
+    find_parser.add_argument('--tests-for', help='Test classes that exercise this class')
+    find_parser.add_argument('--tests', dest='tests', action='store_true', default=None, help='Only test classes')
+    find_parser.add_argument('--no-tests', dest='tests', action='store_false', help='Exclude test classes')
+    find_parser.add_argument('--no-refresh', action='store_true', help='Query the index without checking for changes')
+    find_parser.add_argument('--json', action='store_true', help='Output JSON')
+
+    # Estimate-limits command
+    estimate_parser = subparsers.add_parser('estimate-limits', help='Estimate worst-case governor-limit usage')
+    estimate_parser.add_argument('targets', nargs='*', help='Trigger, class or Class.method (default: all triggers)')
+    estimate_parser.add_argument('--path', default='.', help='Salesforce project directory (default: current)')
+    estimate_parser.add_argument('--loop-iterations', type=int, default=200,
+                                 help='Assumed iterations per loop level (default: 200, one trigger batch)')
+    estimate_parser.add_argument('--context', choices=['auto', 'sync', 'async'], default='auto',
+                                 help='Limit table to compare against (default: inferred)')
+    estimate_parser.add_argument('--warn-at', type=float, default=80.0,
+                                 help='Show paths for usage at or above this percentage (default: 80)')
+    estimate_parser.add_argument('--json', action='store_true', help='Output JSON')
+
+    # Review command
+    review_parser = subparsers.add_parser('review', help='Post-process review agent findings')
+    review_subparsers = review_parser.add_subparsers(dest='review_command')
+    merge_parser = review_subparsers.add_parser('merge', help='Stream-merge JSONL findings into one report')
+    merge_parser.add_argument('files', nargs='+', help='Findings files (JSON Lines; - for stdin)')
+    merge_parser.add_argument('--format', choices=['markdown', 'jsonl', 'json'], default='markdown',
+                              help='Output format (default: markdown)')
+    merge_parser.add_argument('--output', '-o', help='Write the report to a file')
+    merge_parser.add_argument('--target', default='merged agent findings', help='Review target for the report header')
+    merge_parser.add_argument('--min-severity', choices=[s.lower() for s in SEVERITIES], default='info',
+                              help='Drop findings below this severity')
+    merge_parser.add_argument('--fail-on', choices=[s.lower() for s in SEVERITIES],
+                              help='Exit 1 if any finding has this severity or higher')
+
+    # Run-review command
+    run_review_parser = subparsers.add_parser('run-review', help='Run review agents headless via a local command')
+    run_review_parser.add_argument('--command', dest='agent_command', required=True,
+                                   help='Command per (agent, shard); placeholders: {agent} {agent_name} '
+                                        '{shard} {files} {shard_file} {out}. The agent prompt is sent on stdin.')
+    run_review_parser.add_argument('--agents', nargs='+', help='Agent names, categories or files (default: all)')
+    run_review_parser.add_argument('--targets', nargs='+', help='Files or directories (default: uncommitted changes)')
+    run_review_parser.add_argument('--path', default='.', help='Project directory (default: current)')
+    run_review_parser.add_argument('--out', help='Output directory (default: .specify/reviews/<timestamp>)')
+    run_review_parser.add_argument('--shard-size', type=positive_int, default=20,
+                                   help='Target files per task (default: 20)')
+    run_review_parser.add_argument('--concurrency', '-j', type=positive_int, default=os.cpu_count() or 4,
+                                   help='Maximum concurrent tasks (default: CPU count)')
+    run_review_parser.add_argument('--timeout', type=float, default=600, help='Seconds per attempt (default: 600)')
+    run_review_parser.add_argument('--retries', type=int, default=2, help='Retries per task (default: 2)')
+    run_review_parser.add_argument('--backoff', type=float, default=2.0, help='Initial retry delay in seconds')
+    run_review_parser.add_argument('--no-routing', action='store_true',
+                                   help='Send every target to every agent, ignoring agent scope')
+    run_review_parser.add_argument('--shared-prefix', action='store_true',
+                                   help='Prepend the byte-stable shared prefix (see sfce prompts) to each prompt')
+
+    # Prompts command
+    prompts_parser = subparsers.add_parser('prompts', help='Generate a byte-stable shared prompt prefix')
+    prompts_parser.add_argument('--path', default='.', help='Project directory (default: current)')
+    prompts_parser.add_argument('--out', help='Output directory (default: .claude/prompts)')
+    prompts_parser.add_argument('--full', action='store_true', help='Also write full prefix+agent prompts')
+    prompts_parser.add_argument('--json', action='store_true', help='Print the manifest as JSON')
+
+    # Inventory command
+    inventory_parser = subparsers.add_parser('inventory', help='Count metadata by type in a Salesforce DX project')
+    inventory_parser.add_argument('--path', default='.', help='Salesforce project directory (default: current)')
+    inventory_parser.add_argument('--json', action='store_true', help='Output JSON')
+
+    # Logs command
+    logs_parser = subparsers.add_parser('logs', help='Analyze Apex debug logs')
+    logs_subparsers = logs_parser.add_subparsers(dest='logs_command')
+    analyze_parser = logs_subparsers.add_parser('analyze', help='Profile limits, SOQL, DML and code units')
+    analyze_parser.add_argument('files', nargs='+', help='Debug log files or directories of *.log files')
+    analyze_parser.add_argument('--format', choices=['markdown', 'json'], default='markdown',
+                                help='Report format (default: markdown)')
+    analyze_parser.add_argument('--output', '-o', help='Write the report to a file')
+    analyze_parser.add_argument('--top', type=int, default=10, help='Rows per ranked section (default: 10)')
+    analyze_parser.add_argument('--warn-at', type=float, default=80, help='Flag usage at or above this percent')
+    analyze_parser.add_argument('--jobs', type=positive_int, help='Worker processes (default: CPU count)')
+
+    # Coverage command
+    coverage_parser = subparsers.add_parser('coverage', help='Merge Apex coverage reports and gate on the threshold')
+    coverage_parser.add_argument('files', nargs='+',
+                                 help='Coverage reports (sf JSON, Tooling API, istanbul, lcov, Cobertura, Clover)')
+    coverage_parser.add_argument('--baseline', help='Previous report or saved --format json summary to diff against')
+    coverage_parser.add_argument('--threshold', type=float,
+                                 help='Minimum percent per class (default: from .specify/memory/constitution.md)')
+    coverage_parser.add_argument('--path', default='.', help='Project directory (default: current)')
+    coverage_parser.add_argument('--format', choices=['markdown', 'json'], default='markdown',
+                                 help='Report format (default: markdown)')
+    coverage_parser.add_argument('--output', '-o', help='Write the report to a file')
+    coverage_parser.add_argument('--top', type=int, default=20, help='Rows per section (default: 20)')
+    coverage_parser.add_argument('--fail-on', action='append', choices=['total', 'class', 'regression'],
+                                 help='Exit 1 when total or any class is below threshold, or coverage regressed')
+
+    # Scan command
+    scan_parser = subparsers.add_parser('scan', help='Build compact indexes of project metadata')
+    scan_subparsers = scan_parser.add_subparsers(dest='scan_command')
+    permissions_parser = scan_subparsers.add_parser('permissions',
+                                                    help='Profile/permission set matrix (CRUD, FLS, user perms)')
+    permissions_parser.add_argument('--path', default='.', help='Salesforce project directory (default: current)')
+    permissions_parser.add_argument('--who-can', nargs=2, metavar=('PERMISSION', 'TARGET'),
+                                    help='e.g. edit Account.AnnualRevenue, delete Account, access ModifyAllData')
+    permissions_parser.add_argument('--diff', nargs='+', metavar='REV',
+                                    help='Diff two matrices: git revisions or saved JSON (NEW defaults to working tree)')
+    permissions_parser.add_argument('--force', action='store_true', help='Re-parse every file')
+    permissions_parser.add_argument('--jobs', type=positive_int, help='Worker processes (default: CPU count)')
+    permissions_parser.add_argument('--json', action='store_true', help='Output JSON')
+    datamodel_parser = scan_subparsers.add_parser('datamodel',
+                                                  help='Object/relationship graph with limit and index checks')
+    datamodel_parser.add_argument('--path', default='.', help='Salesforce project directory (default: current)')
+    datamodel_parser.add_argument('--format', choices=['text', 'json', 'dot'], default='text',
+                                  help='Output format (default: text)')
+    datamodel_parser.add_argument('--output', '-o', help='Write the output to a file')
+    datamodel_parser.add_argument('--top', type=int, default=10, help='Rows per analysis (default: 10)')
+    datamodel_parser.add_argument('--warn-at', type=float, default=80,
+                                  help='Report limits at or above this percent (default: 80)')
+    datamodel_parser.add_argument('--force', action='store_true', help='Re-parse every file')
+    datamodel_parser.add_argument('--jobs', type=positive_int, help='Worker processes (default: CPU count)')
+
+    # Doctor command
+    doctor_parser = subparsers.add_parser('doctor', help='Check tools, project layout and installed content')
+    doctor_parser.add_argument('--path', default='.', help='Project directory (default: current)')
+    doctor_parser.add_argument('--json', action='store_true', help='Output JSON')
+    doctor_parser.add_argument('--no-cache', action='store_true', help='Re-run every tool version probe')
+    doctor_parser.add_argument('--required-only', action='store_true',
+                               help='Exit non-zero only when a required tool (git) fails')
+
+    # Metrics command
+    metrics_parser = subparsers.add_parser('metrics', help='Phase effort, cycle times and task completion from git')
+    metrics_parser.add_argument('--path', default='.', help='Project directory (default: current)')
+    metrics_parser.add_argument('--spec', help='Only show specs whose name contains this text')
+    metrics_parser.add_argument('--rebuild', action='store_true', help='Re-read the whole history')
+    metrics_parser.add_argument('--json', action='store_true', help='Output JSON')
+
+    # Delta command
+    delta_parser = subparsers.add_parser('delta', help='Delta package.xml, destructiveChanges.xml and source subset')
+    delta_parser.add_argument('--from', dest='from_ref', required=True, help='Base git revision (e.g. the last deployed tag)')
+    delta_parser.add_argument('--to', dest='to_ref', default='HEAD', help='Target git revision (default: HEAD)')
+    delta_parser.add_argument('--path', default='.', help='Project directory (default: current)')
+    delta_parser.add_argument('--output-dir', '-o', default='.sfce/delta',
+                              help='Output directory, relative to the project (default: .sfce/delta)')
+    delta_parser.add_argument('--tests', action='store_true', help='Select the test classes affected by the change')
+    delta_parser.add_argument('--api-version', help='package.xml version (default: sourceApiVersion)')
+    delta_parser.add_argument('--json', action='store_true', help='Output JSON')
+
     args = parser.parse_args()
 
     if args.command == 'init':
         return init_command(args)
     elif args.command == 'update':
         return update_command(args)
+    elif args.command == 'bundle':
+        return bundle_command(args)
+    elif args.command == 'validate':
+        return validate_command(args)
+    elif args.command == 'index':
+        return index_command(args)
+    elif args.command == 'find':
+        return find_command(args)
+    elif args.command == 'estimate-limits':
+        return estimate_limits_command(args)
+    elif args.command == 'review':
+        return review_command(args)
+    elif args.command == 'run-review':
+        return run_review_command(args)
+    elif args.command == 'prompts':
+        return prompts_command(args)
+    elif args.command == 'inventory':
+        return inventory_command(args)
+    elif args.command == 'logs':
+        return logs_command(args)
+    elif args.command == 'coverage':
+        return coverage_command(args)
+    elif args.command == 'scan':
+        return scan_command(args)
+    elif args.command == 'doctor':
+        return doctor_command(args)
+    elif args.command == 'metrics':
+        return metrics_command(args)
+    elif args.command == 'delta':
+        return delta_command(args)
+    elif args.command == 'use':
+        return use_command(args)
+    elif args.command == 'store':
+        return store_command(args)
     else:
         parser.print_help()
         return 0
@@ -0,0 +1,43 @@
+"""Shared fixtures and helpers for the sfce test suite."""
+
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+SFCE = ROOT / 'sfce.py'
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+CLASSES = 'force-app/main/default/classes'
+
+
+def copy_project(dest: Path) -> Path:
+    """Copy the fixture Salesforce project to dest (commands write .sfce/ caches into it)."""
+    shutil.copytree(FIXTURES / 'project', dest)
+    return dest
+
+
+def run_sfce(*args, cwd=None):
+    """Run the CLI in a subprocess and return the CompletedProcess."""
+    return subprocess.run([sys.executable, str(SFCE), *map(str, args)], cwd=cwd,
+                          capture_output=True, text=True, encoding='utf-8')
+
+
+def run_json(*args, cwd=None):
+    """Run a command with --json and return (exit code, parsed output)."""
+    result = run_sfce(*args, '--json', cwd=cwd)
+    try:
+        return result.returncode, json.loads(result.stdout)
+    except ValueError:
+        raise AssertionError(f"sfce {' '.join(map(str, args))} did not print JSON:\n"
+                             f"{result.stdout}\n{result.stderr}")
+
+
+def git(cwd: Path, *args):
+    subprocess.run(['git', '-c', 'user.name=sfce', '-c', 'user.email=sfce@example.com', *args],
+                   cwd=cwd, check=True, capture_output=True)
@@ -0,0 +1,142 @@
+"""Apex symbol index: parse_apex, sfce find and sfce estimate-limits."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from helpers import CLASSES, FIXTURES, copy_project, run_json
+
+import sfce
+
+
+def fixture_source(name: str) -> str:
+    return (FIXTURES / 'project' / CLASSES / name).read_text(encoding='utf-8')
+
+
+class ParseApexTests(unittest.TestCase):
+
+    def test_class_methods_and_soql(self):
+        symbols = sfce.parse_apex(fixture_source('AccountService.cls'))
+        cls = symbols['classes'][0]
+        self.assertEqual(cls['name'], 'AccountService')
+        self.assertEqual([m['name'] for m in cls['methods']], ['touch'])
+        self.assertEqual([(q['object'], q['line']) for q in symbols['soql']], [('Contact', 4)])
+        # One loop level around the query
+        self.assertEqual(cls['methods'][0]['ops']['soql'], [[4, 1]])
+        self.assertFalse(symbols['is_test'])
+
+    def test_async_class_and_calls(self):
+        symbols = sfce.parse_apex(fixture_source('AccountHandler.cls'))
+        cls = symbols['classes'][0]
+        self.assertEqual(cls['implements'], ['Queueable'])
+        methods = {m['name']: m for m in cls['methods']}
+        self.assertTrue(methods['AccountHandler']['constructor'])
+        self.assertEqual([call[:2] for call in methods['handle']['calls']], [['AccountService', 'touch']])
+
+    def test_refs_are_case_insensitive(self):
+        symbols = sfce.parse_apex(fixture_source('AccountServiceTest.cls'))
+        self.assertTrue(symbols['is_test'])
+        self.assertIn('accountservice', symbols['refs'])
+        self.assertNotIn('accountservicetest', symbols['refs'])
+
+    def test_trigger(self):
+        text = (FIXTURES / 'project/force-app/main/default/triggers/AccountTrigger.trigger').read_text()
+        trigger = sfce.parse_apex(text)['trigger']
+        self.assertEqual((trigger['name'], trigger['object']), ('AccountTrigger', 'Account'))
+        self.assertEqual(trigger['events'], ['after insert', 'after update'])
+
+    def test_comments_and_strings_are_ignored(self):
+        symbols = sfce.parse_apex("public class Quiet {\n"
+                                  "    // [SELECT Id FROM Account]\n"
+                                  "    String q = '[SELECT Id FROM Lead]';\n"
+                                  "}\n")
+        self.assertEqual(symbols['soql'], [])
+
+
+class FindTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.project = copy_project(Path(self.tmp.name) / 'project')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def find(self, *args):
+        code, results = run_json('find', '--path', self.project, *args)
+        self.assertEqual(code, 0)
+        return [r['name'] for r in results]
+
+    def test_queries(self):
+        self.assertEqual(self.find('--implements', 'Queueable'), ['AccountHandler'])
+        self.assertEqual(self.find('--queries', 'contact'), ['AccountService'])
+        self.assertEqual(self.find('--trigger-on', 'Account'), ['AccountTrigger'])
+        self.assertEqual(self.find('--tests'), ['AccountServiceTest'])
+        self.assertEqual(self.find('--name', 'account*', '--no-tests'),
+                         ['AccountHandler', 'AccountService', 'AccountTrigger'])
+
+    def test_tests_for_matches_lowercase_references(self):
+        self.assertEqual(self.find('--tests-for', 'AccountService'), ['AccountServiceTest'])
+        self.assertEqual(self.find('--tests-for', 'ACCOUNTSERVICE'), ['AccountServiceTest'])
+        self.assertEqual(self.find('--tests-for', 'LegacyUtil'), [])
+
+    def test_index_refreshes_after_edit(self):
+        self.find()
+        (self.project / CLASSES / 'LegacyUtil.cls').write_text(
+            "public class LegacyUtil implements Queueable {\n"
+            "    public void execute(QueueableContext context) {}\n"
+            "}\n")
+        self.assertEqual(self.find('--implements', 'Queueable'), ['AccountHandler', 'LegacyUtil'])
+
+
+class EstimateLimitsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.project = copy_project(Path(self.tmp.name) / 'project')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def estimate(self, *targets):
+        code, reports = run_json('estimate-limits', '--path', self.project, *targets)
+        return code, {r['entry']: r for r in reports}
+
+    @staticmethod
+    def soql(report):
+        return next(u for u in report['usage'] if u['metric'] == 'soql')
+
+    def test_trigger_helper_uses_sync_limits(self):
+        code, reports = self.estimate('AccountHandler.handle')
+        report = reports['AccountHandler.handle']
+        self.assertEqual(report['context'], 'sync')
+        self.assertEqual((self.soql(report)['worst_case'], self.soql(report)['limit']), (200, 100))
+        self.assertEqual(code, 1)
+
+    def test_trigger_is_sync_and_follows_calls(self):
+        code, reports = self.estimate()
+        report = reports['AccountTrigger']
+        self.assertEqual(report['context'], 'sync')
+        self.assertEqual(self.soql(report)['worst_case'], 200)
+        self.assertIn('AccountService.touch', self.soql(report)['path'][-1])
+        self.assertEqual(code, 1)
+
+    def test_async_class_reports_only_its_entry_methods(self):
+        code, reports = self.estimate('AccountHandler')
+        self.assertEqual(list(reports), ['AccountHandler.execute'])
+        report = reports['AccountHandler.execute']
+        self.assertEqual(report['context'], 'async')
+        self.assertEqual((self.soql(report)['worst_case'], self.soql(report)['limit']), (200, 200))
+        self.assertEqual(code, 0)
+
+    def test_context_override(self):
+        code, reports = self.estimate('AccountHandler.execute')
+        self.assertEqual(reports['AccountHandler.execute']['context'], 'async')
+        code, reports = run_json('estimate-limits', '--path', self.project, '--context', 'sync',
+                                 'AccountHandler.execute')
+        self.assertEqual(reports[0]['context'], 'sync')
+        self.assertEqual(code, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
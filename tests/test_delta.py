@@ -0,0 +1,73 @@
+"""sfce delta: package.xml, destructiveChanges.xml and the source subset between two revisions."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from helpers import CLASSES, copy_project, git, run_json, run_sfce
+
+
+class DeltaTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.project = copy_project(Path(self.tmp.name) / 'project')
+        git(self.project, 'init', '-q')
+        git(self.project, 'add', '-A')
+        git(self.project, 'commit', '-q', '-m', 'base')
+        git(self.project, 'tag', 'base')
+
+        classes = self.project / CLASSES
+        service = classes / 'AccountService.cls'
+        service.write_text(service.read_text().replace('SELECT Id FROM', 'SELECT Id, Name FROM'))
+        (classes / 'LegacyUtil.cls').unlink()
+        (classes / 'LegacyUtil.cls-meta.xml').unlink()
+        (self.project / 'README.md').write_text('notes\n')
+        git(self.project, 'add', '-A')
+        git(self.project, 'commit', '-q', '-m', 'change')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_deploy_and_destructive_output(self):
+        code, result = run_json('delta', '--path', self.project, '--from', 'base', '--tests')
+        self.assertEqual(code, 0)
+        self.assertEqual(result['deploy'], [{'type': 'ApexClass', 'member': 'AccountService'}])
+        self.assertEqual(result['destroy'], [{'type': 'ApexClass', 'member': 'LegacyUtil'}])
+        self.assertEqual(result['skipped'], ['README.md'])
+        self.assertEqual(result['api_version'], '60.0')
+        self.assertEqual(list(result['tests']), ['AccountServiceTest'])
+
+        out = Path(result['output'])
+        package = (out / 'package' / 'package.xml').read_text()
+        self.assertIn('<members>AccountService</members>\n        <name>ApexClass</name>', package)
+        self.assertNotIn('LegacyUtil', package)
+        destructive = (out / 'destructiveChanges' / 'destructiveChanges.xml').read_text()
+        self.assertIn('<members>LegacyUtil</members>\n        <name>ApexClass</name>', destructive)
+        self.assertNotIn('<types>', (out / 'destructiveChanges' / 'package.xml').read_text())
+        self.assertIn('<version>60.0</version>', package)
+
+        copied = sorted(p.relative_to(out).as_posix() for p in out.rglob('*.cls*'))
+        self.assertEqual(copied, [f'{CLASSES}/AccountService.cls', f'{CLASSES}/AccountService.cls-meta.xml'])
+        self.assertIn('SELECT Id, Name FROM', (out / CLASSES / 'AccountService.cls').read_text())
+
+    def test_no_changes(self):
+        code, result = run_json('delta', '--path', self.project, '--from', 'HEAD')
+        self.assertEqual((code, result['deploy'], result['destroy']), (0, [], []))
+
+    def test_reverse_delta_restores_deleted_class(self):
+        code, result = run_json('delta', '--path', self.project, '--from', 'HEAD', '--to', 'base',
+                                '--output-dir', 'reverse')
+        self.assertEqual(code, 0)
+        self.assertEqual(result['deploy'], [{'type': 'ApexClass', 'member': 'AccountService'},
+                                            {'type': 'ApexClass', 'member': 'LegacyUtil'}])
+        self.assertEqual(result['destroy'], [])
+
+    def test_unknown_revision(self):
+        result = run_sfce('delta', '--path', self.project, '--from', 'no-such-tag')
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('Not a git revision: no-such-tag', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Apex debug log parser: sfce logs analyze."""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from helpers import FIXTURES, run_sfce
+
+import sfce
+
+LOG = str(FIXTURES / 'logs' / 'two-transactions.log')
+
+
+class ParseDebugLogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.report = sfce.analyze_debug_logs([LOG])
+
+    def test_summary(self):
+        summary = self.report['summary']
+        self.assertEqual((summary['transactions'], summary['soql'], summary['dml'], summary['fatal_errors']),
+                         (2, 3, 1, 1))
+
+    def test_transactions(self):
+        transactions = {t['id']: t for t in self.report['transactions']}
+        first, second = transactions['two-transactions.log#1'], transactions['two-transactions.log#2']
+        self.assertEqual(first['entry'], 'AccountTrigger on Account trigger event AfterUpdate')
+        self.assertEqual(first['duration_ms'], 16.0)
+        self.assertEqual(first['soql'], {'count': 2, 'ms': 4.0, 'rows': 5})
+        self.assertEqual(first['dml'], {'count': 1, 'ms': 3.0, 'rows': 5})
+        self.assertEqual(first['exceptions'], 1)
+        self.assertEqual(second['fatal'], ['System.LimitException: Too many SOQL queries: 101'])
+        # Highest limit usage ranks first
+        self.assertEqual(self.report['transactions'][0]['id'], 'two-transactions.log#2')
+        self.assertEqual(self.report['transactions'][0]['peak_percent'], 90.0)
+
+    def test_peaks_queries_and_dml(self):
+        peaks = {p['metric']: p for p in self.report['peaks']}
+        self.assertEqual((peaks['soql']['used'], peaks['soql']['limit']), (90, 100))
+        self.assertEqual(peaks['soql']['transaction'], 'two-transactions.log#2')
+        self.assertEqual(peaks['soql_rows']['used'], 5)
+
+        query, = self.report['queries']
+        self.assertEqual(query['query'], 'SELECT Id FROM Contact WHERE AccountId = :tmpVar1')
+        self.assertEqual((query['count'], query['rows'], query['max_per_transaction']), (3, 6, 2))
+        self.assertEqual(query['lines'], ['4'])
+        dml, = self.report['dml']
+        self.assertEqual((dml['operation'], dml['object'], dml['rows']), ('Update', 'Contact', 5))
+
+    def test_chunks_start_at_transactions_and_merge_to_the_same_totals(self):
+        ranges = sfce.split_debug_log(LOG, chunk_size=64)
+        self.assertEqual(len(ranges), 2)
+        with open(LOG, 'rb') as fh:
+            data = fh.read()
+        self.assertIn(b'|EXECUTION_STARTED', data[ranges[1][1]:].split(b'\n', 1)[0])
+
+        whole = sfce.parse_debug_log_range(ranges[0][:1] + (0, len(data)))
+        parts = [sfce.parse_debug_log_range(task) for task in ranges]
+        self.assertEqual(sum(len(p['transactions']) for p in parts), len(whole['transactions']))
+        self.assertEqual(sum(p['queries'][q][0] for p in parts for q in p['queries']),
+                         sum(record[0] for record in whole['queries'].values()))
+
+
+class LogsCommandTests(unittest.TestCase):
+
+    def test_json_and_markdown_reports(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / 'report.json'
+            result = run_sfce('logs', 'analyze', LOG, '--format', 'json', '--output', out)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(json.loads(out.read_text())['summary']['transactions'], 2)
+
+        result = run_sfce('logs', 'analyze', FIXTURES / 'logs')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('SELECT Id FROM Contact', result.stdout)
+
+    def test_rejects_non_positive_jobs(self):
+        result = run_sfce('logs', 'analyze', LOG, '--jobs', '0')
+        self.assertEqual(result.returncode, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Permission matrix: sfce scan permissions."""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from helpers import copy_project, git, run_json
+
+MUTING = 'force-app/main/default/mutingpermissionsets/SalesOpsMuting.mutingpermissionset-meta.xml'
+
+
+class ScanPermissionsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.project = copy_project(Path(self.tmp.name) / 'project')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def who_can(self, perm, target, *args):
+        code, result = run_json('scan', 'permissions', '--path', self.project, '--who-can', perm, target, *args)
+        self.assertEqual(code, 0)
+        return [(p['kind'], p['name']) for p in result['principals']]
+
+    def test_group_inherits_member_grants(self):
+        self.assertEqual(self.who_can('read', 'Account'), [('permissionset', 'Sales'), ('group', 'SalesOps')])
+
+    def test_group_muting_permission_set_is_subtracted(self):
+        self.assertEqual(self.who_can('edit', 'Account'), [('permissionset', 'Sales')])
+        self.assertEqual(self.who_can('edit', 'Account.AnnualRevenue'), [('permissionset', 'Sales')])
+        self.assertEqual(self.who_can('read', 'Account.AnnualRevenue'),
+                         [('permissionset', 'Sales'), ('group', 'SalesOps')])
+
+    def test_muting_edits_refresh_the_group(self):
+        self.who_can('edit', 'Account')
+        muting = self.project / MUTING
+        muting.write_text(muting.read_text().replace('<allowEdit>true</allowEdit>',
+                                                     '<allowEdit>false</allowEdit>'))
+        self.assertEqual(self.who_can('edit', 'Account'), [('permissionset', 'Sales'), ('group', 'SalesOps')])
+        muting.unlink()
+        self.assertEqual(self.who_can('edit', 'Account.AnnualRevenue'),
+                         [('permissionset', 'Sales'), ('group', 'SalesOps')])
+
+    def test_diff_between_revisions(self):
+        git(self.project, 'init', '-q')
+        git(self.project, 'add', '-A')
+        git(self.project, 'commit', '-q', '-m', 'base')
+        (self.project / MUTING).unlink()
+        code, result = run_json('scan', 'permissions', '--path', self.project, '--diff', 'HEAD')
+        self.assertEqual(code, 0)
+        granted = sorted((c['principal'], c['permission'], c['target']) for c in result['changes'])
+        self.assertEqual(granted, [('SalesOps', 'edit', 'Account'), ('SalesOps', 'edit', 'Account.AnnualRevenue')])
+        self.assertEqual(result['removed_principals'], ['SalesOpsMuting'])
+
+
+if __name__ == '__main__':
+    unittest.main()
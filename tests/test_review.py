@@ -0,0 +1,86 @@
+"""Review findings: FindingsMerger and sfce review merge."""
+
+import json
+import unittest
+
+from helpers import FIXTURES, run_sfce
+
+import sfce
+
+SECURITY = FIXTURES / 'findings' / 'security.jsonl'
+BULKIFICATION = FIXTURES / 'findings' / 'bulkification.jsonl'
+SERVICE = 'force-app/main/default/classes/AccountService.cls'
+
+
+def merge(*paths):
+    result = run_sfce('review', 'merge', *paths, '--format', 'jsonl')
+    assert result.returncode == 0, result.stderr
+    return [json.loads(line) for line in result.stdout.splitlines()], result.stderr
+
+
+def summary(findings):
+    return sorted((f['file'], f['rule'].lower(), f['line'], f['end_line'], f['severity'], tuple(f['agents']))
+                  for f in findings)
+
+
+class FindingsMergerTests(unittest.TestCase):
+
+    def test_overlapping_ranges_merge(self):
+        merger = sfce.FindingsMerger()
+        merger.add({'rule': 'r', 'severity': 'LOW', 'file': 'a.cls', 'line': 1, 'end_line': 3,
+                    'title': 't', 'agent': 'one'})
+        merger.add({'rule': 'R', 'severity': 'HIGH', 'file': './a.cls', 'line': 3, 'end_line': 5,
+                    'title': 't', 'agent': 'two'})
+        merger.add({'rule': 'r', 'file': 'a.cls', 'line': 9, 'title': 't'})
+        merged = merger.ranked()
+        self.assertEqual(summary(merged), [('a.cls', 'r', 1, 5, 'HIGH', ('one', 'two')),
+                                           ('a.cls', 'r', 9, 9, 'MEDIUM', ())])
+        self.assertEqual(merger.total, 3)
+
+    def test_bridging_finding_coalesces_ranges(self):
+        merger = sfce.FindingsMerger()
+        for line in (1, 10, 20):
+            merger.add({'rule': 'r', 'file': 'a.cls', 'line': line, 'title': 't'})
+        merger.add({'rule': 'r', 'file': 'a.cls', 'line': 1, 'end_line': 20, 'title': 't'})
+        self.assertEqual([(f['line'], f['end_line']) for f in merger.ranked()], [(1, 20)])
+
+    def test_invalid_findings_are_counted(self):
+        merger = sfce.FindingsMerger()
+        merger.add({'title': 'no file'})
+        merger.add({'file': 'a.cls'})
+        self.assertEqual((merger.invalid, merger.total, merger.ranked()), (2, 0, []))
+
+
+class ReviewMergeCommandTests(unittest.TestCase):
+
+    def test_dedup_across_agents(self):
+        findings, stderr = merge(SECURITY, BULKIFICATION)
+        self.assertEqual(summary(findings), [
+            ('force-app/main/default/classes/AccountService.cls', 'soql-in-loop', 3, 9, 'CRITICAL',
+             ('apex-bulkification-reviewer', 'apex-governor-guardian')),
+            ('force-app/main/default/classes/Search.cls', 'soql-injection', 12, 14, 'CRITICAL',
+             ('apex-security-sentinel',)),
+            ('force-app/main/default/lwc/card/card.js', 'xss', 3, 3, 'MEDIUM', ('lwc-security-reviewer',)),
+        ])
+        self.assertIn('security.jsonl:6', stderr)
+        self.assertIn('Skipped 1 finding(s)', stderr)
+
+    def test_result_does_not_depend_on_input_order(self):
+        forward, _ = merge(SECURITY, BULKIFICATION)
+        backward, _ = merge(BULKIFICATION, SECURITY)
+        self.assertEqual(summary(forward), summary(backward))
+
+    def test_markdown_and_severity_filter(self):
+        result = run_sfce('review', 'merge', SECURITY, BULKIFICATION, '--min-severity', 'high')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('CRITICAL (2)', result.stdout)
+        self.assertNotIn('card.js', result.stdout)
+        self.assertIn(f'[{SERVICE}:3-9]', result.stdout)
+
+    def test_fail_on(self):
+        result = run_sfce('review', 'merge', BULKIFICATION, '--format', 'jsonl', '--fail-on', 'critical')
+        self.assertEqual(result.returncode, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Content-addressed store: sfce store gc."""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import helpers  # noqa: F401  (puts sfce on sys.path)
+
+import sfce
+
+
+class StoreGcTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = Path(self.tmp.name)
+        self.old = time.time() - sfce.STORE_GC_GRACE_SECONDS - 60
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add(self, version, blobs, used):
+        """Store a version whose files are the given blob contents, last used at `used`."""
+        files = {}
+        for number, data in enumerate(blobs):
+            digest = hashlib.sha256(data).hexdigest()
+            path = sfce.store_object_path(self.store, digest)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            os.utime(path, (self.old, self.old))
+            files[f"file{number}"] = digest
+        manifest = sfce.store_manifest_path(self.store, version)
+        manifest.parent.mkdir(parents=True, exist_ok=True)
+        manifest.write_text(json.dumps({'version': version, 'size': 0, 'files': files}))
+        os.utime(manifest, (used, used))
+
+    def blob_bytes(self):
+        return sum(p.stat().st_size for p in (self.store / 'objects').glob('*/*'))
+
+    def test_shared_blobs_count_once(self):
+        shared = b's' * 100
+        self.add('1.0.0', [shared, b'a' * 50], used=1)
+        self.add('1.1.0', [shared, b'b' * 50], used=2)
+        self.add('1.2.0', [shared, b'c' * 50, b'c' * 50], used=3)
+        # All three versions hold 250 bytes; evicting 1.0.0 frees only its own 50
+        self.assertEqual(sfce.store_gc(250, store_dir=self.store), [])
+        self.assertEqual(sfce.store_gc(200, store_dir=self.store), ['1.0.0'])
+        self.assertEqual(self.blob_bytes(), 200)
+        self.assertEqual(sfce.store_gc(150, store_dir=self.store), ['1.1.0'])
+        self.assertEqual(self.blob_bytes(), 150)
+        self.assertEqual([m['version'] for m in sfce.store_versions(self.store)], ['1.2.0'])
+
+    def test_protected_versions_are_kept(self):
+        self.add('1.0.0', [b'a' * 100], used=1)
+        self.add('1.1.0', [b'b' * 100], used=2)
+        self.assertEqual(sfce.store_gc(0, protect={'1.0.0'}, store_dir=self.store), ['1.1.0'])
+        self.assertEqual(self.blob_bytes(), 100)
+
+    def test_recent_unreferenced_blobs_survive(self):
+        self.add('1.0.0', [b'a' * 100], used=1)
+        fresh = sfce.store_object_path(self.store, 'f' * 64)
+        fresh.parent.mkdir(parents=True, exist_ok=True)
+        fresh.write_bytes(b'pending add')
+        self.assertEqual(sfce.store_gc(0, store_dir=self.store), ['1.0.0'])
+        self.assertTrue(fresh.exists())
+        self.assertEqual(self.blob_bytes(), len(b'pending add'))
+
+
+if __name__ == '__main__':
+    unittest.main()